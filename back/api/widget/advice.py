@@ -1,14 +1,116 @@
+import hashlib
+import os
+import random
+from datetime import date
+
 import httpx
 
+from .http_client import get_http_client
+from .breaker import get_breaker
+
 # API 주소를 새로운 한국어 명언 API로 변경합니다.
+# 위젯 요청은 로컬 명언 모음에서 바로 응답하고, 이 API는 백그라운드에서 명언 모음을 늘리는 데만 사용합니다.
 API_URL = "https://korean-advice-open-api.vercel.app/api/advice"
 
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+# 백엔드와 함께 배포되는 명언 모음 (한 줄에 "명언<TAB>저자")
+CORPUS_PATH = os.path.join(DATA_DIR, "advice_quotes.tsv")
+# 업스트림에서 동기화한 명언을 덧붙여 저장하는 파일 (같은 형식)
+SYNCED_PATH = os.getenv("ADVICE_SYNCED_PATH", os.path.join(DATA_DIR, "advice_quotes_synced.tsv"))
+
+
+def _normalize(message: str) -> str:
+    return " ".join(message.split())
+
+
+class QuoteCorpus:
+    """
+    로컬 명언 모음
+    - 파일은 처음 사용할 때 한 번만 읽어 리스트로 들고 있으므로 임의 접근이 O(1)입니다.
+    - 오늘의 명언은 (user_id, 날짜) 해시로 고르므로 같은 사용자는 하루 동안 같은 명언을 봅니다.
+    """
+
+    def __init__(self, paths: list, synced_path: str):
+        self.paths = paths
+        self.synced_path = synced_path
+        self._quotes = []
+        self._known = set()
+        self._loaded = False
+        # 하루 중간에 명언이 추가돼도 오늘의 명언이 바뀌지 않도록 날짜별 기준 개수를 고정합니다.
+        self._day_size = (None, 0)
+
+    def _load(self):
+        for path in self.paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    message, _, author = line.rstrip("\n").partition("\t")
+                    self._append(message, author)
+        self._loaded = True
+        print(f"✅ 명언 모음 로드: {len(self._quotes)}개")
+
+    def _append(self, message: str, author: str) -> bool:
+        message = _normalize(message)
+        if not message or message in self._known:
+            return False
+        self._known.add(message)
+        self._quotes.append({"message": message, "author": author.strip() or "작자 미상"})
+        return True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._load()
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._quotes)
+
+    def random(self) -> dict:
+        self._ensure_loaded()
+        return self._quotes[random.randrange(len(self._quotes))]
+
+    def quote_of_the_day(self, user_id: str = "", day: date = None) -> dict:
+        self._ensure_loaded()
+        day = day or date.today()
+        if self._day_size[0] != day:
+            self._day_size = (day, len(self._quotes))
+        digest = hashlib.sha256(f"{user_id}:{day.isoformat()}".encode("utf-8")).hexdigest()
+        return self._quotes[int(digest[:16], 16) % self._day_size[1]]
+
+    def add(self, message: str, author: str) -> bool:
+        """새 명언을 추가하고 동기화 파일에 덧붙입니다. 이미 있는 명언이면 False를 반환합니다."""
+        self._ensure_loaded()
+        message = message.replace("\t", " ").replace("\n", " ")
+        author = (author or "").replace("\t", " ").replace("\n", " ")
+        if not self._append(message, author):
+            return False
+        with open(self.synced_path, "a", encoding="utf-8") as f:
+            f.write(f"{_normalize(message)}\t{author.strip()}\n")
+        return True
+
+
+corpus = QuoteCorpus([CORPUS_PATH, SYNCED_PATH], SYNCED_PATH)
+
+
 async def get_random_advice():
-    """임의의 한국어 명언 정보를 가져옵니다."""
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(API_URL)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            return {"error": f"명언을 가져오는 데 실패했습니다: {str(e)}"}
\ No newline at end of file
+    """명언 모음에서 임의의 명언을 가져옵니다. (네트워크 호출 없음)"""
+    return corpus.random()
+
+
+async def get_daily_advice(user_id: str = None):
+    """사용자별 오늘의 명언을 가져옵니다. user_id가 없으면 모든 사용자에게 같은 오늘의 명언을 반환합니다."""
+    return corpus.quote_of_the_day(user_id or "")
+
+
+async def sync_from_upstream(client: httpx.AsyncClient = None):
+    """한국어 명언 API에서 명언 하나를 받아 명언 모음에 추가합니다. (백그라운드 동기화용)"""
+    client = client or get_http_client("advice")
+    try:
+        response = await get_breaker("advice").call(lambda: client.get(API_URL))
+        response.raise_for_status()
+        data = response.json()
+        added = corpus.add(data.get("message", ""), data.get("author", ""))
+        return {"added": added, "size": len(corpus)}
+    except Exception as e:
+        return {"error": f"명언을 가져오는 데 실패했습니다: {str(e)}"}
@@ -0,0 +1,209 @@
+# back/api/widget/breaker.py
+# 위젯 업스트림별 서킷 브레이커 (closed / open / half_open) + 헤지 요청
+
+import asyncio
+import time
+from collections import deque
+
+# 업스트림별 브레이커 설정
+# - hedge: 응답이 p95 지연보다 늦으면 같은 요청을 한 번 더 보내고 먼저 온 응답을 사용
+#   (하루 호출 한도가 작은 news/book은 헤지로 한도를 두 배로 쓰지 않도록 끕니다.
+#    weather는 헤지 요청도 호출 한도 토큰을 하나 써야 보냅니다. call의 hedge_permit 참고)
+BREAKER_CONFIGS = {
+    "weather": {"hedge": True},
+    "news": {"hedge": False},
+    "book": {"hedge": False},
+    "advice": {"hedge": False},  # 백그라운드 명언 동기화에만 사용
+    "randomDog": {"hedge": False},
+}
+
+# 최근 몇 초 동안의 호출로 에러율과 지연 시간을 계산할지
+WINDOW_SEC = 60
+# 에러율을 판단하기 위한 최소 호출 수
+MIN_CALLS = 5
+# 이 비율 이상 실패하면 서킷을 엽니다.
+FAILURE_RATE_THRESHOLD = 0.5
+# 서킷을 연 뒤 시험 호출(half_open)을 허용하기까지 기다리는 시간 (초)
+OPEN_SEC = 30
+# p95 지연을 계산하기 위한 최소 성공 호출 수 (이보다 적으면 헤지하지 않습니다)
+HEDGE_MIN_SAMPLES = 20
+# 헤지 요청을 보내기 전 최소 대기 시간 (초)
+HEDGE_MIN_DELAY = 0.2
+
+
+class CircuitOpenError(Exception):
+    """서킷이 열려 있어 업스트림을 호출하지 않았을 때 발생하는 예외"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} 업스트림 서킷이 열려 있습니다. {retry_after:.0f}초 후 다시 시도합니다.")
+
+
+def _default_is_failure(response) -> bool:
+    """서버 에러(5xx)와 호출 한도 초과(429)를 업스트림 장애로 봅니다."""
+    status = getattr(response, "status_code", 200)
+    return status >= 500 or status == 429
+
+
+class CircuitBreaker:
+    """최근 호출의 에러율로 상태를 바꾸는 업스트림별 서킷 브레이커"""
+
+    def __init__(self, name: str, hedge: bool = False):
+        self.name = name
+        self.hedge = hedge
+        self.state = "closed"
+        self.opened_at = None
+        self._half_open_in_flight = False
+        # (시각, 지연 ms, 성공 여부)
+        self._calls = deque()
+        self.total_calls = 0
+        self.total_failures = 0
+        self.rejected = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def _trim(self, now: float):
+        while self._calls and now - self._calls[0][0] > WINDOW_SEC:
+            self._calls.popleft()
+
+    def _p95_delay(self):
+        """최근 성공 호출의 p95 지연(초)을 반환합니다. 표본이 부족하면 None"""
+        latencies = sorted(latency for _, latency, ok in self._calls if ok)
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return max(p95 / 1000, HEDGE_MIN_DELAY)
+
+    def _before_call(self):
+        if self.state == "open":
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < OPEN_SEC:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, OPEN_SEC - elapsed)
+            self.state = "half_open"
+        if self.state == "half_open":
+            # half_open 상태에서는 시험 호출 하나만 허용합니다.
+            if self._half_open_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, 0)
+            self._half_open_in_flight = True
+
+    def _record(self, latency_ms: float, ok: bool):
+        now = time.monotonic()
+        self.total_calls += 1
+        if not ok:
+            self.total_failures += 1
+
+        if self.state == "half_open":
+            self._half_open_in_flight = False
+            if ok:
+                self.state = "closed"
+                self._calls.clear()
+            else:
+                self.state = "open"
+                self.opened_at = now
+            return
+
+        self._calls.append((now, latency_ms, ok))
+        self._trim(now)
+        failures = sum(1 for _, _, call_ok in self._calls if not call_ok)
+        if len(self._calls) >= MIN_CALLS and failures / len(self._calls) >= FAILURE_RATE_THRESHOLD:
+            self.state = "open"
+            self.opened_at = now
+            print(f"⚠️ {self.name} 업스트림 서킷 열림: 최근 {len(self._calls)}건 중 {failures}건 실패")
+
+    async def _hedged_call(self, request_fn, is_failure, hedge_permit=None):
+        """
+        첫 요청이 p95 지연 안에 끝나지 않으면 두 번째 요청을 보내고 먼저 성공한 응답을 사용합니다.
+        hedge_permit이 있으면 두 번째 요청을 보내기 전에 호출하고, False면 첫 요청만 기다립니다.
+        """
+        delay = self._p95_delay()
+        primary = asyncio.create_task(request_fn())
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        if hedge_permit is not None and not hedge_permit():
+            return await primary
+
+        self.hedged += 1
+        secondary = asyncio.create_task(request_fn())
+        pending = {primary, secondary}
+        result, error = None, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    result = task.result()
+                    if not is_failure(result):
+                        if task is secondary:
+                            self.hedge_wins += 1
+                        return result
+            if result is not None:
+                return result
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, request_fn, is_failure=_default_is_failure, hedge_permit=None):
+        """
+        request_fn(인자 없는 코루틴 함수)을 서킷 브레이커를 거쳐 호출합니다.
+        서킷이 열려 있으면 업스트림을 호출하지 않고 CircuitOpenError를 발생시킵니다.
+        hedge_permit(인자 없는 함수)은 헤지 요청을 보내도 되는지 반환합니다. (호출 한도 토큰을 쓸 때 사용)
+        """
+        self._before_call()
+        started = time.perf_counter()
+        try:
+            if self.hedge and self.state == "closed":
+                response = await self._hedged_call(request_fn, is_failure, hedge_permit)
+            else:
+                response = await request_fn()
+        except asyncio.CancelledError:
+            if self.state == "half_open":
+                self._half_open_in_flight = False
+            raise
+        except Exception:
+            self._record((time.perf_counter() - started) * 1000, False)
+            raise
+        self._record((time.perf_counter() - started) * 1000, not is_failure(response))
+        return response
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        self._trim(now)
+        latencies = sorted(latency for _, latency, ok in self._calls if ok)
+        failures = sum(1 for _, _, ok in self._calls if not ok)
+        return {
+            "state": self.state,
+            "hedge": self.hedge,
+            "window_calls": len(self._calls),
+            "window_failures": failures,
+            "window_error_rate": round(failures / len(self._calls), 4) if self._calls else 0.0,
+            "p50_ms": round(latencies[len(latencies) // 2], 1) if latencies else None,
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1) if latencies else None,
+            "retry_after_sec": round(max(0.0, OPEN_SEC - (now - self.opened_at)), 1) if self.state == "open" else None,
+            "total_calls": self.total_calls,
+            "total_failures": self.total_failures,
+            "rejected": self.rejected,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+# 업스트림 이름 -> 브레이커
+breakers = {name: CircuitBreaker(name, **config) for name, config in BREAKER_CONFIGS.items()}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """업스트림 이름에 해당하는 브레이커를 반환합니다. 없으면 기본 설정으로 만듭니다."""
+    breaker = breakers.get(name)
+    if breaker is None:
+        breaker = breakers[name] = CircuitBreaker(name)
+    return breaker
@@ -0,0 +1,184 @@
+# back/api/widget/cache.py
+# 위젯 데이터 캐시 (TTL + stale-while-revalidate + 네거티브 캐싱 + LRU)
+
+import asyncio
+import time
+from collections import OrderedDict
+
+# 캐시 정책 (초 단위, 위젯별 정책은 registry.py의 위젯 선언에 있습니다)
+# - ttl: 이 시간 동안은 캐시를 신선한 값으로 바로 반환
+# - stale_ttl: ttl이 지난 뒤에도 이 시간 동안은 오래된 값을 바로 반환하고 백그라운드에서 갱신
+# - error_ttl: 업스트림 에러 응답을 캐시하는 시간 (같은 에러로 업스트림을 반복 호출하지 않도록)
+DEFAULT_POLICY = {"ttl": 300, "stale_ttl": 600, "error_ttl": 30}
+
+
+def is_error_payload(value) -> bool:
+    """위젯 fetcher가 반환한 값이 에러 응답({"error": ...})인지 확인합니다."""
+    return isinstance(value, dict) and "error" in value
+
+
+class CacheEntry:
+    """캐시에 저장되는 값과 만료 시각"""
+
+    __slots__ = ("value", "fetched_at", "expires_at", "stale_until", "is_error")
+
+    def __init__(self, value, ttl: float, stale_ttl: float, is_error: bool = False):
+        now = time.monotonic()
+        self.value = value
+        self.fetched_at = now
+        self.expires_at = now + ttl
+        self.stale_until = self.expires_at + stale_ttl
+        self.is_error = is_error
+
+
+class WidgetCache:
+    """
+    위젯 응답을 위한 인메모리 캐시
+    - 신선한 값은 바로 반환 (hit)
+    - 만료됐지만 stale 구간이면 오래된 값을 바로 반환하고 백그라운드에서 갱신 (stale hit)
+    - 값이 없거나 stale 구간도 지났으면 업스트림을 호출 (miss)
+    - 같은 키에 대한 동시 miss는 하나의 업스트림 호출을 공유
+    - max_entries를 넘으면 가장 오래 사용되지 않은 항목부터 제거 (LRU)
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        # 새 값이 저장될 때 (key, value)로 호출되는 함수들 (SSE 푸시 등)
+        self._listeners = []
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def _policy(self, policy: dict = None) -> dict:
+        return policy or DEFAULT_POLICY
+
+    def _store(self, key: str, value, policy: dict):
+        """값을 저장합니다. 에러 값은 error_ttl 동안만 캐시합니다."""
+        if is_error_payload(value):
+            self.errors += 1
+            previous = self._entries.get(key)
+            if previous is not None and not previous.is_error:
+                # 마지막 정상 값이 있으면 에러로 덮어쓰지 않고, 그 값을 error_ttl 동안 다시 반환합니다.
+                # (업스트림 장애나 서킷이 열린 동안에도 사용자는 마지막 정상 값을 바로 받습니다.)
+                entry = CacheEntry(previous.value, policy["error_ttl"], 0)
+                entry.fetched_at = previous.fetched_at
+                entry.stale_until = max(entry.stale_until, previous.stale_until)
+                self._entries[key] = entry
+                return entry
+            entry = CacheEntry(value, policy["error_ttl"], 0, is_error=True)
+        else:
+            entry = CacheEntry(value, policy["ttl"], policy["stale_ttl"])
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        if not entry.is_error:
+            self._notify(key, value)
+        return entry
+
+    def add_listener(self, listener):
+        """새 값이 캐시에 저장될 때마다 listener(key, value)를 호출하도록 등록합니다."""
+        self._listeners.append(listener)
+
+    def _notify(self, key: str, value):
+        for listener in self._listeners:
+            try:
+                listener(key, value)
+            except Exception as e:
+                print(f"⚠️ 위젯 캐시 리스너 오류 ({key}): {str(e)}")
+
+    def _start_fetch(self, key: str, fetcher, policy: dict) -> asyncio.Task:
+        """업스트림 호출 작업을 시작합니다. 같은 키에 진행 중인 작업이 있으면 그것을 재사용합니다."""
+        task = self._inflight.get(key)
+        if task is None:
+            async def run():
+                try:
+                    value = await fetcher()
+                except Exception as e:
+                    value = {"error": f"위젯 데이터를 가져오는 데 실패했습니다: {str(e)}"}
+                return self._store(key, value, policy)
+
+            task = asyncio.create_task(run())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _fetch(self, key: str, fetcher, policy: dict):
+        """업스트림을 호출해 캐시에 저장하고 저장된 항목을 반환합니다."""
+        # 요청이 취소되더라도 다른 요청이 공유 중인 업스트림 호출은 계속 진행되도록 shield
+        return await asyncio.shield(self._start_fetch(key, fetcher, policy))
+
+    def _refresh_in_background(self, key: str, fetcher, policy: dict):
+        """stale 값을 반환한 뒤 백그라운드에서 갱신합니다."""
+        if key in self._inflight:
+            return
+        self.refreshes += 1
+        self._start_fetch(key, fetcher, policy)
+
+    def refresh_in_background(self, key: str, fetcher, policy: dict = None):
+        """기다리지 않고 백그라운드에서 갱신을 시작합니다. 같은 키가 이미 갱신 중이면 아무 일도 하지 않습니다."""
+        self._refresh_in_background(key, fetcher, self._policy(policy))
+
+    def is_fresh(self, key: str) -> bool:
+        """키의 값이 있고 아직 ttl 안이면 True"""
+        entry = self._entries.get(key)
+        return entry is not None and time.monotonic() < entry.expires_at
+
+    async def get_or_fetch(self, key: str, fetcher, policy: dict = None):
+        """
+        캐시된 값을 반환하거나, 없으면 fetcher를 호출해 채웁니다.
+        fetcher는 인자가 없는 코루틴 함수이고, policy가 없으면 DEFAULT_POLICY를 사용합니다.
+        """
+        policy = self._policy(policy)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            if now < entry.expires_at:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if now < entry.stale_until:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._refresh_in_background(key, fetcher, policy)
+                return entry.value
+
+        self.misses += 1
+        entry = await self._fetch(key, fetcher, policy)
+        return entry.value
+
+    async def refresh(self, key: str, fetcher, policy: dict = None):
+        """캐시 상태와 관계없이 업스트림을 호출해 값을 갱신합니다. (프리페치 등에서 사용)"""
+        entry = await self._fetch(key, fetcher, self._policy(policy))
+        return entry.value
+
+    def invalidate(self, key: str):
+        """특정 키의 캐시를 제거합니다."""
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        """캐시 적중률 등 카운터를 반환합니다."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "errors": self.errors,
+            "evictions": self.evictions,
+            "background_refreshes": self.refreshes,
+        }
+
+
+# 앱 전체에서 공유하는 위젯 캐시
+widget_cache = WidgetCache()
@@ -0,0 +1,57 @@
+# back/api/widget/etag.py
+# 위젯 응답에 강한 ETag를 붙이고, 클라이언트가 같은 ETag로 재검증하면 304를 돌려주는 헬퍼
+
+import hashlib
+import json
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+# 같은 캐시 값 객체를 매 요청마다 다시 직렬화/해시하지 않도록 (객체 id -> (객체, 본문, ETag))를 기억합니다.
+# 객체 자체도 함께 들고 있어서 id가 다른 객체에 재사용되는 일이 없습니다.
+_SERIALIZED_MAX = 512
+_serialized = OrderedDict()
+
+
+def _encode(payload):
+    """payload를 JSON 바이트로 직렬화하고 그 내용 해시로 강한 ETag를 만듭니다."""
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _serialize(payload, memoize: bool = True):
+    if not memoize:
+        return _encode(payload)
+
+    key = id(payload)
+    cached = _serialized.get(key)
+    if cached is not None and cached[0] is payload:
+        _serialized.move_to_end(key)
+        return cached[1], cached[2]
+
+    body, etag = _encode(payload)
+    _serialized[key] = (payload, body, etag)
+    while len(_serialized) > _SERIALIZED_MAX:
+        _serialized.popitem(last=False)
+    return body, etag
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+def etag_response(request: Request, payload, max_age: int = 60, memoize: bool = True) -> Response:
+    """
+    payload를 JSON으로 응답합니다.
+    요청의 If-None-Match가 현재 ETag와 같으면 본문 없이 304를 반환합니다.
+    memoize는 캐시에서 꺼낸 값처럼 같은 객체가 반복해서 응답될 때만 켭니다.
+    """
+    body, etag = _serialize(payload, memoize)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}, must-revalidate"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,112 @@
+# back/api/widget/geo.py
+# 사용자 위치를 가장 가까운 기준 도시(날씨 캐시 버킷)로 맞추는 공간 인덱스
+
+import json
+import math
+import os
+
+CITIES_PATH = os.path.join(os.path.dirname(__file__), "data", "cities.json")
+
+# 위치 정보가 없을 때 사용할 기본 도시
+DEFAULT_CITY_ID = "Daejeon"
+
+
+def _to_unit_vector(lat: float, lon: float):
+    """
+    위도/경도를 단위 구 위의 3차원 좌표로 바꿉니다.
+    3차원 직선 거리는 대원 거리와 순서가 같아서, 경도 경계(180도) 문제 없이 최근접 도시를 찾을 수 있습니다.
+    """
+    lat_r = math.radians(lat)
+    lon_r = math.radians(lon)
+    return (
+        math.cos(lat_r) * math.cos(lon_r),
+        math.cos(lat_r) * math.sin(lon_r),
+        math.sin(lat_r),
+    )
+
+
+class _KDNode:
+    __slots__ = ("point", "city", "axis", "left", "right")
+
+    def __init__(self, point, city, axis, left, right):
+        self.point = point
+        self.city = city
+        self.axis = axis
+        self.left = left
+        self.right = right
+
+
+class CityIndex:
+    """기준 도시 목록에 대한 3차원 k-d 트리"""
+
+    def __init__(self, cities: list):
+        self.cities = cities
+        self._by_name = {}
+        for city in cities:
+            self._by_name[city["id"].lower()] = city
+            if city.get("name_ko"):
+                self._by_name[city["name_ko"]] = city
+        points = [(_to_unit_vector(c["lat"], c["lon"]), c) for c in cities]
+        self._root = self._build(points, 0)
+
+    def _build(self, points: list, depth: int):
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda p: p[0][axis])
+        mid = len(points) // 2
+        point, city = points[mid]
+        return _KDNode(
+            point,
+            city,
+            axis,
+            self._build(points[:mid], depth + 1),
+            self._build(points[mid + 1:], depth + 1),
+        )
+
+    def nearest(self, lat: float, lon: float) -> dict:
+        """좌표에서 가장 가까운 기준 도시를 반환합니다."""
+        target = _to_unit_vector(lat, lon)
+        best = [None, float("inf")]
+
+        def search(node):
+            if node is None:
+                return
+            dist = sum((a - b) ** 2 for a, b in zip(node.point, target))
+            if dist < best[1]:
+                best[0], best[1] = node.city, dist
+            diff = target[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            search(near)
+            # 분할 평면까지의 거리가 현재 최단 거리보다 가까울 때만 반대쪽을 탐색
+            if diff * diff < best[1]:
+                search(far)
+
+        search(self._root)
+        return best[0]
+
+    def find_by_name(self, name: str):
+        """도시 이름(영문 또는 한글)으로 기준 도시를 찾습니다. 없으면 None을 반환합니다."""
+        return self._by_name.get(name.strip().lower()) or self._by_name.get(name.strip())
+
+    def resolve(self, lat: float = None, lon: float = None, city: str = None) -> dict:
+        """
+        사용자 위치를 기준 도시로 맞춥니다.
+        좌표가 있으면 가장 가까운 도시, 도시 이름만 있으면 이름으로 찾은 도시, 둘 다 없으면 기본 도시를 반환합니다.
+        """
+        if lat is not None and lon is not None:
+            return self.nearest(lat, lon)
+        if city:
+            found = self.find_by_name(city)
+            if found is not None:
+                return found
+        return self._by_name[DEFAULT_CITY_ID.lower()]
+
+
+def _load_cities() -> list:
+    with open(CITIES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# 앱 시작 시 한 번 만드는 도시 인덱스
+city_index = CityIndex(_load_cities())
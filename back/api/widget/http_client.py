@@ -0,0 +1,68 @@
+# back/api/widget/http_client.py
+# 위젯 외부 API 호출에 공용으로 사용하는 httpx 클라이언트 풀
+
+import httpx
+
+from .upstream_replay import UPSTREAM_MODE, build_transport
+
+# 외부 API(업스트림)별 연결 제한과 타임아웃 설정
+# - max_connections: 해당 업스트림으로 동시에 열 수 있는 최대 연결 수
+# - max_keepalive: 재사용을 위해 유지하는 keep-alive 연결 수
+# - connect / read: 연결 수립 / 응답 대기 타임아웃 (초)
+UPSTREAM_CONFIGS = {
+    "weather": {"max_connections": 20, "max_keepalive": 10, "connect": 3.0, "read": 5.0},
+    "news": {"max_connections": 10, "max_keepalive": 5, "connect": 3.0, "read": 5.0},
+    "book": {"max_connections": 10, "max_keepalive": 5, "connect": 3.0, "read": 8.0},
+    "advice": {"max_connections": 10, "max_keepalive": 5, "connect": 3.0, "read": 5.0},
+    "randomDog": {"max_connections": 10, "max_keepalive": 5, "connect": 3.0, "read": 5.0},
+    # 이미지 프록시: 뉴스 썸네일은 호스트가 제각각이라 연결 수를 넉넉히 둡니다.
+    "image": {"max_connections": 20, "max_keepalive": 10, "connect": 3.0, "read": 10.0},
+}
+
+# 설정에 없는 업스트림에 사용할 기본값
+DEFAULT_CONFIG = {"max_connections": 10, "max_keepalive": 5, "connect": 3.0, "read": 5.0}
+
+# 업스트림 이름 -> AsyncClient (앱 수명 동안 재사용)
+_clients = {}
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    """업스트림 설정에 맞는 AsyncClient를 생성합니다."""
+    config = UPSTREAM_CONFIGS.get(name, DEFAULT_CONFIG)
+    limits = httpx.Limits(
+        max_connections=config["max_connections"],
+        max_keepalive_connections=config["max_keepalive"],
+        keepalive_expiry=30.0,
+    )
+    timeout = httpx.Timeout(config["read"], connect=config["connect"])
+    # WIDGET_UPSTREAM_MODE가 record/replay면 녹화/재생 transport를 사용합니다. (upstream_replay.py)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, transport=build_transport(name, limits))
+
+
+def init_http_clients():
+    """앱 시작 시 모든 업스트림 클라이언트를 생성합니다. (main.py lifespan에서 호출)"""
+    for name in UPSTREAM_CONFIGS:
+        if name not in _clients:
+            _clients[name] = _build_client(name)
+    print(f"✅ 위젯 HTTP 클라이언트 풀 생성: {', '.join(_clients)}")
+    if UPSTREAM_MODE != "live":
+        print(f"⚠️ 위젯 업스트림 {UPSTREAM_MODE} 모드로 실행 중입니다.")
+
+
+async def close_http_clients():
+    """앱 종료 시 모든 업스트림 클라이언트의 연결을 닫습니다."""
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """
+    업스트림 이름에 해당하는 공용 클라이언트를 반환합니다.
+    lifespan 밖(스크립트 등)에서 호출되면 필요한 시점에 생성합니다.
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _build_client(name)
+        _clients[name] = client
+    return client
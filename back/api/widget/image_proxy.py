@@ -0,0 +1,447 @@
+# back/api/widget/image_proxy.py
+# 위젯 이미지(강아지 사진, 뉴스 썸네일, 알라딘 표지) 프록시와 디스크 썸네일 캐시
+# - 원본 이미지는 한 번만 받아 줄인 WebP/JPEG 썸네일로 저장하고, 이후에는 디스크에서 바로 응답합니다.
+# - 썸네일 파일 이름은 내용의 sha256이라 같은 이미지는 URL이 달라도 한 번만 저장됩니다. (content-addressed)
+# - 전체 크기가 한도를 넘으면 가장 오래 사용하지 않은 썸네일부터 지웁니다. (LRU)
+# - 스크랩된 이미지(scraps.image_url)는 고정(pin)되어 지워지지 않습니다.
+# - 열린 프록시가 되지 않도록 위젯이 돌려주는 이미지 호스트만 받고, DNS로 확인한 공개 IP로만 접속합니다.
+
+import asyncio
+import hashlib
+import ipaddress
+import io
+import os
+import socket
+from collections import OrderedDict
+from urllib.parse import urljoin, urlparse
+
+import httpx
+
+from .http_client import get_http_client
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+# 썸네일 캐시 디렉터리 (로컬 실행 시 생성, gitignore)
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(DATA_DIR, "image_cache"))
+# 썸네일 캐시 전체 크기 한도 (바이트, 고정된 썸네일도 포함해서 계산합니다)
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# 허용하는 썸네일 가로 크기 (임의의 크기로 캐시가 불어나지 않도록 가장 가까운 값으로 맞춥니다)
+THUMBNAIL_WIDTHS = (160, 320, 640)
+DEFAULT_THUMBNAIL_WIDTH = 320
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+# 원본 이미지 최대 크기 (바이트)
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+# 원본을 가져올 때 따라갈 최대 리다이렉트 수
+MAX_REDIRECTS = 5
+# 썸네일은 내용 주소로 저장되어 바뀌지 않으므로 브라우저가 오래 캐시해도 됩니다.
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600
+# 원본을 받을 수 있는 이미지 호스트 (이 도메인과 하위 도메인, 쉼표로 구분)
+# 강아지 사진(random.dog)과 알라딘 표지(image.aladin.co.kr). 뉴스 썸네일은 언론사마다 호스트가 달라
+# 뉴스 위젯이 받은 기사 이미지의 호스트를 allow_image_url로 더합니다.
+IMAGE_PROXY_ALLOWED_HOSTS = tuple(
+    host.strip().lower() for host in os.getenv("IMAGE_PROXY_ALLOWED_HOSTS", "random.dog,aladin.co.kr").split(",") if host.strip()
+)
+# 위젯 응답에서 더한 이미지 호스트를 최대 몇 개까지 기억할지 (오래된 것부터 잊습니다)
+MAX_WIDGET_IMAGE_HOSTS = 1000
+
+FORMATS = {
+    "webp": {"media_type": "image/webp", "pil": "WEBP", "options": {"quality": WEBP_QUALITY, "method": 4}},
+    "jpeg": {"media_type": "image/jpeg", "pil": "JPEG", "options": {"quality": JPEG_QUALITY, "optimize": True, "progressive": True}},
+}
+
+
+class ImageProxyError(Exception):
+    """원본 이미지를 가져오거나 줄이지 못했을 때 발생하는 예외"""
+
+
+def normalize_width(width: int = None) -> int:
+    """요청한 가로 크기를 허용된 썸네일 크기 중 가장 가까운 값으로 맞춥니다."""
+    if not width:
+        return DEFAULT_THUMBNAIL_WIDTH
+    return min(THUMBNAIL_WIDTHS, key=lambda w: abs(w - width))
+
+
+def choose_format(accept: str = None) -> str:
+    """브라우저가 WebP를 받을 수 있으면 WebP, 아니면 JPEG"""
+    return "webp" if accept and "image/webp" in accept else "jpeg"
+
+
+# 위젯 응답에 들어 있던 이미지 호스트 (최근에 본 순서)
+_widget_image_hosts = OrderedDict()
+
+
+def allow_image_url(url: str):
+    """위젯이 응답에 넣은 이미지 URL의 호스트를 프록시 허용 목록에 더합니다."""
+    try:
+        host = urlparse(url or "").hostname
+    except ValueError:
+        return
+    if not host:
+        return
+    _widget_image_hosts[host.lower()] = True
+    _widget_image_hosts.move_to_end(host.lower())
+    while len(_widget_image_hosts) > MAX_WIDGET_IMAGE_HOSTS:
+        _widget_image_hosts.popitem(last=False)
+
+
+def ensure_allowed_host(url: str) -> str:
+    """위젯이 돌려주는 이미지 호스트가 아니면 ValueError (임의의 URL을 대신 받아 주지 않도록)"""
+    host = (urlparse(url).hostname or "").lower()
+    if host in _widget_image_hosts:
+        return url
+    if any(host == allowed or host.endswith("." + allowed) for allowed in IMAGE_PROXY_ALLOWED_HOSTS):
+        return url
+    raise ValueError("위젯 이미지가 아닌 주소는 가져올 수 없습니다.")
+
+
+def validate_image_url(url: str) -> str:
+    """
+    프록시할 수 있는 URL인지 확인합니다.
+    http/https만 허용하고, 내부망 주소로 요청을 보내지 않도록 사설/루프백 IP와 localhost는 거부합니다.
+    """
+    parsed = urlparse(url or "")
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("http 또는 https 이미지 URL만 사용할 수 있습니다.")
+    host = parsed.hostname.lower()
+    if host == "localhost" or host.endswith(".localhost") or host.endswith(".internal"):
+        raise ValueError("내부 주소의 이미지는 가져올 수 없습니다.")
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        return url
+    if _is_internal_ip(ip):
+        raise ValueError("내부 주소의 이미지는 가져올 수 없습니다.")
+    return url
+
+
+def _is_internal_ip(ip) -> bool:
+    # ::ffff:127.0.0.1 같은 IPv4 매핑 주소는 IPv4 주소로 확인합니다.
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+            or ip.is_multicast or ip.is_unspecified)
+
+
+async def resolve_public_address(url: str) -> str:
+    """
+    validate_image_url에 더해 호스트 이름을 DNS로 조회해, 사설/루프백/링크 로컬 주소로 풀리는 URL도 거부합니다.
+    (공개 도메인이 169.254.169.254나 127.0.0.1을 가리키게 하는 우회를 막습니다)
+    확인한 IP 주소를 반환합니다. 접속할 때 이름을 다시 조회하면 다른 주소가 나올 수 있으므로(DNS rebinding) 이 IP로 접속해야 합니다.
+    """
+    validate_image_url(url)
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise ValueError("이미지 주소를 찾을 수 없습니다.")
+    addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+    if not addresses:
+        raise ValueError("이미지 주소를 찾을 수 없습니다.")
+    if any(_is_internal_ip(address) for address in addresses):
+        raise ValueError("내부 주소의 이미지는 가져올 수 없습니다.")
+    return str(addresses[0])
+
+
+def _build_pinned_request(client: httpx.AsyncClient, url: str, address: str) -> httpx.Request:
+    """
+    호스트 이름 대신 확인한 IP로 접속하는 요청을 만듭니다.
+    Host 헤더와 TLS SNI(인증서 확인 포함)는 원래 호스트 이름을 사용합니다.
+    """
+    parsed = urlparse(url)
+    host = f"[{address}]" if ":" in address else address
+    netloc = f"{host}:{parsed.port}" if parsed.port else host
+    extensions = {"sni_hostname": parsed.hostname} if parsed.scheme == "https" else {}
+    return client.build_request(
+        "GET", parsed._replace(netloc=netloc).geturl(),
+        headers={"Host": parsed.netloc.rsplit("@", 1)[-1]}, extensions=extensions,
+    )
+
+
+def _make_thumbnail(source: bytes, width: int, fmt: str) -> bytes:
+    """원본 이미지를 가로 width 이하로 줄여 fmt 형식으로 인코딩합니다. (CPU 작업이라 스레드에서 실행)"""
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(source)) as image:
+            # 움직이는 GIF 등은 첫 프레임만 사용합니다.
+            image.seek(0)
+            image = ImageOps.exif_transpose(image)
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                image = image.resize((width, height), Image.LANCZOS)
+            if fmt == "jpeg" or image.mode not in ("RGB", "RGBA"):
+                # JPEG는 투명도를 지원하지 않으므로 흰 배경에 합칩니다.
+                image = image.convert("RGBA")
+                if fmt == "jpeg":
+                    background = Image.new("RGB", image.size, (255, 255, 255))
+                    background.paste(image, mask=image.getchannel("A"))
+                    image = background
+            out = io.BytesIO()
+            image.save(out, FORMATS[fmt]["pil"], **FORMATS[fmt]["options"])
+            return out.getvalue()
+    except Exception as e:
+        raise ImageProxyError(f"이미지를 변환하지 못했습니다: {str(e)}")
+
+
+class ThumbnailCache:
+    """
+    디스크 썸네일 캐시
+    - 썸네일 파일: {디렉터리}/{digest[:2]}/{digest}.{webp|jpg}
+    - index.tsv: (URL, 가로 크기, 형식) 키 -> 썸네일 digest (한 줄씩 덧붙이는 기록, 시작 시 다시 읽음)
+    - pins.txt: 고정된 원본 URL 목록 (스크랩된 이미지)
+    """
+
+    def __init__(self, root: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.tsv")
+        self.pins_path = os.path.join(root, "pins.txt")
+        # 변형 키 -> (digest, 원본 URL)
+        self._index = {}
+        # digest -> 파일 크기 (오래 사용하지 않은 순서)
+        self._files = OrderedDict()
+        self._pinned_urls = set()
+        self._pinned_digests = set()
+        self.total_bytes = 0
+        self._inflight = {}
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.failures = 0
+
+    # --- 디스크 상태 ---
+
+    def _path(self, digest: str, fmt: str) -> str:
+        ext = "jpg" if fmt == "jpeg" else fmt
+        return os.path.join(self.root, digest[:2], f"{digest}.{ext}")
+
+    def _load(self):
+        """시작 시 디스크의 썸네일과 인덱스, 고정 목록을 읽습니다. 파일은 마지막 사용 시각 순으로 LRU에 넣습니다."""
+        os.makedirs(self.root, exist_ok=True)
+        if os.path.exists(self.pins_path):
+            with open(self.pins_path, encoding="utf-8") as f:
+                self._pinned_urls = {line.strip() for line in f if line.strip()}
+
+        found = []
+        for sub in os.listdir(self.root):
+            sub_dir = os.path.join(self.root, sub)
+            if len(sub) != 2 or not os.path.isdir(sub_dir):
+                continue
+            for name in os.listdir(sub_dir):
+                if name.endswith(".tmp"):
+                    # 쓰는 도중 종료되어 남은 임시 파일
+                    os.remove(os.path.join(sub_dir, name))
+                    continue
+                stat = os.stat(os.path.join(sub_dir, name))
+                found.append((stat.st_mtime, name.split(".")[0], stat.st_size))
+        for _, digest, size in sorted(found):
+            self._files[digest] = size
+            self.total_bytes += size
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) == 3 and parts[1] in self._files:
+                        self._index[parts[0]] = (parts[1], parts[2])
+                        if parts[2] in self._pinned_urls:
+                            self._pinned_digests.add(parts[1])
+        self._compact_index()
+        self._loaded = True
+        print(f"✅ 이미지 썸네일 캐시 로드: {len(self._files)}개, {self.total_bytes / 1024 / 1024:.1f}MB")
+
+    def _compact_index(self):
+        """지워진 썸네일을 가리키는 줄을 빼고 인덱스 파일을 다시 씁니다."""
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, (digest, url) in self._index.items():
+                f.write(f"{key}\t{digest}\t{url}\n")
+        os.replace(tmp_path, self.index_path)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._load()
+
+    @staticmethod
+    def variant_key(url: str, width: int, fmt: str) -> str:
+        return hashlib.sha256(f"{url}\n{width}\n{fmt}".encode("utf-8")).hexdigest()
+
+    def _touch(self, digest: str, path: str):
+        self._files.move_to_end(digest)
+        try:
+            # 재시작 후에도 LRU 순서를 유지하도록 파일 수정 시각을 사용 시각으로 씁니다.
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _lookup(self, key: str, fmt: str):
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        digest = entry[0]
+        path = self._path(digest, fmt)
+        if digest not in self._files or not os.path.exists(path):
+            self._index.pop(key, None)
+            return None
+        self._touch(digest, path)
+        return digest, path
+
+    def _store(self, key: str, url: str, fmt: str, data: bytes) -> tuple:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest, fmt)
+        if digest not in self._files:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._files[digest] = len(data)
+            self.total_bytes += len(data)
+        self._touch(digest, path)
+        self._index[key] = (digest, url)
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(f"{key}\t{digest}\t{url}\n")
+        if url in self._pinned_urls:
+            self._pinned_digests.add(digest)
+        self._evict()
+        return digest, path
+
+    def _evict(self):
+        """전체 크기가 한도를 넘으면 고정되지 않은 썸네일을 오래된 순서로 지웁니다."""
+        if self.total_bytes <= self.max_bytes:
+            return
+        for digest in list(self._files):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if digest in self._pinned_digests:
+                continue
+            size = self._files.pop(digest)
+            self.total_bytes -= size
+            self.evictions += 1
+            for ext in ("webp", "jpg"):
+                try:
+                    os.remove(os.path.join(self.root, digest[:2], f"{digest}.{ext}"))
+                except FileNotFoundError:
+                    pass
+        # 지워진 썸네일을 가리키는 인덱스는 다음 조회 때 정리됩니다.
+
+    # --- 원본 가져오기 ---
+
+    async def _download(self, url: str, address: str, client: httpx.AsyncClient) -> bytes:
+        """
+        원본 이미지를 받습니다. 첫 URL은 get()에서 확인한 IP(address)로 접속하고,
+        리다이렉트는 직접 따라가면서 매번 내부 주소인지 확인한 뒤 그 IP로 접속합니다.
+        (첫 URL이 공개 주소여도 리다이렉트로 내부망 주소를 가리킬 수 있습니다)
+        """
+        for hop in range(MAX_REDIRECTS + 1):
+            if hop:
+                try:
+                    address = await resolve_public_address(url)
+                except ValueError as e:
+                    raise ImageProxyError(f"리다이렉트 주소를 사용할 수 없습니다: {str(e)}")
+            request = _build_pinned_request(client, url, address)
+            response = await client.send(request, stream=True, follow_redirects=False)
+            try:
+                if response.is_redirect:
+                    url = urljoin(url, response.headers["location"])
+                    continue
+                response.raise_for_status()
+                content_type = response.headers.get("content-type", "")
+                if content_type and not content_type.startswith("image/"):
+                    raise ImageProxyError(f"이미지가 아닙니다: {content_type}")
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > MAX_SOURCE_BYTES:
+                        raise ImageProxyError("원본 이미지가 너무 큽니다.")
+                    chunks.append(chunk)
+                return b"".join(chunks)
+            finally:
+                await response.aclose()
+        raise ImageProxyError(f"리다이렉트가 너무 많습니다. (최대 {MAX_REDIRECTS}번)")
+
+    async def _fetch(self, key: str, url: str, address: str, width: int, fmt: str, client: httpx.AsyncClient):
+        try:
+            source = await self._download(url, address, client)
+            data = await asyncio.to_thread(_make_thumbnail, source, width, fmt)
+        except ImageProxyError:
+            self.failures += 1
+            raise
+        except Exception as e:
+            self.failures += 1
+            raise ImageProxyError(f"이미지를 가져오지 못했습니다: {str(e)}")
+        return self._store(key, url, fmt, data)
+
+    async def get(self, url: str, width: int = None, fmt: str = "webp", client: httpx.AsyncClient = None) -> tuple:
+        """
+        썸네일 (digest, 파일 경로)를 반환합니다. 없으면 원본을 한 번 받아 만듭니다.
+        같은 썸네일에 대한 동시 요청은 하나의 다운로드를 공유합니다.
+        """
+        self._ensure_loaded()
+        url = validate_image_url(url)
+        width = normalize_width(width)
+        key = self.variant_key(url, width, fmt)
+
+        found = self._lookup(key, fmt)
+        if found is not None:
+            self.hits += 1
+            return found
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            ensure_allowed_host(url)
+            address = await resolve_public_address(url)
+            # DNS를 조회하는 동안 다른 요청이 같은 썸네일을 받기 시작했을 수 있습니다.
+            task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, url, address, width, fmt, client or get_http_client("image")))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    # --- 고정 (스크랩된 이미지) ---
+
+    def pin(self, url: str):
+        """원본 URL의 썸네일을 고정해 LRU로 지워지지 않게 합니다."""
+        self._ensure_loaded()
+        if not url or url in self._pinned_urls:
+            return
+        self._pinned_urls.add(url)
+        with open(self.pins_path, "a", encoding="utf-8") as f:
+            f.write(url.replace("\n", "") + "\n")
+        for digest, indexed_url in self._index.values():
+            if indexed_url == url:
+                self._pinned_digests.add(digest)
+
+    async def pin_and_warm(self, url: str, width: int = None):
+        """스크랩할 때 호출합니다. URL을 고정하고 기본 크기 썸네일을 미리 만들어 둡니다."""
+        try:
+            validate_image_url(url)
+            self.pin(url)
+            for fmt in FORMATS:
+                await self.get(url, width, fmt)
+        except Exception as e:
+            print(f"⚠️ 스크랩 이미지 썸네일 생성 실패 ({url}): {str(e)}")
+
+    def stats(self) -> dict:
+        self._ensure_loaded()
+        pinned_bytes = sum(self._files.get(digest, 0) for digest in self._pinned_digests)
+        return {
+            "files": len(self._files),
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "pinned_urls": len(self._pinned_urls),
+            "pinned_bytes": pinned_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "failures": self.failures,
+        }
+
+
+# 앱 전체에서 공유하는 썸네일 캐시
+thumbnail_cache = ThumbnailCache()
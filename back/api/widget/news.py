@@ -1,9 +1,17 @@
+import hashlib
 import httpx
+import json
 import os
+from collections import OrderedDict
+
+from .http_client import get_http_client
+from .breaker import get_breaker
+from .quota import quota_scheduler
+from .image_proxy import allow_image_url
 
 API_URL = "https://newsapi.org/v2/top-headlines"
 
-async def get_news_data():
+async def get_news_data(client: httpx.AsyncClient = None):
     """뉴스 정보를 가져옵니다."""
     NEWS_API_KEY = os.getenv("NEWS_API_KEY")
     if not NEWS_API_KEY:
@@ -14,10 +22,148 @@ async def get_news_data():
         "apiKey": NEWS_API_KEY,
         "pageSize": 5
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(API_URL, params=params)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            return {"error": f"뉴스 정보를 가져오는 데 실패했습니다: {str(e)}"}
\ No newline at end of file
+    client = client or get_http_client("news")
+    try:
+        response = await quota_scheduler.call(
+            "news", params["country"], lambda: get_breaker("news").call(lambda: client.get(API_URL, params=params))
+        )
+        response.raise_for_status()
+        data = response.json()
+        # 기사 이미지는 언론사마다 호스트가 달라서, 받은 기사 이미지의 호스트를 이미지 프록시 허용 목록에 더합니다.
+        for article in data.get("articles") or []:
+            allow_image_url(article.get("urlToImage"))
+        return data
+    except Exception as e:
+        return {"error": f"뉴스 정보를 가져오는 데 실패했습니다: {str(e)}"}
+
+
+# --- 헤드라인 델타 동기화 ---
+# 클라이언트가 같은 헤드라인을 반복해서 받지 않도록, 서버가 헤드라인을 기사 해시로 중복 제거해 모아 두고
+# since 커서 이후에 새로 나오거나 바뀐 헤드라인만 돌려줍니다.
+
+# 보관할 최대 헤드라인 수 (이보다 오래된 헤드라인은 밀려납니다)
+MAX_HEADLINES = 200
+
+
+def article_hash(article: dict) -> str:
+    """기사의 안정적인 해시. URL이 있으면 URL로, 없으면 (제목, 출처)로 만듭니다."""
+    url = (article.get("url") or "").strip().rstrip("/")
+    if url:
+        key = url
+    else:
+        key = f"{(article.get('title') or '').strip()}\n{((article.get('source') or {}).get('name') or '').strip()}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _fingerprint(article: dict) -> str:
+    return hashlib.sha256(json.dumps(article, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class HeadlineStore:
+    """
+    중복 제거된 헤드라인 저장소
+    - 기사 해시 -> (헤드라인, 내용 지문, 마지막으로 바뀐 순번)
+    - 새 헤드라인이 들어오거나 내용이 바뀔 때, 보여줄 헤드라인 순서가 바뀔 때(빠지거나 순서만 바뀐 경우 포함)마다
+      순번이 1씩 증가하고, 커서는 "{epoch}.{순번}"입니다.
+    - epoch는 서버가 시작될 때마다 바뀌므로, 재시작 전 커서로 요청하면 전체 목록을 다시 보냅니다.
+    """
+
+    def __init__(self, max_headlines: int = MAX_HEADLINES):
+        self.max_headlines = max_headlines
+        self.epoch = os.urandom(4).hex()
+        self.seq = 0
+        # 밀려난 헤드라인 중 가장 큰 순번 (이보다 오래된 커서는 델타를 만들 수 없습니다)
+        self.pruned_seq = 0
+        self._articles = OrderedDict()
+        self._current = []
+        # 현재 헤드라인 순서가 마지막으로 바뀐 순번
+        self._current_seq = 0
+        self._last_payload = None
+
+    def cursor(self) -> str:
+        return f"{self.epoch}.{self.seq}"
+
+    def _parse_cursor(self, since: str):
+        epoch, _, seq = (since or "").partition(".")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq < self.pruned_seq or seq > self.seq:
+            return None
+        return seq
+
+    def ingest(self, payload: dict):
+        """
+        projection을 거친 뉴스 응답을 저장소에 반영합니다.
+        같은 캐시 값 객체는 한 번만 반영하므로, 업스트림을 한 번 호출하면 모든 클라이언트의 델타가 만들어집니다.
+        """
+        if payload is self._last_payload or not isinstance(payload, dict) or "error" in payload:
+            return
+        self._last_payload = payload
+        current = []
+        shown = set(self._current)
+        for article in payload.get("articles") or []:
+            key = article_hash(article)
+            fingerprint = _fingerprint(article)
+            entry = self._articles.get(key)
+            # 목록에서 빠졌다가 다시 나온 헤드라인도 바뀐 것으로 보냅니다. (클라이언트가 이미 버렸을 수 있습니다)
+            if entry is None or entry[1] != fingerprint or key not in shown:
+                # 순번 순서를 유지하도록 바뀐 헤드라인은 맨 뒤로 보냅니다.
+                self.seq += 1
+                self._articles[key] = ({"id": key, **article}, fingerprint, self.seq)
+                self._articles.move_to_end(key)
+            current.append(key)
+        if current != self._current:
+            # 헤드라인이 빠지거나 순서만 바뀐 경우에도 커서가 앞으로 가야 클라이언트가 새 순서를 받습니다.
+            self.seq += 1
+            self._current = current
+            self._current_seq = self.seq
+        while len(self._articles) > self.max_headlines:
+            _, (_, _, seq) = self._articles.popitem(last=False)
+            self.pruned_seq = max(self.pruned_seq, seq)
+
+    def snapshot(self, payload: dict) -> dict:
+        """현재 헤드라인 전체와 다음 요청에 쓸 커서"""
+        self.ingest(payload)
+        return {
+            "articles": [self._articles[key][0] for key in self._current],
+            "current": list(self._current),
+            "cursor": self.cursor(),
+            "reset": True,
+        }
+
+    def delta(self, payload: dict, since: str = None) -> dict:
+        """
+        since 커서 이후에 새로 나오거나 바뀐 헤드라인만 반환합니다.
+        - current: 지금 보여줄 헤드라인 id 순서 (since 이후 순서가 바뀐 경우에만, 클라이언트가 가진 헤드라인과 합쳐서 사용)
+        - reset: True면 articles가 전체 목록이므로 클라이언트가 가진 헤드라인을 버립니다.
+        """
+        if isinstance(payload, dict) and "error" in payload:
+            return payload
+        self.ingest(payload)
+        seq = self._parse_cursor(since)
+        if seq is None:
+            return self.snapshot(payload)
+        # 저장소는 순번 순서이므로 뒤에서부터 since 이후의 헤드라인만 봅니다.
+        changed = []
+        for article, _, changed_seq in reversed(self._articles.values()):
+            if changed_seq <= seq:
+                break
+            changed.append(article)
+        changed.reverse()
+        result = {"articles": changed, "cursor": self.cursor(), "reset": False}
+        if self._current_seq > seq:
+            result["current"] = list(self._current)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "headlines": len(self._articles),
+            "max_headlines": self.max_headlines,
+            "current": len(self._current),
+            "cursor": self.cursor(),
+        }
+
+
+# 앱 전체에서 공유하는 헤드라인 저장소
+headline_store = HeadlineStore()
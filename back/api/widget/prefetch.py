@@ -0,0 +1,155 @@
+# back/api/widget/prefetch.py
+# 위젯 공용 데이터를 캐시가 만료되기 전에 미리 갱신하는 백그라운드 스케줄러
+
+import asyncio
+import os
+import random
+import time
+
+from .cache import widget_cache, DEFAULT_POLICY
+from .quota import quota_scheduler
+from .registry import WIDGETS, resolve_location, cache_key, make_fetcher, make_sync_fetcher
+
+# city 범위 위젯(날씨)을 미리 받아둘 도시 목록 (쉼표로 구분, 예: "Daejeon,Seoul,Busan" / data/cities.json의 기준 도시로 맞춰집니다)
+PREFETCH_CITIES = [c.strip() for c in os.getenv("WIDGET_PREFETCH_CITIES", "Daejeon").split(",") if c.strip()]
+
+# TTL의 몇 % 시점에 갱신할지 (만료 전에 갱신해 사용자 요청이 항상 신선한 캐시를 만나도록)
+REFRESH_RATIO = 0.8
+
+# 갱신 주기에 더하는 무작위 지연 비율 (여러 작업이 같은 순간에 몰리지 않도록)
+JITTER_RATIO = 0.1
+
+# 동시에 실행할 수 있는 갱신 작업 수
+MAX_CONCURRENCY = 3
+
+
+class PrefetchJob:
+    """하나의 캐시 키를 주기적으로 갱신하는 작업과 그 지연 시간 통계"""
+
+    def __init__(self, key: str, fetcher, policy: dict = None, cached: bool = True, upstream: str = None):
+        self.key = key
+        self.fetcher = fetcher
+        self.policy = policy or DEFAULT_POLICY
+        # 호출 한도를 확인할 업스트림 (한도가 줄어들면 갱신 주기를 늘립니다)
+        self.upstream = upstream
+        # False면 결과를 캐시에 넣지 않고 fetcher만 주기적으로 실행합니다. (동기화 작업 등)
+        self.cached = cached
+        self.interval = self.policy["ttl"] * REFRESH_RATIO
+        # 실패했을 때는 에러 캐시가 만료되는 시점에 다시 시도
+        self.retry_interval = self.policy["error_ttl"]
+        self.runs = 0
+        self.failures = 0
+        self.last_latency_ms = None
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.last_run_at = None
+
+    def record(self, latency_ms: float, ok: bool):
+        self.runs += 1
+        if not ok:
+            self.failures += 1
+        self.last_latency_ms = latency_ms
+        self.total_latency_ms += latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        self.last_run_at = time.time()
+
+    def stats(self) -> dict:
+        return {
+            "key": self.key,
+            "interval_sec": round(self.interval, 1),
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_latency_ms": round(self.last_latency_ms, 1) if self.last_latency_ms is not None else None,
+            "avg_latency_ms": round(self.total_latency_ms / self.runs, 1) if self.runs else None,
+            "max_latency_ms": round(self.max_latency_ms, 1),
+            "last_run_at": self.last_run_at,
+        }
+
+
+class PrefetchScheduler:
+    """등록된 작업들을 주기 + 지터로 실행하며, 동시 실행 수를 제한합니다."""
+
+    def __init__(self, cache, max_concurrency: int = MAX_CONCURRENCY, jitter_ratio: float = JITTER_RATIO):
+        self.cache = cache
+        self.jitter_ratio = jitter_ratio
+        self.max_concurrency = max_concurrency
+        self.jobs = {}
+        self._tasks = []
+        self._semaphore = None
+
+    def add_job(self, key: str, fetcher, policy: dict = None, cached: bool = True, upstream: str = None):
+        self.jobs[key] = PrefetchJob(key, fetcher, policy, cached, upstream)
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds + random.uniform(0, seconds * self.jitter_ratio)
+
+    async def _run_once(self, job: PrefetchJob):
+        async with self._semaphore:
+            started = time.perf_counter()
+            ok = True
+            # 업스트림 일일 한도가 줄어들면 캐시 TTL과 함께 다음 갱신 주기도 늘어납니다.
+            policy = quota_scheduler.stretch_policy(job.upstream, job.policy)
+            job.interval = policy["ttl"] * REFRESH_RATIO
+            try:
+                if job.cached:
+                    value = await self.cache.refresh(job.key, job.fetcher, policy)
+                else:
+                    value = await job.fetcher()
+                ok = not (isinstance(value, dict) and "error" in value)
+            except Exception as e:
+                ok = False
+                print(f"❌ 위젯 프리페치 실패 ({job.key}): {str(e)}")
+            job.record((time.perf_counter() - started) * 1000, ok)
+            return ok
+
+    async def _loop(self, job: PrefetchJob):
+        # 시작 직후 모든 작업이 한꺼번에 실행되지 않도록 첫 실행도 약간 흩어 놓습니다.
+        await asyncio.sleep(random.uniform(0, 2.0))
+        while True:
+            ok = await self._run_once(job)
+            await asyncio.sleep(self._jittered(job.interval if ok else job.retry_interval))
+
+    def start(self):
+        """앱 시작 시 모든 작업의 루프를 시작합니다."""
+        if self._tasks:
+            return
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._tasks = [asyncio.create_task(self._loop(job)) for job in self.jobs.values()]
+        print(f"✅ 위젯 프리페치 시작: {', '.join(self.jobs)}")
+
+    async def stop(self):
+        """앱 종료 시 모든 작업을 취소합니다."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "running": bool(self._tasks),
+            "max_concurrency": self.max_concurrency,
+            "jobs": [job.stats() for job in self.jobs.values()],
+        }
+
+
+def _build_scheduler() -> PrefetchScheduler:
+    """
+    위젯 선언에서 프리페치 작업을 만듭니다.
+    - prefetch가 켜진 global 위젯(뉴스, 신간)과 city 위젯(PREFETCH_CITIES의 도시별 날씨)
+    - sync가 선언된 위젯의 백그라운드 동기화(명언 모음)
+    user 범위 위젯은 사용자별 값이라 미리 받아두지 않습니다.
+    """
+    scheduler = PrefetchScheduler(widget_cache)
+    for spec in WIDGETS:
+        if spec.prefetch and spec.scope == "global":
+            scheduler.add_job(cache_key(spec), make_fetcher(spec), spec.cache, upstream=spec.upstream)
+        elif spec.prefetch and spec.scope == "city":
+            for city in PREFETCH_CITIES:
+                bucket = resolve_location(city=city)
+                scheduler.add_job(cache_key(spec, bucket), make_fetcher(spec, bucket), spec.cache, upstream=spec.upstream)
+        if spec.sync:
+            scheduler.add_job(f"{spec.name}:sync", make_sync_fetcher(spec), spec.sync_policy, cached=False)
+    return scheduler
+
+
+prefetch_scheduler = _build_scheduler()
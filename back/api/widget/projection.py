@@ -0,0 +1,65 @@
+# back/api/widget/projection.py
+# 업스트림 응답에서 프론트엔드 위젯이 실제로 사용하는 필드만 남기는 위젯별 projection
+
+from .cache import is_error_payload
+
+
+def _pick(data: dict, *keys) -> dict:
+    return {k: data.get(k) for k in keys}
+
+
+def project_weather(data: dict) -> dict:
+    """OpenWeatherMap 응답 → weatherWidget이 읽는 필드"""
+    return {
+        "name": data.get("name"),
+        "weather": [_pick(w, "main", "description", "icon") for w in (data.get("weather") or [])[:1]],
+        "main": _pick(data.get("main") or {}, "temp", "feels_like", "humidity"),
+        "wind": _pick(data.get("wind") or {}, "speed"),
+        "sys": _pick(data.get("sys") or {}, "sunrise", "sunset"),
+        "visibility": data.get("visibility"),
+    }
+
+
+def project_news(data: dict) -> dict:
+    """NewsAPI 응답 → newsWidget이 읽는 필드"""
+    return {
+        "articles": [
+            {
+                "title": a.get("title"),
+                "url": a.get("url"),
+                "urlToImage": a.get("urlToImage"),
+                "publishedAt": a.get("publishedAt"),
+                "source": {"name": (a.get("source") or {}).get("name")},
+            }
+            for a in (data.get("articles") or [])
+        ]
+    }
+
+
+def project_book(data: dict) -> dict:
+    """알라딘 ItemList 응답 → bookWidget이 읽는 필드"""
+    return {
+        "item": [_pick(item, "title", "author", "link", "cover", "isbn13") for item in (data.get("item") or [])]
+    }
+
+
+def project_random_dog(data: dict) -> dict:
+    """random.dog 응답 → 이미지 URL만"""
+    return _pick(data, "url")
+
+
+# 위젯 이름 -> projection 함수
+PROJECTIONS = {
+    "weather": project_weather,
+    "news": project_news,
+    "book": project_book,
+    "randomDog": project_random_dog,
+}
+
+
+def project(widget_name: str, data):
+    """위젯 응답을 작은 스키마로 줄입니다. 에러 응답은 그대로 둡니다."""
+    projection = PROJECTIONS.get(widget_name)
+    if projection is None or not isinstance(data, dict) or is_error_payload(data):
+        return data
+    return projection(data)
@@ -0,0 +1,198 @@
+# back/api/widget/push.py
+# 대시보드 위젯 업데이트 푸시 (Server-Sent Events)
+# - 서버 캐시가 갱신되면 그 값을 한 번만 직렬화해서, 해당 캐시 키를 구독 중인 모든 연결에 보냅니다.
+# - 연결마다 "캐시 키별 최신 값 하나"만 대기열에 두므로, 느린 클라이언트가 있어도 메모리가 구독한 키 수를 넘지 않습니다.
+# - 보낼 값을 오래 가져가지 않는 연결(느린 소비자)은 끊습니다. EventSource는 자동으로 다시 연결하고 최신 값부터 받습니다.
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from .cache import widget_cache, is_error_payload
+from .etag import _encode
+
+# 동시에 유지할 수 있는 최대 SSE 연결 수
+MAX_SUBSCRIBERS = int(os.getenv("WIDGET_STREAM_MAX_SUBSCRIBERS", "1000"))
+# 연결 하나가 구독할 수 있는 최대 캐시 키 수 (= 연결당 대기열 최대 길이)
+MAX_KEYS_PER_SUBSCRIBER = 16
+# 보낼 값이 있는데 이 시간 동안 가져가지 않으면 느린 소비자로 보고 연결을 끊습니다. (초)
+SLOW_CONSUMER_SEC = 30
+# 프록시가 유휴 연결을 끊지 않도록 보내는 주석 줄 간격 (초)
+# 이 간격마다 구독한 키의 캐시도 확인해서, 만료된 값은 갱신을 시작합니다. (갱신되면 푸시됩니다)
+HEARTBEAT_SEC = 15
+# 연결이 끊겼을 때 EventSource가 다시 연결하기까지 기다릴 시간 (밀리초)
+RETRY_MS = 5000
+
+
+def format_event(event: str, data: bytes, event_id: str = None) -> bytes:
+    """SSE 이벤트 하나를 바이트로 만듭니다. data는 한 줄 JSON입니다."""
+    head = f"event: {event}\n"
+    if event_id:
+        head += f"id: {event_id}\n"
+    return head.encode("utf-8") + b"data: " + data + b"\n\n"
+
+
+class Subscriber:
+    """SSE 연결 하나. 캐시 키별로 아직 보내지 않은 최신 이벤트 하나씩만 들고 있습니다."""
+
+    def __init__(self, sources: dict):
+        # 캐시 키 -> (fetcher, 캐시 정책)
+        self.sources = dict(list(sources.items())[:MAX_KEYS_PER_SUBSCRIBER])
+        self.keys = list(self.sources)
+        self._pending = OrderedDict()
+        self._wakeup = asyncio.Event()
+        # 대기열이 비어 있지 않게 된 시각 (느린 소비자 판단용)
+        self.pending_since = None
+        self.closed = False
+        self.sent = 0
+        self.coalesced = 0
+
+    def offer(self, key: str, event: bytes):
+        """이벤트를 대기열에 넣습니다. 같은 키의 이전 이벤트가 아직 남아 있으면 새 것으로 바꿉니다."""
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = event
+        self._pending.move_to_end(key)
+        if self.pending_since is None:
+            self.pending_since = time.monotonic()
+        self._wakeup.set()
+
+    def is_slow(self, now: float) -> bool:
+        return self.pending_since is not None and now - self.pending_since > SLOW_CONSUMER_SEC
+
+    async def next_events(self, timeout: float) -> list:
+        """대기 중인 이벤트를 모두 꺼냅니다. timeout 동안 없으면 빈 리스트"""
+        if not self._pending:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        events = list(self._pending.values())
+        self._pending.clear()
+        self.pending_since = None
+        self.sent += len(events)
+        return events
+
+    def close(self):
+        self.closed = True
+        self._wakeup.set()
+
+
+class WidgetBroadcaster:
+    """
+    캐시 갱신을 구독자들에게 나눠 보내는 브로드캐스터
+    - 캐시 키 -> 구독자 집합으로 관리해, 갱신된 키를 구독한 연결에만 보냅니다.
+    - 값은 갱신당 한 번만 직렬화하고, 내용이 이전과 같으면 보내지 않습니다.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._by_key = {}
+        self._subscribers = set()
+        # 캐시 키 -> 마지막으로 보낸 값의 ETag
+        self._last_etag = {}
+        self.published = 0
+        self.skipped_unchanged = 0
+        self.dropped_slow = 0
+        cache.add_listener(self.publish)
+
+    def subscribe(self, sources: dict):
+        """
+        구독자를 등록합니다. sources는 캐시 키 -> (fetcher, 캐시 정책)입니다.
+        연결 수가 한도를 넘으면 None
+        """
+        if len(self._subscribers) >= MAX_SUBSCRIBERS:
+            return None
+        subscriber = Subscriber(sources)
+        self._subscribers.add(subscriber)
+        for key in subscriber.keys:
+            self._by_key.setdefault(key, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.close()
+        self._subscribers.discard(subscriber)
+        for key in subscriber.keys:
+            subscribers = self._by_key.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    self._by_key.pop(key, None)
+                    self._last_etag.pop(key, None)
+
+    def _event(self, key: str, value) -> tuple:
+        body, etag = _encode({"key": key, "widget": key.split(":")[0], "data": value})
+        return format_event("widget", body, etag.strip('"')), etag
+
+    def publish(self, key: str, value):
+        """캐시에 새 값이 저장될 때 호출됩니다. (WidgetCache 리스너)"""
+        subscribers = self._by_key.get(key)
+        if not subscribers or is_error_payload(value):
+            return
+        event, etag = self._event(key, value)
+        if self._last_etag.get(key) == etag:
+            self.skipped_unchanged += 1
+            return
+        self._last_etag[key] = etag
+        self.published += 1
+        now = time.monotonic()
+        for subscriber in list(subscribers):
+            if subscriber.is_slow(now):
+                # 보낼 값을 오래 가져가지 않는 연결은 끊습니다.
+                self.dropped_slow += 1
+                self.unsubscribe(subscriber)
+                continue
+            subscriber.offer(key, event)
+
+    async def _load_current(self, subscriber: Subscriber, key: str):
+        fetcher, policy = subscriber.sources[key]
+        try:
+            value = await self.cache.get_or_fetch(key, fetcher, policy)
+        except Exception as e:
+            print(f"⚠️ 위젯 푸시 초기값 조회 실패 ({key}): {str(e)}")
+            return
+        if not is_error_payload(value):
+            subscriber.offer(key, self._event(key, value)[0])
+
+    def _keep_warm(self, subscriber: Subscriber):
+        """
+        구독한 키의 캐시가 만료됐으면 갱신을 시작합니다. (신선하면 아무 일도 하지 않습니다)
+        갱신은 캐시가 키별로 하나만 실행하고, 끝나면 publish로 모든 구독자에게 전달됩니다.
+        """
+        for key, (fetcher, policy) in subscriber.sources.items():
+            if self.cache.is_fresh(key):
+                continue
+            self.cache.refresh_in_background(key, fetcher, policy)
+
+    async def stream(self, subscriber: Subscriber):
+        """구독자의 SSE 응답 본문을 만드는 제너레이터. 처음에는 구독한 키의 현재 값을 보냅니다."""
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode("utf-8")
+            await asyncio.gather(*[self._load_current(subscriber, key) for key in subscriber.keys])
+            while not subscriber.closed:
+                events = await subscriber.next_events(HEARTBEAT_SEC)
+                if subscriber.closed:
+                    break
+                if not events:
+                    self._keep_warm(subscriber)
+                    yield b": ping\n\n"
+                    continue
+                yield b"".join(events)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "max_subscribers": MAX_SUBSCRIBERS,
+            "keys": {key: len(subscribers) for key, subscribers in self._by_key.items()},
+            "published": self.published,
+            "skipped_unchanged": self.skipped_unchanged,
+            "dropped_slow": self.dropped_slow,
+        }
+
+
+# 앱 전체에서 공유하는 브로드캐스터 (위젯 캐시 갱신을 구독합니다)
+widget_broadcaster = WidgetBroadcaster(widget_cache)
@@ -0,0 +1,240 @@
+# back/api/widget/quota.py
+# 위젯 업스트림 API 키별 호출 한도 관리 (토큰 버킷 + 같은 요청 합치기 + 한도에 따른 캐시 TTL 늘리기)
+# - 업스트림마다 분당/일일 토큰 버킷을 두고, 호출할 때마다 토큰을 하나씩 씁니다.
+# - 같은 리소스(같은 쿼리)에 대한 동시 호출은 하나의 업스트림 호출로 합칩니다.
+# - 일일 한도가 줄어들수록 캐시 TTL과 프리페치 주기를 늘려, 바쁜 시간에도 한도 안에서 마지막 값을 계속 보여줍니다.
+# - 토큰이 없으면 업스트림을 호출하지 않고 QuotaExceededError를 발생시킵니다. (캐시는 마지막 정상 값을 그대로 반환합니다)
+# - 서킷이 열려 있어 업스트림을 호출하지 않은 경우(CircuitOpenError)는 쓴 토큰을 돌려줍니다. (장애 중에 한도를 다 쓰지 않도록)
+# - 브레이커의 헤지 요청도 업스트림 호출이므로 토큰을 하나 쓰고, 토큰이 없으면 헤지하지 않습니다. (hedge_permit)
+
+import asyncio
+import os
+import time
+
+from .breaker import CircuitOpenError
+
+# 업스트림별 호출 한도 (API 키 하나당)
+# - per_minute: 분당 호출 수 (짧은 시간에 몰리는 호출을 막습니다)
+# - per_day: 하루 호출 수 (업체의 일일/월간 한도를 하루 단위로 나눈 값)
+QUOTA_CONFIGS = {
+    # OpenWeatherMap 무료: 분당 60회, 월 1,000,000회
+    "weather": {"per_minute": 60, "per_day": int(os.getenv("WEATHER_DAILY_QUOTA", "30000"))},
+    # NewsAPI 개발자 플랜: 하루 100회
+    "news": {"per_minute": 10, "per_day": int(os.getenv("NEWS_DAILY_QUOTA", "100"))},
+    # 알라딘 TTB: 하루 5,000회
+    "book": {"per_minute": 60, "per_day": int(os.getenv("ALADIN_DAILY_QUOTA", "5000"))},
+}
+
+# 분당 버킷이 이 시간 안에 채워지면 기다렸다가 호출합니다. (초, 넘으면 바로 QuotaExceededError)
+MAX_WAIT_SEC = 1.0
+# 일일 한도가 이 비율 아래로 남으면 캐시 TTL을 늘리기 시작합니다.
+STRETCH_START_RATIO = 0.5
+# 캐시 TTL을 최대 몇 배까지 늘릴지
+MAX_STRETCH = 8.0
+# 업스트림이 429를 주면서 Retry-After를 주지 않았을 때 호출을 멈출 시간 (초)
+DEFAULT_RETRY_AFTER = 60
+
+
+class QuotaExceededError(Exception):
+    """호출 한도를 다 써서 업스트림을 호출하지 않았을 때 발생하는 예외"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} 업스트림 호출 한도를 모두 사용했습니다. {retry_after:.0f}초 후 다시 시도합니다.")
+
+
+class TokenBucket:
+    """capacity개까지 쌓이고 초당 refill_rate개씩 채워지는 토큰 버킷"""
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.tokens
+
+    def wait_time(self, now: float) -> float:
+        """토큰 하나가 생길 때까지 기다려야 하는 시간 (초)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.refill_rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def refund(self, now: float):
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def drain(self, now: float):
+        self._refill(now)
+        self.tokens = min(self.tokens, 0)
+
+
+class UpstreamQuota:
+    """업스트림 API 키 하나의 분당/일일 버킷과 진행 중인 호출"""
+
+    def __init__(self, name: str, per_minute: int, per_day: int):
+        self.name = name
+        self.minute = TokenBucket(per_minute, per_minute / 60)
+        self.day = TokenBucket(per_day, per_day / 86400)
+        # 업스트림이 429로 호출을 막은 시각까지 (monotonic)
+        self.blocked_until = 0.0
+        # 리소스 -> 진행 중인 호출
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.refunded = 0
+        self.hedges = 0
+
+    def remaining_ratio(self, now: float) -> float:
+        return self.day.available(now) / self.day.capacity
+
+    def stretch_factor(self, now: float) -> float:
+        """일일 한도가 줄어든 만큼 캐시 TTL을 몇 배로 늘릴지"""
+        ratio = self.remaining_ratio(now)
+        if ratio >= STRETCH_START_RATIO:
+            return 1.0
+        return STRETCH_START_RATIO / max(ratio, STRETCH_START_RATIO / MAX_STRETCH)
+
+    async def _acquire(self):
+        now = time.monotonic()
+        if now < self.blocked_until:
+            self.rejected += 1
+            raise QuotaExceededError(self.name, self.blocked_until - now)
+        day_wait = self.day.wait_time(now)
+        if day_wait > 0:
+            self.rejected += 1
+            raise QuotaExceededError(self.name, day_wait)
+        wait = self.minute.wait_time(now)
+        if wait > MAX_WAIT_SEC:
+            self.rejected += 1
+            raise QuotaExceededError(self.name, wait)
+        # 기다리는 동안 다른 호출이 토큰을 쓰지 않도록 먼저 가져갑니다. (잠깐 음수가 될 수 있습니다)
+        self.minute.take(now)
+        self.day.take(now)
+        if wait > 0:
+            self.throttled += 1
+            await asyncio.sleep(wait)
+
+    def try_take(self) -> bool:
+        """헤지 요청용 토큰을 기다리지 않고 하나 씁니다. 바로 쓸 토큰이 없으면 False"""
+        now = time.monotonic()
+        if now < self.blocked_until or self.minute.wait_time(now) > 0 or self.day.wait_time(now) > 0:
+            return False
+        self.minute.take(now)
+        self.day.take(now)
+        self.calls += 1
+        self.hedges += 1
+        return True
+
+    def _check_response(self, response):
+        """업스트림이 429를 주면 Retry-After 동안 호출을 멈추고 분당 버킷을 비웁니다."""
+        if getattr(response, "status_code", 200) != 429:
+            return
+        retry_after = response.headers.get("retry-after", "")
+        seconds = float(retry_after) if retry_after.isdigit() else DEFAULT_RETRY_AFTER
+        now = time.monotonic()
+        self.blocked_until = now + seconds
+        self.minute.drain(now)
+        print(f"⚠️ {self.name} 업스트림이 호출 한도 초과(429)를 알렸습니다. {seconds:.0f}초 동안 호출하지 않습니다.")
+
+    async def _run(self, request_fn):
+        await self._acquire()
+        self.calls += 1
+        try:
+            response = await request_fn()
+        except CircuitOpenError:
+            # 업스트림을 호출하지 않았으므로 토큰을 돌려줍니다.
+            now = time.monotonic()
+            self.minute.refund(now)
+            self.day.refund(now)
+            self.calls -= 1
+            self.refunded += 1
+            raise
+        self._check_response(response)
+        return response
+
+    async def call(self, resource: str, request_fn):
+        """같은 리소스에 진행 중인 호출이 있으면 그 결과를 함께 사용하고, 없으면 토큰을 써서 호출합니다."""
+        task = self._inflight.get(resource)
+        if task is None:
+            task = asyncio.create_task(self._run(request_fn))
+            self._inflight[resource] = task
+            task.add_done_callback(lambda _: self._inflight.pop(resource, None))
+        else:
+            self.coalesced += 1
+        # 먼저 요청한 쪽이 취소되더라도 함께 기다리는 호출은 계속 진행되도록 shield
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "per_minute": self.minute.capacity,
+            "per_day": self.day.capacity,
+            "minute_tokens": round(self.minute.available(now), 2),
+            "day_tokens": round(self.day.available(now), 2),
+            "ttl_stretch": round(self.stretch_factor(now), 2),
+            "blocked_sec": round(max(0.0, self.blocked_until - now), 1),
+            "inflight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "refunded": self.refunded,
+            "hedges": self.hedges,
+        }
+
+
+class QuotaScheduler:
+    """업스트림별 호출 한도를 한 곳에서 관리합니다. 한도 설정이 없는 업스트림은 그대로 호출합니다."""
+
+    def __init__(self, configs: dict = QUOTA_CONFIGS):
+        self.quotas = {name: UpstreamQuota(name, **config) for name, config in configs.items()}
+
+    async def call(self, name: str, resource: str, request_fn):
+        """
+        request_fn(인자 없는 코루틴 함수)을 업스트림 한도 안에서 호출합니다.
+        resource는 같은 요청인지 판단하는 키입니다. (예: 날씨는 좌표, 뉴스는 국가)
+        """
+        quota = self.quotas.get(name)
+        if quota is None:
+            return await request_fn()
+        return await quota.call(resource, request_fn)
+
+    def hedge_permit(self, name: str):
+        """브레이커 call의 hedge_permit으로 넘길 함수를 반환합니다. 한도 설정이 없는 업스트림이면 None"""
+        quota = self.quotas.get(name)
+        return quota.try_take if quota is not None else None
+
+    def stretch_policy(self, name: str, policy: dict) -> dict:
+        """
+        일일 한도가 줄어든 만큼 ttl과 stale_ttl을 늘린 캐시 정책을 반환합니다.
+        한도가 넉넉하거나 한도 설정이 없는 업스트림이면 정책을 그대로 반환합니다.
+        """
+        quota = self.quotas.get(name)
+        if quota is None or policy is None:
+            return policy
+        factor = quota.stretch_factor(time.monotonic())
+        if factor == 1.0:
+            return policy
+        return {**policy, "ttl": policy["ttl"] * factor, "stale_ttl": policy["stale_ttl"] * factor}
+
+    def stats(self) -> dict:
+        return {name: quota.stats() for name, quota in self.quotas.items()}
+
+
+# 앱 전체에서 공유하는 호출 한도 스케줄러
+quota_scheduler = QuotaScheduler()
@@ -1,27 +1,132 @@
+import asyncio
+import random
+from collections import deque
+
 import httpx
 
+from .http_client import get_http_client
+from .breaker import get_breaker
+
 # 이 API는 별도의 키가 필요 없습니다.
 DOG_API_URL = "https://random.dog/woof.json"
 
-async def get_random_dog_image():
+# 위젯에 보여줄 수 있는 이미지 확장자 (gif, mp4, webm 등 제외)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# 미리 받아둘 이미지 URL 개수
+POOL_SIZE = 20
+# 남은 이미지가 이 개수 이하가 되면 백그라운드에서 다시 채웁니다.
+REFILL_THRESHOLD = 5
+# 한 번에 동시에 보내는 업스트림 요청 수
+REFILL_CONCURRENCY = 4
+# 한 번의 채우기에서 보내는 최대 업스트림 요청 수 (이미지가 아닌 응답이 계속 와도 무한히 요청하지 않도록)
+MAX_REFILL_REQUESTS = POOL_SIZE * 3
+# 풀이 비어 있고 보여줄 이미지도 없을 때 요청 경로에서 직접 시도하는 최대 횟수
+MAX_DIRECT_ATTEMPTS = 3
+
+
+def _is_image(data: dict) -> bool:
+    return isinstance(data, dict) and str(data.get('url', '')).lower().endswith(IMAGE_EXTENSIONS)
+
+
+async def _fetch_one(client: httpx.AsyncClient):
+    """업스트림에 한 번 요청해 응답을 반환합니다. 이미지가 아니면 None을 반환합니다."""
+    # 외부 API에 GET 요청을 보냅니다.
+    response = await get_breaker("randomDog").call(lambda: client.get(DOG_API_URL))
+    # HTTP 상태 코드가 200 (성공)이 아니면 에러를 발생시킵니다.
+    response.raise_for_status()
+    data = response.json()
+    return data if _is_image(data) else None
+
+
+class DogImagePool:
+    """
+    미리 검증한 강아지 이미지 URL을 담아두는 링 버퍼
+    - 요청은 풀에서 하나를 꺼내 O(1)로 응답합니다.
+    - 풀이 줄어들면 백그라운드에서 제한된 횟수/동시성으로 다시 채웁니다.
+    - 풀이 비면 최근에 보여준 이미지 중 하나를 대신 보여줍니다.
+    """
+
+    def __init__(self, size: int = POOL_SIZE):
+        self._pool = deque(maxlen=size)
+        # 풀이 비었을 때 대신 보여줄 최근 이미지들
+        self._recent = deque(maxlen=size)
+        self._refill_task = None
+        self.served_from_pool = 0
+        self.served_fallback = 0
+        self.upstream_requests = 0
+
+    def __len__(self):
+        return len(self._pool)
+
+    async def _refill(self, client: httpx.AsyncClient):
+        requests_sent = 0
+        while len(self._pool) < self._pool.maxlen and requests_sent < MAX_REFILL_REQUESTS:
+            batch = min(REFILL_CONCURRENCY, MAX_REFILL_REQUESTS - requests_sent)
+            requests_sent += batch
+            self.upstream_requests += batch
+            results = await asyncio.gather(*[_fetch_one(client) for _ in range(batch)], return_exceptions=True)
+            images = [r for r in results if isinstance(r, dict)]
+            if not images and all(isinstance(r, Exception) for r in results):
+                # 업스트림이 전부 실패하면 이번 채우기는 중단합니다.
+                print(f"❌ 강아지 이미지 풀 채우기 실패: {results[0]}")
+                break
+            known = {item['url'] for item in self._pool}
+            for item in images:
+                if item['url'] not in known:
+                    self._pool.append(item)
+                    known.add(item['url'])
+
+    def refill_in_background(self, client: httpx.AsyncClient = None):
+        """진행 중인 채우기가 없으면 백그라운드에서 풀을 채우기 시작합니다."""
+        if self._refill_task is not None and not self._refill_task.done():
+            return
+        self._refill_task = asyncio.create_task(self._refill(client or get_http_client("randomDog")))
+
+    async def get(self, client: httpx.AsyncClient = None):
+        client = client or get_http_client("randomDog")
+        if len(self._pool) <= REFILL_THRESHOLD:
+            self.refill_in_background(client)
+
+        if self._pool:
+            item = self._pool.popleft()
+            self._recent.append(item)
+            self.served_from_pool += 1
+            return item
+
+        # 풀이 비었으면 최근에 보여준 이미지를 다시 보여줍니다.
+        if self._recent:
+            self.served_fallback += 1
+            return random.choice(self._recent)
+
+        # 서버 시작 직후처럼 보여줄 이미지가 하나도 없으면 제한된 횟수만 직접 요청합니다.
+        for _ in range(MAX_DIRECT_ATTEMPTS):
+            self.upstream_requests += 1
+            item = await _fetch_one(client)
+            if item is not None:
+                self._recent.append(item)
+                return item
+        return {"error": f"{MAX_DIRECT_ATTEMPTS}번 시도했지만 이미지 파일을 찾지 못했습니다."}
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": len(self._pool),
+            "capacity": self._pool.maxlen,
+            "served_from_pool": self.served_from_pool,
+            "served_fallback": self.served_fallback,
+            "upstream_requests": self.upstream_requests,
+        }
+
+
+# 앱 전체에서 공유하는 이미지 풀
+dog_image_pool = DogImagePool()
+
+
+async def get_random_dog_image(client: httpx.AsyncClient = None):
     """임의의 강아지 이미지 정보를 가져오는 함수"""
-    async with httpx.AsyncClient() as client:
-        try:
-            # 외부 API에 GET 요청을 보냅니다.
-            response = await client.get(DOG_API_URL)
-            
-            # HTTP 상태 코드가 200 (성공)이 아니면 에러를 발생시킵니다.
-            response.raise_for_status() 
-            
-            data = response.json()
-            # 이미지 파일만 반환하도록 필터링 (gif, mp4 등 제외)
-            if data['url'].endswith(('.jpg', '.jpeg', '.png')):
-                return data
-            else:
-                # 이미지가 아니면 재시도 (간단한 재귀 호출)
-                return await get_random_dog_image()
-
-        except httpx.HTTPStatusError as e:
-            return {"error": f"API 요청 실패: {e.response.status_code}"}
-        except Exception as e:
-            return {"error": f"알 수 없는 오류 발생: {str(e)}"}
\ No newline at end of file
+    try:
+        return await dog_image_pool.get(client)
+    except httpx.HTTPStatusError as e:
+        return {"error": f"API 요청 실패: {e.response.status_code}"}
+    except Exception as e:
+        return {"error": f"알 수 없는 오류 발생: {str(e)}"}
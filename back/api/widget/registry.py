@@ -0,0 +1,277 @@
+# back/api/widget/registry.py
+# 선언형 위젯 레지스트리
+# 위젯마다 fetcher, 캐시 TTL, 범위(scope), projection, 갱신 정책을 한 곳에 선언하면
+# 라우트/캐시/프리페치/지표가 이 선언으로부터 만들어집니다. 위젯 모듈은 처음 사용할 때 import합니다.
+
+import importlib
+import os
+import time
+
+from .cache import widget_cache, is_error_payload
+from .geo import city_index
+from .http_client import get_http_client
+from .projection import project
+from .quota import quota_scheduler
+
+# 한국어 명언 API에서 로컬 명언 모음으로 주기적으로 명언을 동기화할지
+ADVICE_UPSTREAM_SYNC = os.getenv("ADVICE_UPSTREAM_SYNC", "true").lower() == "true"
+
+
+class WidgetSpec:
+    """
+    위젯 하나의 선언
+    - name: 위젯 이름 (user_widgets.widget_name과 같음, 예: "random-dog")
+    - route: 엔드포인트 경로 (/api/widgets 아래)
+    - module, fetcher: 데이터를 가져오는 함수가 있는 모듈(api.widget 기준 상대 경로)과 함수 이름
+    - upstream: fetcher에 넘길 공용 HTTP 클라이언트 이름 (None이면 넘기지 않음)
+    - scope: "global"(모든 사용자 공유) / "city"(기준 도시별 공유) / "user"(사용자별)
+    - cache: 캐시 정책 {"ttl", "stale_ttl", "error_ttl"} (None이면 캐시하지 않음)
+    - projection: 응답을 줄일 projection 이름 (projection.PROJECTIONS의 키)
+    - prefetch: True면 캐시가 만료되기 전에 백그라운드에서 미리 갱신
+    - sync, sync_policy: 주기적으로 실행할 백그라운드 동기화 함수 이름과 주기 정책
+      (동기화 함수에는 upstream, 없으면 위젯 이름과 같은 HTTP 클라이언트를 넘깁니다)
+    - on_startup: 앱 시작 시 호출할 모듈 함수 이름 (모듈을 미리 import합니다)
+    - stats: 위젯 모듈이 제공하는 추가 통계 함수 이름 (모듈이 로드된 뒤에만 호출)
+    - delta: since 커서 이후에 바뀐 부분만 돌려주는 함수 이름 ((data, since) -> 응답, global 위젯만)
+    - max_age: 응답 Cache-Control max-age (초)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        route: str,
+        module: str,
+        fetcher: str,
+        description: str,
+        upstream: str = None,
+        scope: str = "global",
+        cache: dict = None,
+        projection: str = None,
+        prefetch: bool = False,
+        sync: str = None,
+        sync_policy: dict = None,
+        on_startup: str = None,
+        stats: str = None,
+        delta: str = None,
+        max_age: int = 60,
+    ):
+        self.name = name
+        self.route = route
+        self.module = module
+        self.fetcher = fetcher
+        self.description = description
+        self.upstream = upstream
+        self.scope = scope
+        self.cache = cache
+        self.projection = projection
+        self.prefetch = prefetch
+        self.sync = sync
+        self.sync_policy = sync_policy
+        self.on_startup = on_startup
+        self.stats = stats
+        self.delta = delta
+        self.max_age = max_age
+        self._module = None
+        # 위젯별 지표
+        self.requests = 0
+        self.errors = 0
+        self.total_latency_ms = 0.0
+
+    def load_module(self):
+        """위젯 모듈을 처음 사용할 때 import합니다."""
+        if self._module is None:
+            self._module = importlib.import_module(self.module, package=__package__)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def function(self, path: str):
+        """모듈 안의 함수를 찾습니다. "dog_image_pool.stats"처럼 점으로 객체 메서드도 가리킬 수 있습니다."""
+        target = self.load_module()
+        for attr in path.split("."):
+            target = getattr(target, attr)
+        return target
+
+    def record(self, latency_ms: float, ok: bool):
+        self.requests += 1
+        self.total_latency_ms += latency_ms
+        if not ok:
+            self.errors += 1
+
+    def describe(self) -> dict:
+        """선언 내용과 지표를 반환합니다."""
+        info = {
+            "name": self.name,
+            "route": self.route,
+            "scope": self.scope,
+            "cache": self.cache,
+            "projection": self.projection,
+            "prefetch": self.prefetch,
+            "sync": self.sync,
+            "delta": self.delta is not None,
+            "module_loaded": self.loaded,
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_latency_ms": round(self.total_latency_ms / self.requests, 1) if self.requests else None,
+        }
+        if self.stats and self.loaded:
+            info["module_stats"] = self.function(self.stats)()
+        return info
+
+
+WIDGETS = [
+    WidgetSpec(
+        name="random-dog",
+        route="/randomDog",
+        module=".randomDog",
+        fetcher="get_random_dog_image",
+        description="랜덤 강아지 위젯 데이터를 반환합니다.",
+        upstream="randomDog",
+        projection="randomDog",
+        # 이미지 풀에서 매번 다른 이미지를 꺼내므로 캐시하지 않습니다.
+        on_startup="dog_image_pool.refill_in_background",
+        stats="dog_image_pool.stats",
+        max_age=0,
+    ),
+    WidgetSpec(
+        name="advice",
+        route="/advice",
+        module=".advice",
+        fetcher="get_daily_advice",
+        description="오늘의 명언 위젯 데이터를 반환합니다. user_id가 있으면 사용자별로 하루 동안 같은 명언을 보여줍니다.",
+        scope="user",
+        # 로컬 명언 모음에서 바로 응답하므로 캐시하지 않고, 업스트림은 명언 모음 동기화에만 사용합니다.
+        sync="sync_from_upstream" if ADVICE_UPSTREAM_SYNC else None,
+        sync_policy={"ttl": 3600, "stale_ttl": 0, "error_ttl": 60},
+        max_age=300,
+    ),
+    WidgetSpec(
+        name="book",
+        route="/book",
+        module=".book",
+        fetcher="get_new_book_list",
+        description="알라딘 신간 추천 리스트 위젯 데이터를 반환합니다.",
+        upstream="book",
+        cache={"ttl": 6 * 3600, "stale_ttl": 24 * 3600, "error_ttl": 120},
+        projection="book",
+        prefetch=True,
+    ),
+    WidgetSpec(
+        name="weather",
+        route="/weather",
+        module=".weather",
+        fetcher="get_location_weather",
+        description="날씨 정보 위젯 데이터를 반환합니다. 사용자 위치(lat/lon 또는 도시 이름)를 가장 가까운 기준 도시로 맞춰, 같은 지역 사용자들이 캐시를 공유합니다.",
+        upstream="weather",
+        scope="city",
+        cache={"ttl": 600, "stale_ttl": 1800, "error_ttl": 30},
+        projection="weather",
+        prefetch=True,
+    ),
+    WidgetSpec(
+        name="news",
+        route="/news",
+        module=".news",
+        fetcher="get_news_data",
+        description="뉴스 정보 위젯 데이터를 반환합니다.",
+        upstream="news",
+        cache={"ttl": 900, "stale_ttl": 3600, "error_ttl": 60},
+        projection="news",
+        prefetch=True,
+        # 클라이언트가 since 커서를 보내면 새로 나오거나 바뀐 헤드라인만 돌려줍니다.
+        delta="headline_store.delta",
+        stats="headline_store.stats",
+    ),
+]
+
+_widgets_by_name = {spec.name: spec for spec in WIDGETS}
+
+
+def get_widget(name: str):
+    """위젯 이름으로 선언을 찾습니다. 없으면 None (프론트엔드가 직접 데이터를 가져오는 위젯)"""
+    return _widgets_by_name.get(name)
+
+
+def resolve_location(lat: float = None, lon: float = None, city: str = None) -> dict:
+    """
+    city 범위 위젯의 위치를 기준 도시(버킷)로 맞춥니다.
+    기준 도시 목록에 없는 이름은 이름 그대로 조회하는 버킷을 만듭니다.
+    """
+    has_coords = lat is not None and lon is not None
+    if city and not has_coords and city_index.find_by_name(city) is None:
+        name = city.strip()
+        return {"id": f"name:{name.lower()}", "query": name}
+    return city_index.resolve(lat, lon, city)
+
+
+def cache_key(spec: WidgetSpec, scope_value=None) -> str:
+    """위젯과 범위 값으로 캐시 키를 만듭니다. (예: "news", "weather:Daejeon")"""
+    if spec.scope == "city":
+        return f"{spec.name}:{scope_value['id']}"
+    if spec.scope == "user":
+        return f"{spec.name}:{scope_value or ''}"
+    return spec.name
+
+
+def cache_policy(spec: WidgetSpec) -> dict:
+    """위젯의 캐시 정책. 업스트림의 일일 호출 한도가 줄어들면 ttl/stale_ttl을 늘린 정책을 반환합니다."""
+    return quota_scheduler.stretch_policy(spec.upstream, spec.cache)
+
+
+def make_fetcher(spec: WidgetSpec, scope_value=None):
+    """위젯 fetcher를 범위 값과 HTTP 클라이언트로 호출하고 projection을 적용하는 코루틴 함수를 만듭니다."""
+    async def fetch():
+        fn = spec.function(spec.fetcher)
+        kwargs = {"client": get_http_client(spec.upstream)} if spec.upstream else {}
+        if spec.scope == "global":
+            data = await fn(**kwargs)
+        else:
+            data = await fn(scope_value, **kwargs)
+        return project(spec.projection, data) if spec.projection else data
+    return fetch
+
+
+def make_sync_fetcher(spec: WidgetSpec):
+    """위젯의 백그라운드 동기화 함수를 호출하는 코루틴 함수를 만듭니다."""
+    async def sync():
+        kwargs = {"client": get_http_client(spec.upstream or spec.name)}
+        return await spec.function(spec.sync)(**kwargs)
+    return sync
+
+
+async def load_widget_delta(spec: WidgetSpec, since: str):
+    """위젯 데이터를 가져와 since 커서 이후에 바뀐 부분만 반환합니다."""
+    data = await load_widget(spec)
+    return spec.function(spec.delta)(data, since)
+
+
+async def load_widget(spec: WidgetSpec, lat: float = None, lon: float = None, city: str = None, user_id: str = None):
+    """선언에 따라 범위를 정하고, 캐시를 거쳐 위젯 데이터를 가져옵니다."""
+    if spec.scope == "city":
+        scope_value = resolve_location(lat, lon, city)
+    elif spec.scope == "user":
+        scope_value = user_id
+    else:
+        scope_value = None
+
+    started = time.perf_counter()
+    fetcher = make_fetcher(spec, scope_value)
+    try:
+        if spec.cache:
+            data = await widget_cache.get_or_fetch(cache_key(spec, scope_value), fetcher, cache_policy(spec))
+        else:
+            data = await fetcher()
+    except Exception:
+        spec.record((time.perf_counter() - started) * 1000, False)
+        raise
+    spec.record((time.perf_counter() - started) * 1000, not is_error_payload(data))
+    return data
+
+
+def run_startup_hooks():
+    """앱 시작 시 위젯들의 on_startup 함수를 호출합니다."""
+    for spec in WIDGETS:
+        if spec.on_startup:
+            spec.function(spec.on_startup)()
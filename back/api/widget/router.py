@@ -1,13 +1,28 @@
 # api/widget/router.py
 # 위젯 관련 API 라우터 모듈
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+import asyncio
+import time
 import uuid
+from collections import OrderedDict
 
-from . import randomDog, advice, book, weather, news  
-from .scrap import ScrapData, create_scrap, delete_scrap, check_scrap_exists
+from .scrap import (
+    ScrapData, ScrapBulkCheckRequest, create_scrap, delete_scrap, check_scrap_exists, check_scraps_bulk,
+    list_user_scraps, DEFAULT_SCRAP_PAGE_SIZE, MAX_SCRAP_PAGE_SIZE, DEFAULT_SCRAP_TIMEZONE,
+)
+from .cache import widget_cache
+from .prefetch import prefetch_scheduler
+from .breaker import breakers
+from .quota import quota_scheduler
+from .registry import WIDGETS, get_widget, load_widget, load_widget_delta, resolve_location, cache_key, cache_policy, make_fetcher
+from .push import widget_broadcaster
+from .scrap_search import scrap_search_index, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from .etag import etag_response, _etag_matches
+from .image_proxy import thumbnail_cache, choose_format, ImageProxyError, FORMATS, THUMBNAIL_MAX_AGE
 from db.connect import supabase
 
 
@@ -16,30 +31,143 @@ router = APIRouter(
     tags=["Widgets"],
 )
 
-@router.get("/randomDog")
-async def get_random_dog_widget_data():
-    """랜덤 강아지 위젯 데이터를 반환합니다."""
-    return await random_dog.get_random_dog_image()
+# --- 위젯 엔드포인트 ---
+# registry.py의 위젯 선언에서 엔드포인트를 만듭니다. 위젯 모듈은 첫 요청 때 import됩니다.
+# 응답에 ETag를 붙여, 내용이 바뀌지 않았으면 클라이언트 재검증 시 304를 반환합니다.
+# 매번 다른 값을 주는 위젯(max_age=0)은 ETag 직렬화 결과를 기억하지 않습니다.
+
+def _widget_endpoint(spec):
+    """위젯 범위(scope)에 맞는 쿼리 파라미터를 받는 엔드포인트 함수를 만듭니다."""
+    memoize = spec.max_age > 0
+
+    if spec.scope == "city":
+        async def endpoint(request: Request, lat: Optional[float] = None, lon: Optional[float] = None, city: Optional[str] = None):
+            return etag_response(request, await load_widget(spec, lat=lat, lon=lon, city=city), max_age=spec.max_age, memoize=memoize)
+    elif spec.delta:
+        async def endpoint(request: Request, since: Optional[str] = None):
+            # since가 없으면 전체 응답, 있으면 (빈 값 포함) 커서 이후의 변경분과 다음 커서를 반환합니다.
+            if since is None:
+                return etag_response(request, await load_widget(spec), max_age=spec.max_age, memoize=memoize)
+            return etag_response(request, await load_widget_delta(spec, since), max_age=spec.max_age, memoize=False)
+    elif spec.scope == "user":
+        async def endpoint(request: Request, user_id: Optional[str] = None):
+            return etag_response(request, await load_widget(spec, user_id=user_id), max_age=spec.max_age, memoize=memoize)
+    else:
+        async def endpoint(request: Request):
+            return etag_response(request, await load_widget(spec), max_age=spec.max_age, memoize=memoize)
+    return endpoint
+
+for _spec in WIDGETS:
+    router.add_api_route(
+        _spec.route,
+        _widget_endpoint(_spec),
+        methods=["GET"],
+        name=f"get_{_spec.name.replace('-', '_')}_widget_data",
+        description=_spec.description,
+    )
+
+@router.get("/stream")
+async def stream_widget_updates(
+    request: Request,
+    user_id: Optional[uuid.UUID] = None,
+    widgets: Optional[str] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    city: Optional[str] = None,
+):
+    """
+    위젯 업데이트를 Server-Sent Events로 보냅니다. 대시보드는 한 번만 연결하면 되고, 위젯 엔드포인트를 다시 폴링할 필요가 없습니다.
+    - widgets: 구독할 위젯 이름 (쉼표 구분) / 없으면 user_id의 위젯 설정을 사용
+    - lat, lon, city: 날씨처럼 지역별 위젯의 위치
+    - 처음에 현재 값을 보내고, 이후에는 서버 캐시가 갱신될 때마다 "widget" 이벤트({key, widget, data})를 보냅니다.
+    서버 캐시를 쓰지 않는 위젯(랜덤 강아지, 명언)은 푸시하지 않습니다.
+    """
+    if widgets:
+        names = [name.strip() for name in widgets.split(",") if name.strip()]
+    elif user_id is not None:
+        names = [w["widget_name"] for w in await get_user_widgets(user_id)]
+    else:
+        raise HTTPException(status_code=400, detail="widgets 또는 user_id가 필요합니다.")
 
-@router.get("/advice")
-async def get_advice_widget_data():
-    """오늘의 명언 위젯 데이터를 반환합니다."""
-    return await advice.get_random_advice()
+    sources = {}
+    for name in names:
+        spec = get_widget(name)
+        if spec is None or not spec.cache or spec.scope == "user":
+            continue
+        scope_value = resolve_location(lat, lon, city) if spec.scope == "city" else None
+        sources[cache_key(spec, scope_value)] = (make_fetcher(spec, scope_value), cache_policy(spec))
+
+    subscriber = widget_broadcaster.subscribe(sources)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="동시 연결 수가 너무 많습니다. 잠시 후 다시 시도해 주세요.")
+    return StreamingResponse(
+        widget_broadcaster.stream(subscriber),
+        media_type="text/event-stream",
+        # 프록시(nginx 등)가 이벤트를 모아 두지 않도록 버퍼링을 끕니다.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/stream/stats")
+async def get_widget_stream_stats():
+    """SSE 연결 수와 키별 구독자 수, 푸시/중복 생략/느린 연결 끊기 횟수를 반환합니다."""
+    return widget_broadcaster.stats()
+
+@router.get("/image")
+async def get_widget_image(request: Request, url: str, w: Optional[int] = Query(None, ge=1, le=2048)):
+    """
+    위젯 이미지(강아지 사진, 뉴스 썸네일, 책 표지)를 줄인 썸네일로 반환합니다.
+    - w: 원하는 가로 크기 (160/320/640 중 가장 가까운 값으로 맞춥니다)
+    - 브라우저가 WebP를 받을 수 있으면 WebP, 아니면 JPEG로 응답합니다.
+    - 원본을 가져오지 못하면 502를 반환합니다. (임의의 URL로 보내는 리다이렉트가 되지 않도록 원본 URL로 보내지 않습니다)
+    """
+    fmt = choose_format(request.headers.get("accept"))
+    try:
+        digest, path = await thumbnail_cache.get(url, w, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImageProxyError as e:
+        print(f"⚠️ 이미지 프록시 실패 ({url}): {str(e)}")
+        raise HTTPException(status_code=502, detail=str(e), headers={"Cache-Control": "no-store"})
 
-@router.get("/book")
-async def get_book_widget_data():
-    """알라딘 신간 추천 리스트 위젯 데이터를 반환합니다."""
-    return await book.get_new_book_list()
+    # 썸네일은 내용 해시로 저장되므로 같은 URL이면 내용이 바뀌지 않습니다.
+    headers = {
+        "ETag": f'"{digest[:32]}"',
+        "Cache-Control": f"public, max-age={THUMBNAIL_MAX_AGE}, immutable",
+        "Vary": "Accept",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=FORMATS[fmt]["media_type"], headers=headers)
 
-@router.get("/weather")
-async def get_weather_widget_data():
-    """날씨 정보 위젯 데이터를 반환합니다."""
-    return await weather.get_weather_data()
+@router.get("/image/stats")
+async def get_widget_image_stats():
+    """이미지 썸네일 캐시의 크기와 적중/미스/삭제 카운터를 반환합니다."""
+    return thumbnail_cache.stats()
 
-@router.get("/news")
-async def get_news_widget_data():
-    """뉴스 정보 위젯 데이터를 반환합니다."""
-    return await news.get_news_data()
+@router.get("/cache/stats")
+async def get_widget_cache_stats():
+    """위젯 캐시의 적중/미스 카운터를 반환합니다."""
+    return widget_cache.stats()
+
+@router.get("/prefetch/stats")
+async def get_widget_prefetch_stats():
+    """위젯 프리페치 작업별 실행 횟수와 지연 시간 통계를 반환합니다."""
+    return prefetch_scheduler.stats()
+
+@router.get("/admin/widgets")
+async def get_widget_registry():
+    """등록된 위젯 선언과 위젯별 요청 수/에러 수/평균 지연 시간을 반환합니다."""
+    return [spec.describe() for spec in WIDGETS]
+
+@router.get("/admin/breakers")
+async def get_widget_breakers():
+    """업스트림별 서킷 브레이커 상태와 최근 에러율/지연 시간을 반환합니다."""
+    return {name: breaker.stats() for name, breaker in breakers.items()}
+
+@router.get("/admin/quotas")
+async def get_widget_quotas():
+    """업스트림별 호출 한도(남은 토큰, 합쳐진 호출, 캐시 TTL 배율)를 반환합니다."""
+    return quota_scheduler.stats()
 
 
 # --- Supabase DB 연동 API ---
@@ -49,47 +177,145 @@ class UserWidget(BaseModel):
     widget_name: str
     position: int
 
+# 사용자 위젯 설정 읽기 캐시 (user_id -> (저장 시각, rows))
+# 설정은 거의 바뀌지 않으므로 대시보드를 열 때마다 DB를 조회하지 않도록 합니다. 저장 시 무효화됩니다.
+USER_WIDGETS_CACHE_TTL = 300
+USER_WIDGETS_CACHE_MAX = 10000
+_user_widgets_cache = OrderedDict()
+
+def _get_cached_user_widgets(user_id: str):
+    cached = _user_widgets_cache.get(user_id)
+    if cached is None:
+        return None
+    cached_at, rows = cached
+    if time.monotonic() - cached_at > USER_WIDGETS_CACHE_TTL:
+        _user_widgets_cache.pop(user_id, None)
+        return None
+    _user_widgets_cache.move_to_end(user_id)
+    return rows
+
+def _set_cached_user_widgets(user_id: str, rows: list):
+    _user_widgets_cache[user_id] = (time.monotonic(), rows)
+    _user_widgets_cache.move_to_end(user_id)
+    while len(_user_widgets_cache) > USER_WIDGETS_CACHE_MAX:
+        _user_widgets_cache.popitem(last=False)
+
+def _invalidate_user_widgets(user_id: str):
+    _user_widgets_cache.pop(user_id, None)
+
 @router.get("/user/{user_id}")
 async def get_user_widgets(user_id: uuid.UUID):
-    """특정 사용자가 설정한 위젯 목록과 순서를 DB에서 가져옵니다."""
+    """특정 사용자가 설정한 위젯 목록과 순서를 가져옵니다. (캐시에 없을 때만 DB 조회)"""
+    cached = _get_cached_user_widgets(str(user_id))
+    if cached is not None:
+        return [dict(row) for row in cached]
     try:
         response = supabase.table('user_widgets').select('*').eq('user_id', str(user_id)).order('position').execute()
-        
-        if response.data:
-            return response.data
-        return [] # 설정된 위젯이 없으면 빈 리스트 반환
+        rows = response.data or [] # 설정된 위젯이 없으면 빈 리스트
+        _set_cached_user_widgets(str(user_id), rows)
+        return [dict(row) for row in rows]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- 대시보드 한 번에 불러오기 ---
+# 서버에서 데이터를 가져오는 위젯은 registry.py에 선언된 위젯입니다.
+# cat, music, stock, nasa 위젯은 프론트엔드가 직접 데이터를 가져오므로 선언이 없습니다.
+
+# 위젯 하나에 허용하는 최대 대기 시간 (초)
+# 느린 업스트림 하나가 대시보드 전체를 붙잡지 않도록 합니다.
+DASHBOARD_WIDGET_TIMEOUT = 2.5
+
+async def _load_dashboard_widget(widget_name: str, position: int, user_id: str):
+    """대시보드 위젯 하나의 데이터를 가져와 결과 슬롯으로 만듭니다."""
+    slot = {"widget_name": widget_name, "position": position, "status": "ok", "data": None, "error": None}
+    spec = get_widget(widget_name)
+    if spec is None:
+        slot["status"] = "client"
+        return slot
+
+    try:
+        data = await asyncio.wait_for(load_widget(spec, user_id=user_id), timeout=DASHBOARD_WIDGET_TIMEOUT)
+    except asyncio.TimeoutError:
+        slot["status"] = "timeout"
+        slot["error"] = f"{DASHBOARD_WIDGET_TIMEOUT}초 안에 응답하지 않았습니다."
+        return slot
+    except Exception as e:
+        slot["status"] = "error"
+        slot["error"] = str(e)
+        return slot
+
+    if isinstance(data, dict) and "error" in data:
+        slot["status"] = "error"
+        slot["error"] = data["error"]
+    else:
+        slot["data"] = data
+    return slot
+
+@router.get("/dashboard/{user_id}")
+async def get_dashboard(user_id: uuid.UUID, request: Request):
+    """
+    사용자의 위젯 목록과 각 위젯 데이터를 한 번에 반환합니다.
+    위젯 데이터는 동시에 가져오며, 실패하거나 시간을 초과한 위젯은 해당 슬롯에만 에러를 담습니다.
+    """
+    user_widgets = await get_user_widgets(user_id)
+    slots = await asyncio.gather(*[
+        _load_dashboard_widget(w["widget_name"], w.get("position"), str(user_id)) for w in user_widgets
+    ])
+    return etag_response(request, {"user_id": str(user_id), "widgets": slots}, max_age=0, memoize=False)
+
 @router.post("/user/{user_id}")
 async def set_user_widgets(user_id: uuid.UUID, widgets: List[UserWidget]):
-    """사용자의 위젯 설정을 DB에 저장(업데이트)합니다."""
+    """
+    사용자의 위젯 설정을 DB에 저장(업데이트)합니다.
+    기존 설정과 비교해 바뀐 위젯만 한 번의 upsert로, 빠진 위젯만 한 번의 delete로 반영합니다.
+    (기존 위젯의 id는 그대로 유지됩니다.)
+    """
     try:
-        # 1. 기존 위젯 설정을 모두 삭제합니다.
-        supabase.table('user_widgets').delete().eq('user_id', str(user_id)).execute()
+        # 1. 현재 설정을 가져옵니다. (캐시 우선)
+        current = await get_user_widgets(user_id)
+        current_by_name = {}
+        ids_to_delete = []
+        for row in current:
+            if row["widget_name"] in current_by_name:
+                # 예전 방식으로 중복 저장된 행은 정리합니다.
+                ids_to_delete.append(row["id"])
+            else:
+                current_by_name[row["widget_name"]] = row
+
+        # 2. 새 설정과 비교합니다. (같은 위젯이 여러 번 오면 첫 번째만 사용)
+        desired = {}
+        for w in widgets:
+            desired.setdefault(w.widget_name, w.position)
 
-        # 2. 새로운 위젯 설정 목록을 한 번에 추가합니다.
-        records_to_insert = [
-            {
-                "id": str(uuid.uuid4()), # 새 UUID 생성
+        records_to_upsert = []
+        for widget_name, position in desired.items():
+            existing = current_by_name.get(widget_name)
+            if existing is not None and existing.get("position") == position:
+                continue
+            records_to_upsert.append({
+                "id": existing["id"] if existing else str(uuid.uuid4()), # 기존 위젯은 id 유지
                 "user_id": str(user_id),
-                "widget_name": w.widget_name,
-                "position": w.position
-            } for w in widgets
-        ]
-        
-        if not records_to_insert:
-             return {"message": "User widgets cleared successfully."}
-
-        response = supabase.table('user_widgets').insert(records_to_insert).execute()
-
-        if response.data:
-            return response.data
-        else:
-            # Supabase v2부터는 insert 성공 시 error가 None이지만 data가 비어있을 수 있습니다.
-            return {"message": "User widgets updated successfully."}
+                "widget_name": widget_name,
+                "position": position
+            })
+        ids_to_delete += [row["id"] for name, row in current_by_name.items() if name not in desired]
 
+        # 3. 바뀐 부분만 반영합니다.
+        if records_to_upsert:
+            supabase.table('user_widgets').upsert(records_to_upsert).execute()
+        if ids_to_delete:
+            supabase.table('user_widgets').delete().in_('id', ids_to_delete).execute()
+        if records_to_upsert or ids_to_delete:
+            _invalidate_user_widgets(str(user_id))
+
+        if not desired:
+            return {"message": "User widgets cleared successfully."}
+        return await get_user_widgets(user_id)
+
+    except HTTPException:
+        raise
     except Exception as e:
+        _invalidate_user_widgets(str(user_id))
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- 스크랩 관련 API ---
@@ -109,38 +335,67 @@ async def check_scrap_endpoint(user_id: str, source_type: str, category: str, co
     exists = await check_scrap_exists(user_id, source_type, category, content)
     return {"exists": exists}
 
+@router.post("/scrap/check-bulk")
+async def check_scrap_bulk_endpoint(request: ScrapBulkCheckRequest):
+    """대시보드의 모든 항목에 대한 스크랩 상태를 한 번에 확인합니다."""
+    return await check_scraps_bulk(request)
+
+@router.get("/scrap/search")
+async def search_scraps_endpoint(
+    user_id: str,
+    q: str,
+    category: Optional[str] = None,
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0),
+):
+    """
+    사용자의 스크랩 내용과 카테고리를 검색합니다. (관련도순, 같으면 최신순)
+    - q: 검색어 (한글은 글자 2-gram, 영어는 단어/접두사로 찾습니다)
+    - category: 특정 카테고리만 검색
+    - limit, offset: 다음 페이지가 있으면 next_offset을 돌려줍니다.
+    """
+    try:
+        # SQLite 조회는 동기 호출이므로 이벤트 루프를 막지 않도록 스레드에서 실행합니다.
+        results, next_offset = await asyncio.to_thread(scrap_search_index.search, user_id, q, category, limit, offset)
+    except Exception as e:
+        print(f"❌ 스크랩 검색 오류: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"results": results, "next_offset": next_offset}
+
 @router.get("/scrap/list/{user_id}")
-async def get_user_scraps(user_id: str, date: str = None):
-    """사용자의 스크랩 목록을 가져옵니다."""
+async def get_user_scraps(
+    user_id: str,
+    response: Response,
+    date: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    tz: str = DEFAULT_SCRAP_TIMEZONE,
+    fields: Optional[str] = None,
+    limit: int = Query(DEFAULT_SCRAP_PAGE_SIZE, ge=1, le=MAX_SCRAP_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    사용자의 스크랩 목록을 최신순으로 가져옵니다.
+    - date: 하루만 조회 (YYYY-MM-DD, tz 기준 하루) / date_from, date_to: 기간 조회 (양 끝 포함)
+    - fields: 가져올 컬럼 (쉼표 구분, 예: "id,category,content,scraped_at")
+    - limit, cursor: 다음 페이지가 있으면 X-Next-Cursor 헤더로 커서를 돌려줍니다.
+    """
     try:
-        print(f"🔍 스크랩 조회 요청: user_id={user_id}, date={date}")
-        
-        query = supabase.table('scraps').select('*').eq('user_id', user_id)
-        
-        # 날짜 필터링이 있는 경우
-        if date:
-            # 날짜 범위 설정 (해당 날짜의 00:00:00 ~ 23:59:59)
-            from datetime import datetime, timedelta
-            start_date = datetime.strptime(date, '%Y-%m-%d')
-            end_date = start_date + timedelta(days=1)
-            
-            print(f"📅 날짜 필터링: {start_date.isoformat()} ~ {end_date.isoformat()}")
-            print(f"📅 요청된 날짜: {date}")
-            print(f"📅 시작 시간: {start_date.isoformat()}")
-            print(f"📅 종료 시간: {end_date.isoformat()}")
-            
-            query = query.gte('scraped_at', start_date.isoformat())
-            query = query.lt('scraped_at', end_date.isoformat())
-        else:
-            print("📅 날짜 필터링 없음 - 모든 스크랩 조회")
-        
-        response = query.order('scraped_at', desc=True).execute()
-        
-        print(f"📊 조회 결과: {len(response.data) if response.data else 0}개 스크랩")
-        
-        if response.data:
-            return response.data
-        return []
+        rows, next_cursor = await list_user_scraps(
+            user_id,
+            date_from=date_from or date,
+            date_to=date_to or date,
+            tz=tz,
+            fields=fields,
+            limit=limit,
+            cursor=cursor,
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ 스크랩 조회 오류: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
@@ -2,12 +2,43 @@
 # 스크랩 관련 API 함수들
 
 from fastapi import HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import unicodedata
 import uuid
-from datetime import datetime
+from datetime import datetime, date as date_type, time as time_type, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from db.connect import supabase
+from .image_proxy import thumbnail_cache
+from .scrap_search import scrap_search_index
+
+# 스크랩 id를 (user_id, content_hash)에서 결정적으로 만들기 위한 네임스페이스
+# 같은 항목을 여러 번 스크랩해도 항상 같은 id가 나와서 생성이 멱등해집니다.
+SCRAP_ID_NAMESPACE = uuid.UUID("6f1c2a8e-3b7d-4e2a-9c55-1d0b7e4f8a21")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# 스크랩 목록 조회에서 선택할 수 있는 컬럼
+SCRAP_LIST_FIELDS = (
+    "id", "user_id", "source_type", "category", "content", "content_hash",
+    "image_url", "scraped_at", "converted_to_card", "linked_diary_id",
+)
+# 커서 계산에 필요해서 항상 포함하는 컬럼
+SCRAP_CURSOR_FIELDS = ("scraped_at", "id")
+DEFAULT_SCRAP_PAGE_SIZE = 100
+MAX_SCRAP_PAGE_SIZE = 200
+# 날짜 필터의 하루 경계를 계산할 기본 시간대
+DEFAULT_SCRAP_TIMEZONE = "Asia/Seoul"
+# 스크랩 여부 일괄 확인에서 한 번에 받을 수 있는 최대 항목 수
+MAX_BULK_CHECK_ITEMS = 200
+# 한 번의 in_() 조회에 넣을 해시 수 (sha256 해시 64자 x 50개로 조회 URL이 너무 길어지지 않도록)
+BULK_CHECK_CHUNK_SIZE = 50
 
 class ScrapData(BaseModel):
     user_id: str
@@ -16,47 +47,219 @@ class ScrapData(BaseModel):
     content: str
     image_url: Optional[str] = None
 
+class ScrapCheckItem(BaseModel):
+    source_type: str
+    category: str
+    content: str
+
+class ScrapBulkCheckRequest(BaseModel):
+    user_id: str
+    items: List[ScrapCheckItem] = Field(max_length=MAX_BULK_CHECK_ITEMS)
+
+def _normalize(text: str) -> str:
+    """유니코드 정규화(NFKC) 후 공백을 하나로 합치고 앞뒤 공백을 제거합니다."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+def compute_content_hash(source_type: str, category: str, content: str) -> str:
+    """스크랩 항목을 식별하는 정규화된 내용 해시(sha256)를 계산합니다."""
+    key = "\x1f".join(_normalize(part) for part in (source_type, category, content))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def scrap_id_for(user_id: str, content_hash: str) -> str:
+    """(user_id, content_hash)에 대해 항상 같은 스크랩 id를 반환합니다."""
+    return str(uuid.uuid5(SCRAP_ID_NAMESPACE, f"{user_id}:{content_hash}"))
+
+async def _index_for_search(scrap_record: dict):
+    """새 스크랩을 검색 인덱스에 반영합니다. 인덱스 오류로 스크랩 저장이 실패하지 않도록 로그만 남깁니다."""
+    try:
+        # SQLite 쓰기는 동기 호출이므로 이벤트 루프를 막지 않도록 스레드에서 실행합니다.
+        await asyncio.to_thread(scrap_search_index.add, scrap_record)
+    except Exception as e:
+        print(f"⚠️ 스크랩 검색 인덱스 반영 실패: {str(e)}")
+
+# 진행 중인 스크랩 이미지 고정 작업 (작업이 끝나기 전에 가비지 컬렉션되지 않도록 참조를 들고 있습니다)
+_pin_tasks = set()
+
 async def create_scrap(scrap_data: ScrapData):
-    """새로운 스크랩을 생성합니다."""
+    """
+    새로운 스크랩을 생성합니다.
+    (user_id, content_hash) 기준 upsert라서 이미 스크랩된 항목이면 기존 스크랩을 그대로 둡니다.
+    """
     try:
+        content_hash = compute_content_hash(scrap_data.source_type, scrap_data.category, scrap_data.content)
         scrap_record = {
-            "id": str(uuid.uuid4()),
+            "id": scrap_id_for(scrap_data.user_id, content_hash),
             "user_id": scrap_data.user_id,
             "source_type": scrap_data.source_type,
             "category": scrap_data.category,
             "content": scrap_data.content,
+            "content_hash": content_hash,
             "image_url": scrap_data.image_url,
-            "scraped_at": datetime.now().isoformat(),
+            "scraped_at": datetime.now(timezone.utc).isoformat(),
             "converted_to_card": False,
             "linked_diary_id": None
         }
-        
-        response = supabase.table('scraps').insert(scrap_record).execute()
-        
-        if response.data:
-            return {"success": True, "scrap_id": scrap_record["id"]}
-        else:
-            raise HTTPException(status_code=500, detail="스크랩 생성 실패")
-            
+
+        response = supabase.table('scraps').upsert(
+            scrap_record,
+            on_conflict="user_id,content_hash",
+            ignore_duplicates=True
+        ).execute()
+
+        # ignore_duplicates=True이면 이미 있던 스크랩은 응답 데이터가 비어 있습니다.
+        created = bool(response.data)
+        scrap_id = scrap_record["id"]
+        if not created:
+            # 해시 도입 전에 만든 스크랩은 id가 다를 수 있으므로 실제 id를 조회합니다.
+            existing = supabase.table('scraps').select('id').eq('user_id', scrap_data.user_id).eq('content_hash', content_hash).limit(1).execute()
+            if existing.data:
+                scrap_id = existing.data[0]['id']
+
+        if created:
+            await _index_for_search(scrap_record)
+        if scrap_data.image_url:
+            # 스크랩된 이미지는 썸네일 캐시에 고정해 지워지지 않게 하고, 썸네일을 미리 만들어 둡니다.
+            task = asyncio.create_task(thumbnail_cache.pin_and_warm(scrap_data.image_url))
+            _pin_tasks.add(task)
+            task.add_done_callback(_pin_tasks.discard)
+
+        return {
+            "success": True,
+            "scrap_id": scrap_id,
+            "content_hash": content_hash,
+            "created": created
+        }
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 async def delete_scrap(user_id: str, source_type: str, category: str, content: str):
     """특정 스크랩을 삭제합니다."""
     try:
-        response = supabase.table('scraps').delete().eq('user_id', user_id).eq('source_type', source_type).eq('category', category).eq('content', content).execute()
-        
-        return {"success": True, "deleted": True}
-        
+        content_hash = compute_content_hash(source_type, category, content)
+        response = supabase.table('scraps').delete().eq('user_id', user_id).eq('content_hash', content_hash).execute()
+        try:
+            await asyncio.to_thread(scrap_search_index.remove, user_id, content_hash)
+        except Exception as e:
+            print(f"⚠️ 스크랩 검색 인덱스 반영 실패: {str(e)}")
+
+        return {"success": True, "deleted": bool(response.data)}
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 async def check_scrap_exists(user_id: str, source_type: str, category: str, content: str):
     """특정 스크랩이 이미 존재하는지 확인합니다."""
     try:
-        response = supabase.table('scraps').select('id').eq('user_id', user_id).eq('source_type', source_type).eq('category', category).eq('content', content).execute()
-        
+        content_hash = compute_content_hash(source_type, category, content)
+        response = supabase.table('scraps').select('id').eq('user_id', user_id).eq('content_hash', content_hash).limit(1).execute()
+
         return len(response.data) > 0
-        
+
     except Exception as e:
-        return False 
\ No newline at end of file
+        return False
+
+async def check_scraps_bulk(request: ScrapBulkCheckRequest):
+    """여러 항목의 스크랩 여부를 한 번의 조회로 확인합니다. 결과는 요청한 순서대로 반환합니다."""
+    hashes = [compute_content_hash(item.source_type, item.category, item.content) for item in request.items]
+    if not hashes:
+        return {"results": []}
+
+    unique_hashes = list(dict.fromkeys(hashes))
+    scrapped = {}
+    try:
+        for start in range(0, len(unique_hashes), BULK_CHECK_CHUNK_SIZE):
+            chunk = unique_hashes[start:start + BULK_CHECK_CHUNK_SIZE]
+            response = supabase.table('scraps').select('id, content_hash').eq('user_id', request.user_id).in_('content_hash', chunk).execute()
+            scrapped.update((row['content_hash'], row['id']) for row in (response.data or []))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "results": [
+            {"content_hash": h, "exists": h in scrapped, "scrap_id": scrapped.get(h)}
+            for h in hashes
+        ]
+    }
+
+
+def encode_scrap_cursor(row: dict) -> str:
+    """마지막 행의 (scraped_at, id)를 다음 페이지 커서 문자열로 만듭니다."""
+    raw = json.dumps([row["scraped_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_scrap_cursor(cursor: str):
+    """커서 문자열을 (scraped_at, id)로 되돌립니다."""
+    try:
+        scraped_at, scrap_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        # 필터 문자열에 그대로 들어가므로 형식을 검증합니다.
+        datetime.fromisoformat(scraped_at)
+        uuid.UUID(scrap_id)
+        return scraped_at, scrap_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="잘못된 커서입니다.")
+
+def _parse_fields(fields: Optional[str]) -> str:
+    """요청한 컬럼 목록을 검증해 select 문자열로 만듭니다. 커서 컬럼은 항상 포함합니다."""
+    if not fields:
+        return ", ".join(SCRAP_LIST_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in SCRAP_LIST_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"선택할 수 없는 컬럼입니다: {', '.join(unknown)}")
+    selected = list(dict.fromkeys(requested + list(SCRAP_CURSOR_FIELDS)))
+    return ", ".join(selected)
+
+def _day_bounds(date_from: Optional[str], date_to: Optional[str], tz_name: str):
+    """
+    날짜 범위(YYYY-MM-DD, 양 끝 포함)를 해당 시간대의 하루 경계 기준 UTC 시각으로 바꿉니다.
+    예: Asia/Seoul의 2025-07-01 → 2025-06-30T15:00:00+00:00 ~ 2025-07-01T15:00:00+00:00
+    """
+    try:
+        tz = ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"알 수 없는 시간대입니다: {tz_name}")
+    try:
+        start = date_type.fromisoformat(date_from) if date_from else None
+        end = date_type.fromisoformat(date_to) if date_to else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="날짜는 YYYY-MM-DD 형식이어야 합니다.")
+
+    start_at = datetime.combine(start, time_type.min, tz).astimezone(timezone.utc) if start else None
+    end_at = datetime.combine(end + timedelta(days=1), time_type.min, tz).astimezone(timezone.utc) if end else None
+    return start_at, end_at
+
+async def list_user_scraps(
+    user_id: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    tz: str = DEFAULT_SCRAP_TIMEZONE,
+    fields: Optional[str] = None,
+    limit: int = DEFAULT_SCRAP_PAGE_SIZE,
+    cursor: Optional[str] = None,
+):
+    """
+    사용자의 스크랩을 최신순으로 한 페이지 가져옵니다.
+    (scraped_at, id) 기준 키셋 페이지네이션이라 스크랩이 많아져도 조회 비용이 일정합니다.
+    반환값: (행 목록, 다음 페이지 커서 또는 None)
+    """
+    limit = max(1, min(limit, MAX_SCRAP_PAGE_SIZE))
+    query = supabase.table('scraps').select(_parse_fields(fields)).eq('user_id', user_id)
+
+    start_at, end_at = _day_bounds(date_from, date_to, tz)
+    if start_at:
+        query = query.gte('scraped_at', start_at.isoformat())
+    if end_at:
+        query = query.lt('scraped_at', end_at.isoformat())
+
+    if cursor:
+        scraped_at, scrap_id = decode_scrap_cursor(cursor)
+        query = query.or_(f'scraped_at.lt."{scraped_at}",and(scraped_at.eq."{scraped_at}",id.lt.{scrap_id})')
+
+    # 다음 페이지가 있는지 알기 위해 하나 더 가져옵니다.
+    response = query.order('scraped_at', desc=True).order('id', desc=True).limit(limit + 1).execute()
+    rows = response.data or []
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_scrap_cursor(rows[-1])
+    return rows, None
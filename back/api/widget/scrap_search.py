@@ -0,0 +1,219 @@
+# back/api/widget/scrap_search.py
+# 스크랩 내용/카테고리 전문 검색 인덱스 (SQLite FTS5, 로컬 파일)
+# - 한국어는 띄어쓰기 단위로 찾으면 조사 때문에 잘 안 맞으므로, 글자 2-gram(바이그램)으로 색인합니다.
+#   예: "오늘의 날씨" → "오늘", "늘의", "날씨" / 영어·숫자 단어는 소문자 단어 그대로 색인합니다.
+# - 사용자 id도 토큰으로 색인해서, 다른 사용자의 스크랩을 훑지 않고 인덱스만으로 걸러냅니다.
+# - create_scrap/delete_scrap이 호출될 때마다 바로 반영되고, 처음 한 번은 scripts/build_scrap_search_index.py로 채웁니다.
+
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+# 검색 인덱스 파일 (로컬 실행 시 생성, gitignore)
+SCRAP_SEARCH_DB = os.getenv("SCRAP_SEARCH_DB", os.path.join(DATA_DIR, "scrap_search.sqlite3"))
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# 검색어에서 사용할 최대 토큰 수 (아주 긴 검색어로 쿼리가 무거워지지 않도록)
+MAX_QUERY_TOKENS = 16
+# bm25 컬럼 가중치 (user, category, body) - 검색어가 카테고리와 맞으면 본문에서만 맞을 때보다 높게 칩니다.
+# (category 컬럼도 본문과 같은 바이그램으로 색인하고, 본문 색인에도 카테고리가 들어 있으므로
+#  카테고리와 맞는 스크랩은 두 컬럼 모두에서 점수를 받습니다)
+BM25_WEIGHTS = (0.0, 2.0, 1.0)
+
+_WORD_RE = re.compile(r"\w+")
+# 한글/한자/가나는 글자 n-gram으로 색인합니다.
+_CJK_RE = re.compile(r"[ᄀ-ᇿ぀-ヿ㄰-㆏㐀-鿿가-힯]")
+
+
+def _user_token(user_id: str) -> str:
+    return "u" + re.sub(r"[^0-9a-z]", "", (user_id or "").lower())
+
+
+def tokenize(text: str) -> list:
+    """
+    검색용 토큰 목록을 만듭니다.
+    - 한글 등 CJK 글자가 들어간 단어: 글자 바이그램 (한 글자 단어는 그 글자)
+    - 그 외 단어: 소문자 단어
+    """
+    tokens = []
+    for word in _WORD_RE.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if _CJK_RE.search(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def _index_text(text: str) -> str:
+    """색인할 문자열. 한 글자 검색도 되도록 한글 단어는 바이그램과 함께 글자 하나하나도 넣습니다."""
+    tokens = tokenize(text)
+    for word in _WORD_RE.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if len(word) > 1 and _CJK_RE.search(word):
+            tokens.extend(word)
+    return " ".join(tokens)
+
+
+def build_match_query(user_id: str, query: str, category: str = None):
+    """
+    FTS5 MATCH 식을 만듭니다. 검색어 토큰은 모두 포함해야 하고(AND),
+    마지막 영어 단어는 앞부분만 입력해도 찾도록 접두사 검색을 합니다.
+    검색어는 category와 body 컬럼 모두에서 찾아, 카테고리 가중치(BM25_WEIGHTS)가 순위에 반영되게 합니다.
+    검색할 토큰이 없으면 None
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    if not _CJK_RE.search(tokens[-1]):
+        terms[-1] += "*"
+    expr = f'user : "{_user_token(user_id)}" AND {{category body}} : ({" AND ".join(terms)})'
+    # category 컬럼은 바이그램으로 색인되어 있으므로 카테고리 필터도 같은 토큰의 구(phrase)로 찾습니다.
+    category_tokens = tokenize(category)
+    if category_tokens:
+        expr += f' AND category : "{" ".join(category_tokens)}"'
+    return expr
+
+
+class ScrapSearchIndex:
+    """스크랩 검색 인덱스. 요청 처리 스레드와 백그라운드 스크립트에서 함께 쓰도록 잠금으로 보호합니다."""
+
+    def __init__(self, path: str = SCRAP_SEARCH_DB):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS scrap_docs (
+                    rowid INTEGER PRIMARY KEY,
+                    scrap_id TEXT NOT NULL UNIQUE,
+                    user_id TEXT NOT NULL,
+                    content_hash TEXT,
+                    source_type TEXT,
+                    category TEXT,
+                    content TEXT,
+                    image_url TEXT,
+                    scraped_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS scrap_docs_user_hash ON scrap_docs (user_id, content_hash);
+                CREATE VIRTUAL TABLE IF NOT EXISTS scrap_fts USING fts5(
+                    user, category, body, tokenize = 'unicode61 remove_diacritics 0'
+                );
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    def _delete_rowids(self, conn: sqlite3.Connection, rowids: list):
+        for rowid in rowids:
+            conn.execute("DELETE FROM scrap_fts WHERE rowid = ?", (rowid,))
+            conn.execute("DELETE FROM scrap_docs WHERE rowid = ?", (rowid,))
+
+    def add_many(self, scraps: list):
+        """스크랩 행들을 색인합니다. 이미 색인된 스크랩 id는 새 내용으로 바꿉니다."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for scrap in scraps:
+                    existing = conn.execute("SELECT rowid FROM scrap_docs WHERE scrap_id = ?", (scrap["id"],)).fetchall()
+                    self._delete_rowids(conn, [row[0] for row in existing])
+                    cursor = conn.execute(
+                        "INSERT INTO scrap_docs (scrap_id, user_id, content_hash, source_type, category, content, image_url, scraped_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            scrap["id"], scrap["user_id"], scrap.get("content_hash"), scrap.get("source_type"),
+                            scrap.get("category"), scrap.get("content"), scrap.get("image_url"), scrap.get("scraped_at"),
+                        ),
+                    )
+                    conn.execute(
+                        "INSERT INTO scrap_fts (rowid, user, category, body) VALUES (?, ?, ?, ?)",
+                        (
+                            cursor.lastrowid,
+                            _user_token(scrap["user_id"]),
+                            _index_text(scrap.get("category")),
+                            _index_text(f"{scrap.get('category') or ''} {scrap.get('content') or ''}"),
+                        ),
+                    )
+
+    def add(self, scrap: dict):
+        self.add_many([scrap])
+
+    def remove(self, user_id: str, content_hash: str) -> int:
+        """사용자의 특정 스크랩(내용 해시)을 인덱스에서 지웁니다."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                rows = conn.execute(
+                    "SELECT rowid FROM scrap_docs WHERE user_id = ? AND content_hash = ?", (user_id, content_hash)
+                ).fetchall()
+                self._delete_rowids(conn, [row[0] for row in rows])
+            return len(rows)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM scrap_fts")
+                conn.execute("DELETE FROM scrap_docs")
+
+    def search(self, user_id: str, query: str, category: str = None,
+               limit: int = DEFAULT_SEARCH_LIMIT, offset: int = 0) -> tuple:
+        """
+        사용자의 스크랩을 관련도(bm25) 순, 같으면 최신순으로 검색합니다.
+        반환값: (결과 목록, 다음 페이지 offset 또는 None)
+        """
+        match = build_match_query(user_id, query, category)
+        if match is None:
+            return [], None
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+        with self._lock:
+            conn = self._connect()
+            # 다음 페이지가 있는지 알기 위해 하나 더 가져옵니다.
+            rows = conn.execute(
+                f"""
+                SELECT d.scrap_id, d.source_type, d.category, d.content, d.image_url, d.scraped_at,
+                       bm25(scrap_fts, {', '.join(str(w) for w in BM25_WEIGHTS)}) AS rank
+                FROM scrap_fts JOIN scrap_docs d ON d.rowid = scrap_fts.rowid
+                WHERE scrap_fts MATCH ?
+                ORDER BY rank, d.scraped_at DESC
+                LIMIT ? OFFSET ?
+                """,
+                (match, limit + 1, offset),
+            ).fetchall()
+        results = [
+            {
+                "id": row[0],
+                "source_type": row[1],
+                "category": row[2],
+                "content": row[3],
+                "image_url": row[4],
+                "scraped_at": row[5],
+                # bm25는 작을수록 관련도가 높으므로 부호를 바꿔 점수로 보여줍니다.
+                "score": round(-row[6], 4),
+            }
+            for row in rows[:limit]
+        ]
+        return results, (offset + limit if len(rows) > limit else None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            count = conn.execute("SELECT count(*) FROM scrap_docs").fetchone()[0]
+        return {"documents": count, "path": self.path}
+
+
+# 앱 전체에서 공유하는 스크랩 검색 인덱스
+scrap_search_index = ScrapSearchIndex()
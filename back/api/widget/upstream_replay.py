@@ -0,0 +1,256 @@
+# back/api/widget/upstream_replay.py
+# 위젯 업스트림 응답 녹화/재생 (오프라인 부하 테스트용)
+# - record: 실제 업스트림을 호출하면서 응답을 fixture 파일로 저장합니다.
+# - replay: 네트워크 없이 fixture를 돌려주고, 설정한 지연 분포와 에러율을 흉내 냅니다.
+# WIDGET_UPSTREAM_MODE(live/record/replay)로 켜며, http_client가 업스트림별 클라이언트를 만들 때 transport로 끼워 넣습니다.
+#
+# 설정 예:
+#   WIDGET_UPSTREAM_MODE=replay
+#   WIDGET_REPLAY_LATENCY="weather=lognormal:80:300,news=uniform:50:150,*=recorded"
+#   WIDGET_REPLAY_ERROR_RATE="weather=0.05,*=0"
+#   WIDGET_REPLAY_SEED=42
+
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+import httpx
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+UPSTREAM_MODE = os.getenv("WIDGET_UPSTREAM_MODE", "live").lower()
+FIXTURES_DIR = os.getenv("WIDGET_FIXTURES_DIR", os.path.join(DATA_DIR, "upstream_fixtures"))
+REPLAY_LATENCY = os.getenv("WIDGET_REPLAY_LATENCY", "*=recorded")
+REPLAY_ERROR_RATE = os.getenv("WIDGET_REPLAY_ERROR_RATE", "*=0")
+REPLAY_SEED = int(os.getenv("WIDGET_REPLAY_SEED", "0"))
+
+# fixture 키와 파일에서 빼는 쿼리 파라미터 (API 키)
+SECRET_PARAMS = {"appid", "apikey", "ttbkey", "key", "token", "access_token"}
+# 저장할 응답 헤더
+RECORDED_HEADERS = ("content-type",)
+# 녹화할 때 받은 본문은 이미 압축이 풀려 있으므로, 다시 만든 응답에서 빼야 하는 헤더
+# (그대로 두면 httpx가 풀린 본문을 한 번 더 풀려다 DecodingError가 납니다)
+DECODED_BODY_DROP_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+# 같은 요청에 대해 저장할 최대 응답 수 (random.dog처럼 매번 다른 응답을 주는 업스트림용)
+MAX_RECORDINGS_PER_KEY = 50
+
+
+def _parse_per_upstream(spec: str) -> dict:
+    """"weather=a,news=b,*=c" 형식을 {업스트림: 값}으로 바꿉니다."""
+    result = {}
+    for part in spec.split(","):
+        name, _, value = part.strip().partition("=")
+        if name and value:
+            result[name.strip()] = value.strip()
+    return result
+
+
+def _redacted_params(url: httpx.URL) -> list:
+    return sorted((k, v) for k, v in url.params.multi_items() if k.lower() not in SECRET_PARAMS)
+
+
+def _redacted_url(url: httpx.URL) -> str:
+    query = urlencode(_redacted_params(url))
+    return f"{url.scheme}://{url.host}{url.path}" + (f"?{query}" if query else "")
+
+
+def fixture_key(request: httpx.Request) -> str:
+    """요청을 식별하는 키 (메서드 + 호스트 + 경로 + API 키를 뺀 쿼리)"""
+    raw = f"{request.method} {_redacted_url(request.url)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def path_key(request: httpx.Request) -> str:
+    """쿼리를 무시한 키 (녹화하지 않은 좌표/검색어로 요청했을 때 같은 경로의 fixture를 대신 사용)"""
+    raw = f"{request.method} {request.url.scheme}://{request.url.host}{request.url.path}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class FixtureStore:
+    """
+    업스트림별 fixture 파일
+    - {FIXTURES_DIR}/{업스트림}/{fixture_key}.json: {"url", "path_key", "responses": [{status, headers, body_b64, elapsed_ms}]}
+    """
+
+    def __init__(self, root: str = FIXTURES_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        # 업스트림 -> {fixture_key: fixture} (재생 시 처음 한 번 읽음)
+        self._loaded = {}
+
+    def _path(self, upstream: str, key: str) -> str:
+        return os.path.join(self.root, upstream, f"{key}.json")
+
+    def record(self, upstream: str, request: httpx.Request, response: httpx.Response, body: bytes, elapsed_ms: float):
+        key = fixture_key(request)
+        path = self._path(upstream, key)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fixture = {"url": _redacted_url(request.url), "method": request.method, "path_key": path_key(request), "responses": []}
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    fixture = json.load(f)
+            fixture["responses"].append({
+                "status": response.status_code,
+                "headers": {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+                "body_b64": base64.b64encode(body).decode("ascii"),
+                "elapsed_ms": round(elapsed_ms, 1),
+            })
+            fixture["responses"] = fixture["responses"][-MAX_RECORDINGS_PER_KEY:]
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(fixture, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+    def load(self, upstream: str) -> dict:
+        with self._lock:
+            fixtures = self._loaded.get(upstream)
+            if fixtures is None:
+                fixtures = {}
+                directory = os.path.join(self.root, upstream)
+                if os.path.isdir(directory):
+                    for name in sorted(os.listdir(directory)):
+                        if name.endswith(".json"):
+                            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                                fixtures[name[:-5]] = json.load(f)
+                self._loaded[upstream] = fixtures
+            return fixtures
+
+    def find(self, upstream: str, request: httpx.Request):
+        """요청과 같은 fixture, 없으면 같은 경로의 fixture를 찾습니다."""
+        fixtures = self.load(upstream)
+        fixture = fixtures.get(fixture_key(request))
+        if fixture is not None:
+            return fixture
+        same_path = [f for f in fixtures.values() if f.get("path_key") == path_key(request)]
+        return same_path[0] if same_path else None
+
+
+fixture_store = FixtureStore()
+
+
+class LatencyModel:
+    """
+    재생 지연 분포 (밀리초)
+    - recorded: 녹화할 때 걸린 시간 그대로
+    - fixed:50
+    - uniform:50:150
+    - lognormal:중앙값:p95 (꼬리가 긴 실제 업스트림 지연에 가깝습니다)
+    """
+
+    def __init__(self, spec: str = "recorded"):
+        self.spec = spec
+        kind, *args = spec.split(":")
+        self.kind = kind
+        self.args = [float(a) for a in args]
+        if kind == "lognormal":
+            median, p95 = self.args
+            self.mu = math.log(median)
+            # p95 = exp(mu + 1.645 * sigma)
+            self.sigma = max(0.0, (math.log(p95) - self.mu) / 1.645)
+        elif kind not in ("recorded", "fixed", "uniform"):
+            raise ValueError(f"알 수 없는 지연 분포입니다: {spec}")
+
+    def sample(self, rng: random.Random, recorded_ms: float) -> float:
+        if self.kind == "recorded":
+            return recorded_ms
+        if self.kind == "fixed":
+            return self.args[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.args[0], self.args[1])
+        return rng.lognormvariate(self.mu, self.sigma)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """실제 업스트림을 호출하고 응답을 fixture로 저장하는 transport"""
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport, store: FixtureStore = fixture_store):
+        self.upstream = upstream
+        self.transport = transport
+        self.store = store
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        body = await response.aread()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.store.record(self.upstream, request, response, body, elapsed_ms)
+        headers = [(name, value) for name, value in response.headers.multi_items()
+                   if name.lower() not in DECODED_BODY_DROP_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    fixture를 돌려주는 transport (네트워크 호출 없음)
+    - 같은 요청의 응답이 여러 개 녹화되어 있으면 차례대로 돌려줍니다.
+    - 에러율만큼 503 응답이나 연결 타임아웃을 흉내 냅니다.
+    - 난수는 업스트림별로 고정된 시드를 사용하므로, 같은 설정이면 같은 순서로 지연/에러가 납니다.
+    """
+
+    def __init__(self, upstream: str, latency: LatencyModel, error_rate: float = 0.0,
+                 seed: int = REPLAY_SEED, store: FixtureStore = fixture_store):
+        self.upstream = upstream
+        self.latency = latency
+        self.error_rate = error_rate
+        self.store = store
+        self._rng = random.Random(f"{seed}:{upstream}")
+        self._positions = {}
+        self.requests = 0
+        self.errors = 0
+        self.misses = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        fixture = self.store.find(self.upstream, request)
+        if fixture is None or not fixture["responses"]:
+            self.misses += 1
+            return httpx.Response(404, json={"error": f"녹화된 응답이 없습니다: {_redacted_url(request.url)}"}, request=request)
+
+        key = fixture_key(request)
+        position = self._positions.get(key, 0)
+        recorded = fixture["responses"][position % len(fixture["responses"])]
+        self._positions[key] = position + 1
+
+        await asyncio.sleep(self.latency.sample(self._rng, recorded["elapsed_ms"]) / 1000)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.errors += 1
+            # 에러의 절반은 서버 에러 응답, 절반은 타임아웃으로 흉내 냅니다.
+            if self._rng.random() < 0.5:
+                return httpx.Response(503, json={"error": "replay injected error"}, request=request)
+            raise httpx.ConnectTimeout("replay injected timeout", request=request)
+
+        return httpx.Response(
+            recorded["status"],
+            headers=recorded["headers"],
+            content=base64.b64decode(recorded["body_b64"]),
+            request=request,
+        )
+
+
+def build_transport(upstream: str, limits: httpx.Limits):
+    """
+    WIDGET_UPSTREAM_MODE에 맞는 transport를 만듭니다.
+    live면 None (httpx 기본 transport 사용)
+    """
+    if UPSTREAM_MODE == "record":
+        return RecordingTransport(upstream, httpx.AsyncHTTPTransport(limits=limits))
+    if UPSTREAM_MODE == "replay":
+        latencies = _parse_per_upstream(REPLAY_LATENCY)
+        error_rates = _parse_per_upstream(REPLAY_ERROR_RATE)
+        return ReplayTransport(
+            upstream,
+            LatencyModel(latencies.get(upstream, latencies.get("*", "recorded"))),
+            float(error_rates.get(upstream, error_rates.get("*", "0"))),
+        )
+    return None
@@ -1,24 +1,47 @@
 import httpx
 import os
 
+from .http_client import get_http_client
+from .breaker import get_breaker
+from .quota import quota_scheduler
+
 API_URL = "https://api.openweathermap.org/data/2.5/weather"
 
-async def get_weather_data(city: str = "Daejeon"):
-    """특정 도시의 날씨 정보를 가져옵니다."""
+async def get_weather_data(city: str = "Daejeon", client: httpx.AsyncClient = None, lat: float = None, lon: float = None):
+    """특정 도시(또는 좌표)의 날씨 정보를 가져옵니다."""
     WEATHER_MAP_KEY = os.getenv("WEATHER_MAP_KEY")
     if not WEATHER_MAP_KEY:
         return {"error": "날씨 정보를 가져오는 데 실패했습니다. API 키가 설정되지 않았습니다."}
     
     params = {
-        "q": city,
         "appid": WEATHER_MAP_KEY,
         "units": "metric",
         "lang": "kr"
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(API_URL, params=params)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            return {"error": f"날씨 정보를 가져오는 데 실패했습니다: {str(e)}"}
\ No newline at end of file
+    # 좌표가 있으면 좌표로, 없으면 도시 이름으로 조회합니다.
+    if lat is not None and lon is not None:
+        params.update({"lat": lat, "lon": lon})
+    else:
+        params["q"] = city
+    client = client or get_http_client("weather")
+    try:
+        # 같은 좌표/도시에 대한 동시 호출은 하나로 합치고, 호출 한도 안에서만 업스트림을 부릅니다. (헤지 요청도 토큰을 씁니다)
+        resource = params.get("q") or f"{params['lat']},{params['lon']}"
+        response = await quota_scheduler.call(
+            "weather", resource, lambda: get_breaker("weather").call(
+                lambda: client.get(API_URL, params=params), hedge_permit=quota_scheduler.hedge_permit("weather")
+            )
+        )
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        return {"error": f"날씨 정보를 가져오는 데 실패했습니다: {str(e)}"}
+
+async def get_location_weather(bucket: dict, client: httpx.AsyncClient = None):
+    """
+    기준 도시(버킷) 중심 좌표의 날씨 정보를 가져옵니다.
+    기준 도시 목록에 없는 이름으로 만든 버킷({"id", "query"})은 이름 그대로 조회합니다.
+    """
+    if "query" in bucket:
+        return await get_weather_data(bucket["query"], client=client)
+    return await get_weather_data(bucket["id"], client=client, lat=bucket["lat"], lon=bucket["lon"])
@@ -1,50 +1,32 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Response
+from pydantic import BaseModel, ValidationError
+from typing import Optional, Dict, Any, List
 from datetime import datetime
+import asyncio
 import uuid
 import json # json 모듈 추가
+import os
 
 # Supabase 연결 모듈 import (동업자 스타일)
 from db.connect import supabase
+from .log_queue import chrome_log_queue, insert_log_rows
+from .visit_index import open_visits
+from .visit_lifecycle import open_visit_table, QueueFullError, CHROME_VISIT_LIFECYCLE
+from .text_normalizer import clean_text, clean_nested_dict
 
 # 라우터 생성
 chrome_router = APIRouter()
 
-def clean_text(text):
-    """텍스트에서 특수문자를 제거하는 함수"""
-    if not text:
-        return text
-
-    # 문제가 될 수 있는 문자들을 제거
-    replacements = {
-        '\u2014': '-',  # em dash
-        '\u2013': '-',  # en dash
-        '\u2018': "'",  # left single quotation mark
-        '\u2019': "'",  # right single quotation mark
-        '\u201c': '"',  # left double quotation mark
-        '\u201d': '"',  # right double quotation mark
-        '\u2026': '...',  # horizontal ellipsis
-    }
-
-    cleaned = str(text)
-    for old, new in replacements.items():
-        cleaned = cleaned.replace(old, new)
-
-    return cleaned
-
-def clean_nested_dict(data):
-    """
-    딕셔너리 또는 리스트 내의 모든 문자열 값에 clean_text를 재귀적으로 적용하는 함수
-    """
-    if isinstance(data, dict):
-        return {k: clean_nested_dict(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [clean_nested_dict(elem) for elem in data]
-    elif isinstance(data, str):
-        return clean_text(data)
-    else:
-        return data
+# 사용자 ID가 없을 때 사용하는 기본 사용자
+DEFAULT_USER_ID = "980081c4-b1f4-45d5-b14a-cf82a7f166e5"
+# /log_url/batch 한 번에 받을 수 있는 최대 이벤트 수
+MAX_BATCH_EVENTS = 500
+# 한 번의 insert 요청에 담을 행 수
+INSERT_CHUNK_SIZE = 200
+# True면 /log_url이 DB 저장을 기다리지 않고 write-behind 큐에 넣은 뒤 바로 202로 응답합니다. (log_queue.py)
+CHROME_LOG_WRITE_BEHIND = os.getenv("CHROME_LOG_WRITE_BEHIND", "true").lower() == "true"
+# True면 요청마다 받은 필드와 저장할 행을 출력합니다. (디버깅용, 운영에서는 끕니다)
+CHROME_LOG_DEBUG = os.getenv("CHROME_LOG_DEBUG", "false").lower() == "true"
 
 # 데이터 모델 정의
 class ChromeLogData(BaseModel):
@@ -57,6 +39,7 @@ class ChromeLogData(BaseModel):
     visitStartTime: Optional[int] = None
     currentTime: Optional[int] = None
     user_id: Optional[str] = None  # 사용자 ID 추가
+    visitId: Optional[str] = None  # 익스텐션이 만든 방문 ID (없으면 서버가 만듭니다)
 
 # 사용시간 업데이트용 데이터 모델
 class DurationUpdateData(BaseModel):
@@ -66,57 +49,171 @@ class DurationUpdateData(BaseModel):
     visitEndTime: int
     duration: int
     user_id: Optional[str] = None  # 사용자 ID 추가
+    visitId: Optional[str] = None  # /log_url 응답 또는 익스텐션이 만든 방문 ID
+
+# 일괄 전송용 데이터 모델
+# events의 각 항목은 type이 "log"면 ChromeLogData, "duration"이면 DurationUpdateData 형식입니다.
+# 항목별로 검증해서, 잘못된 항목이 있어도 나머지는 저장합니다.
+class ChromeLogBatch(BaseModel):
+    events: List[Dict[str, Any]]
+
+def normalize_visit_id(visit_id: Optional[str]) -> Optional[str]:
+    """올바른 UUID면 표준 형식 문자열로, 아니면 None"""
+    try:
+        return str(uuid.UUID(visit_id)) if visit_id else None
+    except ValueError:
+        return None
+
+def build_log_row(data: ChromeLogData, cleaned_site_specific: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ChromeLogData를 chrome_logs 테이블 행으로 만듭니다. (siteSpecific은 미리 정리한 값을 받습니다)
+    visit_id는 체류시간 업데이트 때 로그를 바로 찾기 위한 방문 ID입니다.
+    """
+    return {
+        "visit_id": normalize_visit_id(data.visitId) or str(uuid.uuid4()),
+        "user_id": data.user_id or DEFAULT_USER_ID,
+        "url": clean_text(data.url),
+        "title": clean_text(data.title) if data.title else "제목 없음",
+        "domain": clean_text(data.domain),
+        "page_type": clean_text(data.pageType),
+        "site_specific_data": cleaned_site_specific, # 딕셔너리 형태로 전달 (jsonb 컬럼 가정)
+        "visit_time": data.timestamp.replace('Z', '+00:00'),
+        "created_at": datetime.now().isoformat(),
+        "duration": 0  # 초기값을 0으로 설정
+    }
+
+def apply_pending_duration(data: DurationUpdateData):
+    """
+    아직 DB에 저장되지 않은 방문 로그에 체류 시간을 반영합니다. (메모리만 보므로 이벤트 루프에서 바로 실행합니다)
+    반환값: (반영한 행 또는 None, 찾은 visit_id 또는 None)
+    - visitId가 없으면 열린 방문 인덱스에서 visit_id를 찾습니다.
+    - 방문 수명 관리 모드에서 아직 열린 방문이면 체류시간을 넣어 닫고, 완성된 행을 저장 대기열로 넘깁니다.
+    - 아직 write-behind 큐에 있거나 저장 중(또는 파일에 기록된) 로그면 그 행에 반영합니다. (반환하는 행에는 id가 없습니다)
+    """
+    url, domain = clean_text(data.url), clean_text(data.domain)
+    visit_id = normalize_visit_id(data.visitId) or open_visits.get(data.user_id or DEFAULT_USER_ID, url)
+    if visit_id:
+        if CHROME_VISIT_LIFECYCLE:
+            closed = open_visit_table.close(visit_id, data.duration)
+            if closed is not None:
+                return closed, visit_id
+        pending = chrome_log_queue.update_pending(
+            lambda row: row.get("visit_id") == visit_id, {"duration": data.duration}, visit_id=visit_id
+        )
+        return pending, visit_id
+
+    pending = chrome_log_queue.update_pending(
+        lambda row: row["url"] == url and row["domain"] == domain, {"duration": data.duration}
+    )
+    return pending, None
+
+def update_stored_duration(data: DurationUpdateData, visit_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    DB에 저장된 방문 로그의 체류 시간을 업데이트합니다. 업데이트한 행을 반환하고, 해당 로그가 없으면 None
+    - visit_id가 있으면 visit_id로 바로 업데이트합니다.
+    - visit_id를 모르면 URL과 도메인이 같은 가장 최근 로그를 검색합니다. (이전 버전 익스텐션, 재시작 전에 시작된 방문)
+    supabase 클라이언트는 동기 호출이므로 asyncio.to_thread로 실행합니다.
+    """
+    if visit_id:
+        # visit_id 유니크 인덱스로 한 번에 업데이트 (검색 없음)
+        update_response = supabase.table('chrome_logs').update({
+            "duration": data.duration
+        }).eq('visit_id', visit_id).execute()
+        # visit_id로 만든 로그가 아직 없으면(저장 중 등) 다른 방문을 잘못 업데이트하지 않도록 검색하지 않습니다.
+        return update_response.data[0] if update_response.data else None
+
+    # URL과 도메인으로 해당 로그 찾기
+    # 이 쿼리도 특수 문자에 의해 영향을 받을 수 있으므로, 쿼리 문자열도 클리닝을 고려할 수 있습니다.
+    # 하지만 Supabase의 eq() 메소드가 내부적으로 인코딩을 잘 처리할 가능성이 높습니다.
+    url, domain = clean_text(data.url), clean_text(data.domain)
+    response = supabase.table('chrome_logs').select('*').eq('url', url).eq('domain', domain).order('created_at', desc=True).limit(1).execute()
+    if not response.data:
+        return None
+
+    # duration 업데이트
+    update_response = supabase.table('chrome_logs').update({
+        "duration": data.duration
+    }).eq('id', response.data[0]['id']).execute()
+    if not update_response.data:
+        raise Exception("Supabase 업데이트 실패: 응답 데이터 없음")
+    return update_response.data[0]
+
+async def apply_duration(data: DurationUpdateData) -> Optional[Dict[str, Any]]:
+    """
+    방문 로그의 체류 시간을 업데이트합니다. 업데이트한 행을 반환하고, 해당 로그가 없으면 None
+    저장 전인 로그는 메모리에서 반영하고, 저장된 로그만 스레드에서 DB를 업데이트합니다. (이벤트 루프를 막지 않도록)
+    """
+    pending, visit_id = apply_pending_duration(data)
+    if pending is not None:
+        return pending
+    return await asyncio.to_thread(update_stored_duration, data, visit_id)
 
 # /log_url 엔드포인트 구현
 @chrome_router.post("/log_url")
-async def log_url(data: ChromeLogData):
+async def log_url(data: ChromeLogData, response: Response):
     """
     크롬 익스텐션에서 보낸 URL 로그를 받아서 처리하고 DB에 저장
+    write-behind 모드에서는 저장 대기열에 넣고, 방문 수명 관리 모드에서는 열린 방문으로 두고 바로 202를 반환합니다.
     """
     try:
-        # 받은 데이터 로그 출력
-        print(f"📥 크롬 익스텐션에서 데이터 수신:")
-        print(f"  - URL: {data.url}")
-        print(f"  - 제목: {data.title}")
-        print(f"  - 도메인: {data.domain}")
-        print(f"  - 페이지 유형: {data.pageType}")
-        print(f"  - 사이트별 정보: {data.siteSpecific}")
-        if data.visitStartTime:
-            print(f"  - 방문 시작 시간: {datetime.fromtimestamp(data.visitStartTime/1000).strftime('%H:%M:%S')}")
-
-        # 사용자 ID 처리
-        user_id = data.user_id
-        if not user_id:
-            print("⚠️ 사용자 ID가 제공되지 않았습니다. 기본값 사용")
-            user_id = "980081c4-b1f4-45d5-b14a-cf82a7f166e5"  # 기본값
-        else:
-            print(f"✅ 사용자 ID 사용: {user_id}")
+        # 받은 데이터 로그 출력 (CHROME_LOG_DEBUG일 때만)
+        if CHROME_LOG_DEBUG:
+            print(f"📥 크롬 익스텐션에서 데이터 수신:")
+            print(f"  - URL: {data.url}")
+            print(f"  - 제목: {data.title}")
+            print(f"  - 도메인: {data.domain}")
+            print(f"  - 페이지 유형: {data.pageType}")
+            print(f"  - 사이트별 정보: {data.siteSpecific}")
+            if data.visitStartTime:
+                print(f"  - 방문 시작 시간: {datetime.fromtimestamp(data.visitStartTime/1000).strftime('%H:%M:%S')}")
+            if not data.user_id:
+                print("⚠️ 사용자 ID가 제공되지 않았습니다. 기본값 사용")
+            else:
+                print(f"✅ 사용자 ID 사용: {data.user_id}")
 
         # Supabase에 저장할 데이터 준비 (특수문자 제거 및 중첩 딕셔너리 처리)
         # site_specific_data는 Supabase의 'jsonb' 컬럼 타입에 맞춰 딕셔너리 형태로 전달합니다.
         # Supabase 클라이언트가 내부적으로 JSON 직렬화를 처리할 것입니다.
-        cleaned_site_specific_data = clean_nested_dict(data.siteSpecific)
-
-        chrome_log_data = {
-            "user_id": user_id,
-            "url": clean_text(data.url),
-            "title": clean_text(data.title) if data.title else "제목 없음",
-            "domain": clean_text(data.domain),
-            "page_type": clean_text(data.pageType),
-            "site_specific_data": cleaned_site_specific_data, # 딕셔너리 형태로 전달 (jsonb 컬럼 가정)
-            "visit_time": data.timestamp.replace('Z', '+00:00'),
-            "created_at": datetime.now().isoformat(),
-            "duration": 0  # 초기값을 0으로 설정
-        }
+        chrome_log_data = build_log_row(data, clean_nested_dict(data.siteSpecific))
 
         # 디버깅을 위해 Supabase 삽입 전 데이터 출력
-        print(f"DEBUG: Data before Supabase insert: {repr(chrome_log_data)}")
+        if CHROME_LOG_DEBUG:
+            print(f"DEBUG: Data before Supabase insert: {repr(chrome_log_data)}")
+
+        if CHROME_VISIT_LIFECYCLE:
+            # 체류시간이 도착하면(또는 시간이 지나면) 완성된 행으로 한 번만 저장합니다. (visit_lifecycle.py)
+            try:
+                open_visit_table.open(chrome_log_data)
+            except QueueFullError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            message = "방문이 기록되었습니다. 체류시간이 도착하면 저장됩니다."
+        elif CHROME_LOG_WRITE_BEHIND:
+            if not chrome_log_queue.enqueue(chrome_log_data):
+                raise HTTPException(status_code=503, detail="로그 저장 대기열이 가득 찼습니다. 잠시 후 다시 시도해 주세요.")
+            message = "URL 로그가 저장 대기열에 추가되었습니다."
+        # 방문을 받아 둔 뒤에만 인덱스에 등록합니다. (503으로 거절한 방문으로 체류시간이 가지 않도록)
+        open_visits.add(chrome_log_data["user_id"], chrome_log_data["url"], chrome_log_data["visit_id"])
+        if CHROME_VISIT_LIFECYCLE or CHROME_LOG_WRITE_BEHIND:
+            response.status_code = 202
+            return {
+                "success": True,
+                "message": message,
+                "data": {
+                    "visit_id": chrome_log_data["visit_id"],
+                    "url": data.url,
+                    "title": data.title,
+                    "domain": data.domain,
+                    "page_type": data.pageType,
+                    "timestamp": data.timestamp,
+                    "queued_at": datetime.now().isoformat()
+                }
+            }
 
         # Supabase에 저장 (동업자 스타일)
-        response = supabase.table('chrome_logs').insert(chrome_log_data).execute()
+        insert_response = supabase.table('chrome_logs').insert(chrome_log_data).execute()
 
-        if response.data:
-            saved_log = response.data[0]
+        if insert_response.data:
+            saved_log = insert_response.data[0]
             print(f"✅ 크롬 로그 저장 성공: ID {saved_log['id']}")
 
             # 성공 응답
@@ -125,6 +222,7 @@ async def log_url(data: ChromeLogData):
                 "message": "URL 로그가 성공적으로 저장되었습니다.",
                 "data": {
                     "id": saved_log["id"],
+                    "visit_id": chrome_log_data["visit_id"],
                     "url": data.url,
                     "title": data.title,
                     "domain": data.domain,
@@ -137,6 +235,8 @@ async def log_url(data: ChromeLogData):
         else:
             raise Exception("Supabase 저장 실패: 응답 데이터 없음")
 
+    except HTTPException:
+        raise
     except UnicodeEncodeError as unicode_e:
         # UnicodeEncodeError를 명시적으로 잡아서 더 자세한 정보 출력
         print(f"❌ UnicodeEncodeError 발생:")
@@ -162,45 +262,31 @@ async def update_duration(data: DurationUpdateData):
     크롬 익스텐션에서 보낸 사용시간 정보를 받아서 기존 로그를 업데이트
     """
     try:
-        # 받은 데이터 로그 출력
-        print(f"⏰ 사용시간 업데이트 요청:")
-        print(f"  - URL: {data.url}")
-        print(f"  - 도메인: {data.domain}")
-        print(f"  - 체류 시간: {data.duration}초")
-        print(f"  - 방문 시작: {datetime.fromtimestamp(data.visitStartTime/1000).strftime('%H:%M:%S')}")
-        print(f"  - 방문 종료: {datetime.fromtimestamp(data.visitEndTime/1000).strftime('%H:%M:%S')}")
-
-        # URL과 도메인으로 해당 로그 찾기
-        # 이 쿼리도 특수 문자에 의해 영향을 받을 수 있으므로, 쿼리 문자열도 클리닝을 고려할 수 있습니다.
-        # 하지만 Supabase의 eq() 메소드가 내부적으로 인코딩을 잘 처리할 가능성이 높습니다.
-        response = supabase.table('chrome_logs').select('*').eq('url', clean_text(data.url)).eq('domain', clean_text(data.domain)).order('created_at', desc=True).limit(1).execute()
+        # 받은 데이터 로그 출력 (CHROME_LOG_DEBUG일 때만)
+        if CHROME_LOG_DEBUG:
+            print(f"⏰ 사용시간 업데이트 요청:")
+            print(f"  - URL: {data.url}")
+            print(f"  - 도메인: {data.domain}")
+            print(f"  - 체류 시간: {data.duration}초")
+            print(f"  - 방문 시작: {datetime.fromtimestamp(data.visitStartTime/1000).strftime('%H:%M:%S')}")
+            print(f"  - 방문 종료: {datetime.fromtimestamp(data.visitEndTime/1000).strftime('%H:%M:%S')}")
 
-        if response.data:
-            chrome_log = response.data[0]
-
-            # duration 업데이트
-            update_response = supabase.table('chrome_logs').update({
-                "duration": data.duration
-            }).eq('id', chrome_log['id']).execute()
-
-            if update_response.data:
-                updated_log = update_response.data[0]
-                print(f"✅ 사용시간 업데이트 성공: ID {updated_log['id']}, 체류시간 {data.duration}초")
-
-                # 성공 응답
-                return {
-                    "success": True,
-                    "message": f"사용시간이 성공적으로 업데이트되었습니다. (체류시간: {data.duration}초)",
-                    "data": {
-                        "id": updated_log["id"],
-                        "url": data.url,
-                        "domain": data.domain,
-                        "duration": data.duration,
-                        "updated_at": datetime.now().isoformat()
-                    }
+        updated_log = await apply_duration(data)
+        if updated_log:
+            print(f"✅ 사용시간 업데이트 성공: ID {updated_log.get('id', '(저장 대기 중)')}, 체류시간 {data.duration}초")
+
+            # 성공 응답
+            return {
+                "success": True,
+                "message": f"사용시간이 성공적으로 업데이트되었습니다. (체류시간: {data.duration}초)",
+                "data": {
+                    "id": updated_log.get("id"),
+                    "url": data.url,
+                    "domain": data.domain,
+                    "duration": data.duration,
+                    "updated_at": datetime.now().isoformat()
                 }
-            else:
-                raise Exception("Supabase 업데이트 실패: 응답 데이터 없음")
+            }
         else:
             print(f"⚠️ 해당 로그를 찾을 수 없음: {data.url}")
             return {
@@ -209,6 +295,9 @@ async def update_duration(data: DurationUpdateData):
                 "data": None
             }
 
+    except QueueFullError as e:
+        # 열린 방문을 닫아 넘길 저장 대기열이 가득 참 (방문은 열린 채로 남아 있으므로 다시 보내면 됩니다)
+        raise HTTPException(status_code=503, detail=str(e))
     except UnicodeEncodeError as unicode_e:
         # UnicodeEncodeError를 명시적으로 잡아서 더 자세한 정보 출력
         print(f"❌ UnicodeEncodeError 발생:")
@@ -227,6 +316,205 @@ async def update_duration(data: DurationUpdateData):
             detail=f"서버 내부 오류: {str(e)}"
         )
 
+def _validate_batch_events(events: List[Dict[str, Any]]):
+    """
+    일괄 전송된 이벤트를 type에 맞는 모델로 검증합니다.
+    반환값: (로그 [(index, ChromeLogData)], 체류시간 [(index, DurationUpdateData)], 항목별 결과)
+    검증에 실패한 항목은 결과에 바로 실패로 기록합니다.
+    """
+    logs, durations = [], []
+    results = [None] * len(events)
+    for index, event in enumerate(events):
+        event_type = event.get("type")
+        try:
+            if event_type == "log":
+                logs.append((index, ChromeLogData.model_validate(event)))
+            elif event_type == "duration":
+                durations.append((index, DurationUpdateData.model_validate(event)))
+            else:
+                results[index] = {"index": index, "type": event_type, "success": False, "error": "type은 log 또는 duration이어야 합니다."}
+        except ValidationError as e:
+            errors = ", ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors())
+            results[index] = {"index": index, "type": event_type, "success": False, "error": errors}
+    return logs, durations, results
+
+# 로그 일괄 저장 엔드포인트
+@chrome_router.post("/log_url/batch")
+async def log_url_batch(batch: ChromeLogBatch):
+    """
+    크롬 익스텐션이 모아서 보낸 방문 로그/체류시간 이벤트를 한 번에 처리합니다.
+    - 방문 로그는 siteSpecific을 한 번에 정리하고, write-behind 모드에서는 저장 대기열에, 아니면 묶음 단위 insert로 저장합니다.
+    - 같은 묶음 안에 해당 방문의 체류시간 이벤트가 있으면 insert할 행에 바로 넣어 업데이트를 생략합니다.
+    - 익스텐션이 같은 묶음을 다시 보내도 안전합니다. 같은 visitId는 한 번만 저장하고, 이미 저장된 visitId는 건너뜁니다.
+    - 응답의 results에 항목별 성공 여부와 로그 ID, 방문 ID(visit_id)를 events 순서대로 돌려줍니다.
+    """
+    if len(batch.events) > MAX_BATCH_EVENTS:
+        raise HTTPException(status_code=413, detail=f"한 번에 최대 {MAX_BATCH_EVENTS}개의 이벤트만 보낼 수 있습니다.")
+    try:
+        logs, durations, results = _validate_batch_events(batch.events)
+
+        # siteSpecific 정리는 묶음 전체에 한 번만 실행합니다.
+        cleaned_site_specific = clean_nested_dict([data.siteSpecific for _, data in logs])
+        rows = [build_log_row(data, site_specific) for (_, data), site_specific in zip(logs, cleaned_site_specific)]
+
+        # visit_id, (사용자, URL, 도메인) -> 같은 묶음에서 가장 최근 방문 로그의 위치
+        latest_visit = {}
+        # 방문 로그 위치 -> 그 행에 체류시간을 넣은 체류시간 이벤트 index 목록
+        merged = {}
+        # 방문 로그 위치 -> 같은 묶음에서 같은 visitId로 다시 온 방문 로그 index 목록 (한 번만 저장)
+        duplicates = {}
+        pending_durations = []
+        events_in_order = sorted(
+            [(index, "log", position) for position, (index, _) in enumerate(logs)]
+            + [(index, "duration", position) for position, (index, _) in enumerate(durations)]
+        )
+        for index, event_type, position in events_in_order:
+            if event_type == "log":
+                row = rows[position]
+                if row["visit_id"] in latest_visit:
+                    duplicates.setdefault(latest_visit[row["visit_id"]], []).append(index)
+                    continue
+                latest_visit[row["visit_id"]] = position
+                latest_visit[(row["user_id"], row["url"], row["domain"])] = position
+                continue
+            data = durations[position][1]
+            visit_id = normalize_visit_id(data.visitId)
+            if visit_id:
+                visit_position = latest_visit.get(visit_id)
+            else:
+                visit_position = latest_visit.get((data.user_id or DEFAULT_USER_ID, clean_text(data.url), clean_text(data.domain)))
+            if visit_position is None:
+                pending_durations.append((index, data))
+            else:
+                rows[visit_position]["duration"] = data.duration
+                merged.setdefault(visit_position, []).append(index)
+
+        def record_outcome(position, outcome):
+            index = logs[position][0]
+            results[index] = {"index": index, "type": "log", **outcome}
+            for duplicate_index in duplicates.get(position, []):
+                results[duplicate_index] = {"index": duplicate_index, "type": "log", **outcome}
+            for duration_index in merged.get(position, []):
+                results[duration_index] = {"index": duration_index, "type": "duration", **outcome}
+
+        unique_positions = [position for position, row in enumerate(rows) if latest_visit.get(row["visit_id"]) == position]
+        if CHROME_VISIT_LIFECYCLE:
+            # 체류시간이 아직 없는 방문은 열어 두고, 체류시간까지 도착한 방문만 완성된 행으로 저장합니다.
+            insert_positions = [position for position in unique_positions if position in merged]
+            for position in unique_positions:
+                if position in merged:
+                    continue
+                row = rows[position]
+                try:
+                    open_visit_table.open(row)
+                except QueueFullError as e:
+                    # 열지 못한 방문만 실패로 돌려주고 나머지 이벤트는 계속 처리합니다.
+                    record_outcome(position, {"success": False, "error": str(e)})
+                    continue
+                open_visits.add(row["user_id"], row["url"], row["visit_id"])
+                record_outcome(position, {"success": True, "id": None, "visit_id": row["visit_id"]})
+        else:
+            insert_positions = unique_positions
+
+        if CHROME_LOG_WRITE_BEHIND:
+            # 저장 대기열에 넣고 바로 응답합니다. (DB 저장은 log_queue.py의 flusher가 맡습니다)
+            for position in insert_positions:
+                row = rows[position]
+                if chrome_log_queue.enqueue(row):
+                    open_visits.add(row["user_id"], row["url"], row["visit_id"])
+                    record_outcome(position, {"success": True, "id": None, "visit_id": row["visit_id"]})
+                else:
+                    record_outcome(position, {"success": False, "error": "로그 저장 대기열이 가득 찼습니다. 잠시 후 다시 시도해 주세요."})
+            insert_positions = []
+
+        # 방문 로그 묶음 저장 (이미 저장된 visit_id는 건너뛰므로 재전송된 묶음도 실패하지 않습니다)
+        for start in range(0, len(insert_positions), INSERT_CHUNK_SIZE):
+            chunk_positions = insert_positions[start:start + INSERT_CHUNK_SIZE]
+            chunk = [rows[position] for position in chunk_positions]
+            try:
+                # supabase 클라이언트는 동기 호출이므로 이벤트 루프를 막지 않도록 스레드에서 실행합니다.
+                saved_ids = {saved["visit_id"]: saved["id"] for saved in await asyncio.to_thread(insert_log_rows, chunk)}
+                # 이미 저장되어 있던 방문은 id 없이 성공으로 돌려줍니다.
+                outcomes = [{"success": True, "id": saved_ids.get(row["visit_id"]), "visit_id": row["visit_id"]} for row in chunk]
+                for row in chunk:
+                    open_visits.add(row["user_id"], row["url"], row["visit_id"])
+            except Exception as e:
+                print(f"❌ 크롬 로그 일괄 저장 실패 ({len(chunk)}개): {str(e)}")
+                outcomes = [{"success": False, "error": str(e)}] * len(chunk)
+            for position, outcome in zip(chunk_positions, outcomes):
+                record_outcome(position, outcome)
+
+        # 이전 요청에서 받은 방문의 체류시간: 저장 전인 방문은 메모리에서 바로 반영하고,
+        # 이미 저장된 방문만 모아 스레드 한 번에서 업데이트합니다. (이벤트 루프를 막지 않도록)
+        def record_duration(index, updated_log):
+            if updated_log:
+                results[index] = {"index": index, "type": "duration", "success": True, "id": updated_log.get("id"), "visit_id": updated_log.get("visit_id")}
+            else:
+                results[index] = {"index": index, "type": "duration", "success": False, "error": "해당 로그를 찾을 수 없습니다."}
+
+        stored_durations = []
+        for index, data in pending_durations:
+            try:
+                pending, visit_id = apply_pending_duration(data)
+            except Exception as e:
+                results[index] = {"index": index, "type": "duration", "success": False, "error": str(e)}
+                continue
+            if pending is not None:
+                record_duration(index, pending)
+            else:
+                stored_durations.append((index, data, visit_id))
+
+        def update_stored_durations():
+            outcomes = []
+            for _, data, visit_id in stored_durations:
+                try:
+                    outcomes.append(update_stored_duration(data, visit_id))
+                except Exception as e:
+                    outcomes.append(e)
+            return outcomes
+
+        if stored_durations:
+            for (index, _, _), outcome in zip(stored_durations, await asyncio.to_thread(update_stored_durations)):
+                if isinstance(outcome, Exception):
+                    results[index] = {"index": index, "type": "duration", "success": False, "error": str(outcome)}
+                else:
+                    record_duration(index, outcome)
+
+        succeeded = sum(1 for result in results if result["success"])
+        print(f"📥 크롬 로그 일괄 처리: 이벤트 {len(results)}개 중 {succeeded}개 성공 (방문 {len(logs)}개, 체류시간 {len(durations)}개)")
+        return {
+            "success": succeeded == len(results),
+            "message": f"이벤트 {len(results)}개 중 {succeeded}개를 처리했습니다.",
+            "data": {
+                "received": len(results),
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "results": results,
+            }
+        }
+
+    except Exception as e:
+        print(f"❌ 에러 발생: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"서버 내부 오류: {str(e)}"
+        )
+
+# write-behind 큐 지표 엔드포인트
+@chrome_router.get("/log_queue/stats")
+async def get_log_queue_stats():
+    """크롬 로그 저장 대기열 길이, 묶음 저장 지연 시간, 파일 기록 건수를 반환합니다."""
+    return chrome_log_queue.stats()
+
+# 열린 방문 인덱스 지표 엔드포인트
+@chrome_router.get("/visits/stats")
+async def get_open_visit_stats():
+    """
+    visit_id 없이 들어온 체류시간 업데이트를 위한 열린 방문 인덱스 크기와 적중 수,
+    방문 수명 관리 모드의 열린 방문 수를 반환합니다.
+    """
+    return {"index": open_visits.stats(), "lifecycle": open_visit_table.stats()}
+
 # 로그 조회 엔드포인트
 @chrome_router.get("/logs")
 async def get_logs(limit: int = 10, user_id: Optional[str] = None):
@@ -0,0 +1,392 @@
+# back/chrome/chrome_api/log_queue.py
+# 크롬 로그 write-behind 큐
+# - /log_url은 검증한 행을 큐에 넣고 바로 응답합니다. DB 저장은 백그라운드 flusher가 맡습니다.
+# - flusher는 행이 batch_size만큼 모이거나 flush_interval이 지나면 묶음 insert로 저장합니다.
+# - 저장에 실패하면 백오프로 다시 시도하고, 그래도 실패하면 로컬 파일(spill)에 적어 두었다가 DB가 돌아오면 다시 저장합니다.
+# - 저장 중이거나 파일에 적어 둔 행에 도착한 체류시간도 잃지 않도록, 저장이 끝난 뒤(또는 다시 저장할 때) 반영합니다.
+# - visit_id 유니크 인덱스에 걸리는 중복 행(익스텐션 재전송)은 건너뛰고 나머지만 저장합니다. (upsert ignore_duplicates)
+# - 앱 종료 시 큐에 남은 행을 모두 저장(또는 spill)하고 끝납니다.
+
+import asyncio
+import json
+import os
+import shutil
+import time
+from collections import deque
+
+from db.connect import supabase
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+# 큐에 쌓아 둘 수 있는 최대 행 수 (넘으면 /log_url이 503을 반환하고 익스텐션이 다시 보냅니다)
+LOG_QUEUE_MAX = int(os.getenv("CHROME_LOG_QUEUE_MAX", "10000"))
+# 한 번의 insert에 담을 최대 행 수
+FLUSH_BATCH_SIZE = 200
+# 첫 행이 들어온 뒤 이 시간이 지나면 모인 만큼 저장합니다. (초)
+FLUSH_INTERVAL = 2.0
+# 저장 실패 시 다시 시도하기 전 대기 시간 (초, 시도마다 사용)
+RETRY_BACKOFF = (0.5, 1.0, 2.0)
+# DB에 저장하지 못한 행을 적어 두는 파일 (JSON Lines)
+SPILL_PATH = os.getenv("CHROME_LOG_SPILL_PATH", os.path.join(DATA_DIR, "chrome_logs_spill.jsonl"))
+# 다시 저장할 때 한 행씩 넣어 봐도 저장되지 않는 행을 옮겨 두는 파일 (JSON Lines, 직접 확인용)
+REJECTED_PATH = os.getenv("CHROME_LOG_REJECTED_PATH", os.path.join(DATA_DIR, "chrome_logs_rejected.jsonl"))
+# 한 행씩 다시 넣을 때 연결 실패나 서버 에러가 이만큼 연속으로 나면 DB 장애로 보고 멈춥니다.
+ISOLATE_GIVE_UP = 3
+# 행 자체의 문제로 저장되지 않는 에러의 Postgres SQLSTATE 분류 (22: 데이터 예외, 23: 제약 조건 위반)
+ROW_ERROR_CLASSES = ("22", "23")
+
+
+def insert_log_rows(rows: list) -> list:
+    """
+    행을 묶음으로 저장하고 저장된 행을 반환합니다.
+    이미 저장된 visit_id(재전송, 재시도)는 묶음 전체를 실패시키지 않고 건너뜁니다. (반환 목록에서 빠집니다)
+    """
+    response = supabase.table('chrome_logs').upsert(rows, on_conflict="visit_id", ignore_duplicates=True).execute()
+    return response.data or []
+
+
+def _update_row(visit_id: str, changes: dict) -> list:
+    response = supabase.table('chrome_logs').update(changes).eq('visit_id', visit_id).execute()
+    return response.data or []
+
+
+def _is_row_error(error: Exception) -> bool:
+    """다시 시도해도 저장되지 않는 행의 에러인지 (연결 실패, 타임아웃, 5xx 등은 False)"""
+    code = getattr(error, "code", None)
+    return isinstance(code, str) and code[:2] in ROW_ERROR_CLASSES
+
+
+def _append_jsonl(path: str, records: list):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class ChromeLogQueue:
+    """크롬 로그 행을 모아서 저장하는 크기 제한 큐와 백그라운드 flusher"""
+
+    def __init__(self, maxsize: int = LOG_QUEUE_MAX, batch_size: int = FLUSH_BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, spill_path: str = SPILL_PATH,
+                 rejected_path: str = REJECTED_PATH):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.rejected_path = rejected_path
+        self._rows = deque()
+        # 지금 저장 중인 행 (insert가 이미 보내졌을 수 있으므로 여기서 바꾼 값은 저장 후 다시 반영합니다)
+        self._inflight = []
+        # visit_id -> 저장 중에 도착한 변경 사항
+        self._late_patches = {}
+        # spill 파일에 적어 둔 행의 visit_id
+        self._spilled_ids = set()
+        # 행이 DB에 저장되거나 spill 파일에 기록된 뒤 호출할 함수 (visit_id 목록을 받습니다)
+        self._flush_listeners = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.retries = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dead_lettered = 0
+        self.spill_skipped = 0
+        self.late_patched = 0
+        self.max_depth = 0
+        self.last_flush_ms = None
+        self.total_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def enqueue(self, row: dict) -> bool:
+        """행을 큐에 넣습니다. 큐가 가득 찼으면 False"""
+        if len(self._rows) >= self.maxsize:
+            self.rejected += 1
+            return False
+        self._rows.append(row)
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, len(self._rows))
+        # 첫 행이 들어오면 flusher가 모으기 시작하고, batch_size가 차면 바로 저장합니다.
+        if len(self._rows) == 1 or len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def add_flush_listener(self, listener):
+        """
+        큐에 넣은 행이 DB에 저장되거나 spill 파일에 기록되어 프로세스가 죽어도 남게 되면
+        그 행들의 visit_id 목록으로 listener를 호출합니다. (visit_lifecycle.py가 저널에 닫힘을 기록할 때 사용)
+        """
+        self._flush_listeners.append(listener)
+
+    def _notify_flushed(self, rows: list):
+        visit_ids = [row["visit_id"] for row in rows if row.get("visit_id")]
+        for listener in self._flush_listeners:
+            try:
+                listener(visit_ids)
+            except Exception as e:
+                print(f"⚠️ 크롬 로그 저장 완료 알림 실패: {str(e)}")
+
+    def update_pending(self, match, changes: dict, visit_id: str = None):
+        """
+        아직 DB에 반영되지 않은 행 중 match(row)가 True인 가장 최근 행에 changes를 반영하고 그 행을 반환합니다. 없으면 None
+        (방문 직후 도착한 체류시간을 insert할 행에 바로 넣어 업데이트를 생략합니다)
+        - 큐에서 기다리는 행: 저장될 행에 바로 반영합니다.
+        - 저장 중인 행: 행에 반영하고, 저장이 끝나면 visit_id로 한 번 더 업데이트합니다.
+        - spill 파일에 적어 둔 행(visit_id를 알 때만): 변경 사항을 파일에 덧붙여 다시 저장할 때 반영합니다.
+        """
+        for row in reversed(self._rows):
+            if match(row):
+                row.update(changes)
+                return row
+        for row in reversed(self._inflight):
+            if match(row):
+                row.update(changes)
+                self._late_patches.setdefault(row["visit_id"], {}).update(changes)
+                return row
+        if visit_id and visit_id in self._spilled_ids:
+            _append_jsonl(self.spill_path, [{"_patch": visit_id, "changes": changes}])
+            return {"visit_id": visit_id, **changes}
+        return None
+
+    def _take_batch(self) -> list:
+        count = min(self.batch_size, len(self._rows))
+        return [self._rows.popleft() for _ in range(count)]
+
+    async def _write(self, rows: list) -> bool:
+        """묶음 insert를 백오프로 재시도합니다. 끝내 실패하면 spill 파일에 적고 False"""
+        started = time.perf_counter()
+        for attempt, delay in enumerate((0.0,) + RETRY_BACKOFF):
+            if delay:
+                self.retries += 1
+                await asyncio.sleep(delay)
+            try:
+                # supabase 클라이언트는 동기 호출이므로 이벤트 루프를 막지 않도록 스레드에서 실행합니다.
+                await asyncio.to_thread(insert_log_rows, rows)
+                break
+            except Exception as e:
+                print(f"⚠️ 크롬 로그 저장 실패 ({attempt + 1}번째 시도, {len(rows)}개): {str(e)}")
+        else:
+            self._spill(rows)
+            return False
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.flushed += len(rows)
+        self.last_flush_ms = latency_ms
+        self.total_flush_ms += latency_ms
+        self.max_flush_ms = max(self.max_flush_ms, latency_ms)
+        return True
+
+    async def _apply_late_patches(self):
+        """저장 중에 도착한 변경 사항을 visit_id로 업데이트합니다. (업데이트하는 동안 도착한 변경도 이어서 반영)"""
+        while self._late_patches:
+            patches, self._late_patches = self._late_patches, {}
+            for visit_id, changes in patches.items():
+                try:
+                    await asyncio.to_thread(_update_row, visit_id, changes)
+                    self.late_patched += 1
+                except Exception as e:
+                    print(f"⚠️ 저장 중 도착한 크롬 로그 변경 반영 실패 ({visit_id}): {str(e)}")
+
+    def _spill(self, rows: list, patches: list = ()):
+        _append_jsonl(self.spill_path, list(rows) + list(patches))
+        self._spilled_ids.update(row["visit_id"] for row in rows if row.get("visit_id"))
+        self.spilled += len(rows)
+        print(f"❌ 크롬 로그 {len(rows)}개를 DB에 저장하지 못해 파일에 기록했습니다: {self.spill_path}")
+
+    def _spill_pending(self) -> int:
+        if not os.path.exists(self.spill_path):
+            return 0
+        with open(self.spill_path, encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip() and not line.startswith('{"_patch"'))
+
+    async def _insert_isolated(self, rows: list) -> list:
+        """
+        묶음 저장이 실패한 행을 한 행씩 다시 넣어, 행 자체의 문제(데이터 예외, 제약 조건 위반)로 저장되지 않는 행만 rejected 파일로 옮깁니다.
+        연결 실패나 서버 에러로 저장하지 못한 행은 반환합니다. (호출한 쪽이 다시 파일에 적습니다)
+        이 호출에서 아직 저장된 행이 없거나 연속으로 ISOLATE_GIVE_UP번 실패하면 DB 장애로 보고 남은 행도 모두 반환합니다.
+        """
+        failed, retry = [], []
+        succeeded = streak = 0
+        for position, row in enumerate(rows):
+            try:
+                await asyncio.to_thread(insert_log_rows, [row])
+            except Exception as e:
+                if _is_row_error(e):
+                    failed.append((row, str(e)))
+                    streak = 0
+                    continue
+                retry.append(row)
+                streak += 1
+                if succeeded == 0 or streak >= ISOLATE_GIVE_UP:
+                    retry.extend(rows[position + 1:])
+                    break
+                continue
+            succeeded += 1
+            streak = 0
+            self.replayed += 1
+        if failed:
+            _append_jsonl(self.rejected_path, [{**row, "_error": error} for row, error in failed])
+            self.dead_lettered += len(failed)
+            print(f"❌ 저장되지 않는 크롬 로그 {len(failed)}개를 따로 기록했습니다: {self.rejected_path}")
+        return retry
+
+    async def _replay_spill(self):
+        """
+        spill 파일에 적어 둔 행을 다시 저장합니다.
+        파일에 덧붙여 둔 변경 사항은 행에 합쳐 저장하고, 행이 이미 저장된 변경 사항은 visit_id로 업데이트합니다.
+        DB가 응답하지 않으면 남은 행을 다시 파일에 적어 둡니다.
+        """
+        replay_path = self.spill_path + ".replay"
+        if os.path.exists(replay_path):
+            # 이전 재저장 도중 멈춰 남은 파일: 덮어쓰지 않고 새 spill 파일을 뒤에 이어 붙여 함께 다시 저장합니다.
+            if os.path.exists(self.spill_path):
+                with open(replay_path, "rb+") as dst:
+                    dst.seek(0, os.SEEK_END)
+                    # 기록하던 중 멈춰 잘린 마지막 줄에 새 행이 붙지 않도록 줄을 바꿉니다.
+                    if dst.tell():
+                        dst.seek(-1, os.SEEK_END)
+                        if dst.read(1) != b"\n":
+                            dst.write(b"\n")
+                    with open(self.spill_path, "rb") as src:
+                        shutil.copyfileobj(src, dst)
+                os.remove(self.spill_path)
+        elif os.path.exists(self.spill_path):
+            os.replace(self.spill_path, replay_path)
+        else:
+            return
+        rows, by_visit_id, patches = [], {}, {}
+        skipped = 0
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 기록하던 중 멈춰 잘린 줄
+                    skipped += 1
+                    continue
+                if "_patch" in record:
+                    target = by_visit_id.get(record["_patch"])
+                    if target is not None:
+                        target.update(record["changes"])
+                    else:
+                        patches.setdefault(record["_patch"], {}).update(record["changes"])
+                    continue
+                rows.append(record)
+                if record.get("visit_id"):
+                    by_visit_id[record["visit_id"]] = record
+        if skipped:
+            self.spill_skipped += skipped
+            print(f"⚠️ 파일에 기록한 크롬 로그 중 읽을 수 없는 줄 {skipped}개를 건너뛰었습니다.")
+        self._spilled_ids.update(by_visit_id)
+        replayed_before = self.replayed
+
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
+            try:
+                await asyncio.to_thread(insert_log_rows, chunk)
+                self.replayed += len(chunk)
+            except Exception as e:
+                print(f"⚠️ 파일에 기록한 크롬 로그 재저장 실패: {str(e)}")
+                # 저장되지 않는 행이 있으면 그 행만 빼고 계속 저장합니다.
+                retry = await self._insert_isolated(chunk)
+                if retry:
+                    # DB가 응답하지 않아 저장하지 못한 행은 남은 행과 함께 다시 파일에 적어 둡니다.
+                    self._spilled_ids.difference_update(row.get("visit_id") for row in chunk)
+                    self._spill(retry + rows[start + len(chunk):], [{"_patch": visit_id, "changes": changes} for visit_id, changes in patches.items()])
+                    break
+            self._spilled_ids.difference_update(row.get("visit_id") for row in chunk)
+        else:
+            for visit_id, changes in patches.items():
+                try:
+                    await asyncio.to_thread(_update_row, visit_id, changes)
+                except Exception as e:
+                    print(f"⚠️ 파일에 기록한 크롬 로그 변경 반영 실패 ({visit_id}): {str(e)}")
+        os.remove(replay_path)
+        if self.replayed > replayed_before:
+            print(f"✅ 파일에 기록했던 크롬 로그 재저장: 누적 {self.replayed}개")
+
+    async def _safe_replay_spill(self):
+        try:
+            await self._replay_spill()
+        except Exception as e:
+            # 재저장에 실패해도 flusher는 계속 돌아야 큐가 차서 /log_url이 503만 반환하지 않습니다.
+            print(f"⚠️ 파일에 기록한 크롬 로그 재저장 실패: {str(e)}")
+
+    async def _run(self):
+        await self._safe_replay_spill()
+        while not self._stopping or self._rows:
+            if not self._rows:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if len(self._rows) < self.batch_size and not self._stopping:
+                # 첫 행이 들어온 뒤 flush_interval 동안 더 모읍니다. (batch_size가 차면 바로 저장)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            # 저장이 끝날 때까지 update_pending이 이 행들도 찾을 수 있게 둡니다.
+            self._inflight = self._take_batch()
+            written = await self._write(self._inflight)
+            # DB에 저장했거나 spill 파일에 적었으므로 이제 잃지 않습니다.
+            self._notify_flushed(self._inflight)
+            if written:
+                await self._apply_late_patches()
+            else:
+                # spill 파일에 적을 때 이미 바뀐 값으로 적었습니다.
+                self._late_patches.clear()
+            self._inflight = []
+            if written and os.path.exists(self.spill_path) and not self._stopping:
+                # DB가 다시 응답하면 spill 파일의 행도 저장합니다.
+                await self._safe_replay_spill()
+
+    def start(self):
+        """앱 시작 시 flusher를 시작합니다. (main.py lifespan에서 호출)"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            print("✅ 크롬 로그 write-behind 큐 시작")
+
+    async def stop(self):
+        """앱 종료 시 큐에 남은 행을 모두 저장하고 flusher를 멈춥니다."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        print(f"✅ 크롬 로그 write-behind 큐 종료 (저장 {self.flushed}개, 파일 기록 {self.spilled}개)")
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "depth": len(self._rows),
+            "max_depth": self.max_depth,
+            "capacity": self.maxsize,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "retries": self.retries,
+            "inflight": len(self._inflight),
+            "late_patched": self.late_patched,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "dead_lettered": self.dead_lettered,
+            "spill_skipped": self.spill_skipped,
+            "spill_pending": self._spill_pending(),
+            "last_flush_ms": round(self.last_flush_ms, 1) if self.last_flush_ms is not None else None,
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 1) if self.flushes else None,
+            "max_flush_ms": round(self.max_flush_ms, 1),
+        }
+
+
+# 앱 전체에서 공유하는 크롬 로그 큐
+chrome_log_queue = ChromeLogQueue()
@@ -0,0 +1,83 @@
+# back/chrome/chrome_api/text_normalizer.py
+# 크롬 로그 수집용 텍스트 정리 (모든 이벤트마다 실행됩니다)
+# - 바꿀 특수문자는 모두 ASCII 밖에 있으므로, ASCII로만 된 문자열(URL, 도메인 등)은 바로 그대로 반환합니다.
+# - 나머지는 미리 컴파일한 정규식 하나로 바꿀 문자가 있는지 한 번에 찾고, 있을 때만 바꿉니다. (대부분의 한글 제목에는 없습니다)
+# - 바꿀 때는 str.replace를 씁니다. CPython의 str.translate는 한글 문자열에서 글자마다 테이블을 조회해
+#   str.replace 7번보다 4~7배 느렸습니다. (scripts/bench_text_normalizer.py로 확인)
+# - siteSpecific 같은 중첩 데이터는 재귀 없이 스택으로 돌고, 바뀐 값이 없는 딕셔너리/리스트는 복사하지 않고 그대로 씁니다.
+# 성능 확인: python scripts/bench_text_normalizer.py
+
+import re
+
+# 바꿀 문자 -> 바꿀 문자열
+REPLACEMENTS = {
+    '\u2014': '-',  # em dash
+    '\u2013': '-',  # en dash
+    '\u2018': "'",  # left single quotation mark
+    '\u2019': "'",  # right single quotation mark
+    '\u201c': '"',  # left double quotation mark
+    '\u201d': '"',  # right double quotation mark
+    '\u2026': '...',  # horizontal ellipsis
+}
+_SPECIAL_CHARS = re.compile("[" + "".join(REPLACEMENTS) + "]")
+
+
+def _replace_special(text: str) -> str:
+    for old, new in REPLACEMENTS.items():
+        text = text.replace(old, new)
+    return text
+
+
+def clean_text(text):
+    """텍스트에서 특수문자를 제거하는 함수"""
+    if not text:
+        return text
+    if not isinstance(text, str):
+        text = str(text)
+    # 바꿀 문자는 모두 ASCII 밖에 있습니다.
+    if text.isascii() or not _SPECIAL_CHARS.search(text):
+        return text
+    return _replace_special(text)
+
+
+def clean_nested_dict(data):
+    """
+    딕셔너리 또는 리스트 내의 모든 문자열 값에 clean_text를 적용하는 함수
+    바뀐 값이 없는 딕셔너리/리스트는 새로 만들지 않고 원래 객체를 그대로 반환합니다.
+    """
+    if isinstance(data, str):
+        return clean_text(data)
+    if not isinstance(data, (dict, list)):
+        return data
+
+    # 스택 항목: [컨테이너, 자식 (키, 값) 반복자, 바뀐 자식 {키: 새 값}, 부모에서의 키]
+    stack = [[data, iter(data.items()) if isinstance(data, dict) else enumerate(data), None, None]]
+    while True:
+        frame = stack[-1]
+        for key, value in frame[1]:
+            if isinstance(value, str):
+                if value.isascii() or not _SPECIAL_CHARS.search(value):
+                    continue
+                if frame[2] is None:
+                    frame[2] = {}
+                frame[2][key] = _replace_special(value)
+            elif value and isinstance(value, (dict, list)):
+                stack.append([value, iter(value.items()) if isinstance(value, dict) else enumerate(value), None, key])
+                break
+        else:
+            # 자식을 모두 확인한 컨테이너: 바뀐 값이 있을 때만 복사합니다.
+            container, _, changes, parent_key = stack.pop()
+            if changes:
+                if isinstance(container, dict):
+                    container = {**container, **changes}
+                else:
+                    container = list(container)
+                    for index, cleaned in changes.items():
+                        container[index] = cleaned
+            if not stack:
+                return container
+            if changes:
+                parent = stack[-1]
+                if parent[2] is None:
+                    parent[2] = {}
+                parent[2][parent_key] = container
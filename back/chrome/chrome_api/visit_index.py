@@ -0,0 +1,68 @@
+# back/chrome/chrome_api/visit_index.py
+# 열린 방문 인덱스: (사용자, URL) -> 가장 최근 방문의 visit_id
+# visit_id를 보내지 않는 이전 버전 익스텐션의 체류시간 업데이트도 URL 검색 없이 visit_id로 바로 업데이트하기 위해 사용합니다.
+# 서버 메모리에만 있으므로, 재시작 전에 시작된 방문은 기존 방식(URL/도메인 검색)으로 찾습니다.
+
+import os
+import time
+from collections import OrderedDict
+
+# 방문 시작 후 이 시간이 지나면 인덱스에서 뺍니다. (초)
+OPEN_VISIT_TTL = int(os.getenv("CHROME_OPEN_VISIT_TTL", str(6 * 3600)))
+# 인덱스에 유지할 최대 방문 수 (넘으면 가장 오래된 방문부터 뺍니다)
+MAX_OPEN_VISITS = 100000
+
+
+class OpenVisitIndex:
+    """TTL이 있는 (user_id, url) -> visit_id 인덱스"""
+
+    def __init__(self, ttl: float = OPEN_VISIT_TTL, max_entries: int = MAX_OPEN_VISITS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # (user_id, url) -> (visit_id, 만료 시각). TTL이 모두 같으므로 앞쪽이 가장 먼저 만료됩니다.
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _evict(self, now: float):
+        while self._entries:
+            key, (_, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+            self.evictions += 1
+
+    def add(self, user_id: str, url: str, visit_id: str):
+        """새 방문을 등록합니다. 같은 (사용자, URL)의 이전 방문은 새 방문으로 바뀝니다."""
+        now = time.monotonic()
+        key = (user_id, url)
+        self._entries.pop(key, None)
+        self._entries[key] = (visit_id, now + self.ttl)
+        self._evict(now)
+
+    def get(self, user_id: str, url: str):
+        """(사용자, URL)의 가장 최근 방문 visit_id. 없거나 만료됐으면 None"""
+        now = time.monotonic()
+        self._evict(now)
+        entry = self._entries.get((user_id, url))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def stats(self) -> dict:
+        self._evict(time.monotonic())
+        return {
+            "open_visits": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_sec": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# 앱 전체에서 공유하는 열린 방문 인덱스
+open_visits = OpenVisitIndex()
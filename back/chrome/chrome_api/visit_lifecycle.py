@@ -0,0 +1,207 @@
+# back/chrome/chrome_api/visit_lifecycle.py
+# 방문 수명 관리 (CHROME_VISIT_LIFECYCLE=true일 때 사용)
+# - 방문 로그를 바로 저장하지 않고 메모리의 열린 방문 테이블에 두었다가,
+#   체류시간이 도착하거나 시간이 지나 방문이 닫히면 완성된 행으로 한 번만 저장합니다. (insert + select + update → insert 한 번)
+# - 열린 방문은 저널 파일(JSON Lines)에 적어 두므로, 서버가 재시작해도 열린 방문을 다시 불러옵니다.
+# - 닫힌 방문은 write-behind 큐(log_queue.py)로 넘어가 묶음 insert로 저장됩니다.
+#   저널의 닫힘 기록은 큐가 그 행을 DB에 저장하거나 spill 파일에 적은 뒤에 남깁니다. (그 전에 죽으면 다음 시작 때 다시 엽니다)
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+
+from .log_queue import chrome_log_queue, DATA_DIR
+from .visit_index import open_visits
+
+CHROME_VISIT_LIFECYCLE = os.getenv("CHROME_VISIT_LIFECYCLE", "false").lower() == "true"
+JOURNAL_PATH = os.getenv("CHROME_VISIT_JOURNAL_PATH", os.path.join(DATA_DIR, "open_visits.journal"))
+# 체류시간이 오지 않은 방문을 닫을 시간 (초, 닫을 때 체류시간은 0으로 저장합니다)
+VISIT_TIMEOUT = int(os.getenv("CHROME_VISIT_TIMEOUT", str(30 * 60)))
+# 시간이 지난 방문을 확인하는 주기 (초)
+SWEEP_INTERVAL = 60
+# 열린 방문 수 한도 (넘으면 가장 오래된 방문부터 닫습니다)
+MAX_OPEN_VISITS = 50000
+# 저널에 닫힌 방문 기록이 이만큼 쌓이면 열린 방문만 남기고 다시 씁니다.
+COMPACT_AFTER = 5000
+
+
+class QueueFullError(Exception):
+    """write-behind 큐가 가득 차서 닫힌 방문을 넘기지 못했을 때 발생하는 예외"""
+
+
+class OpenVisitTable:
+    """visit_id -> 저장 전 방문 행. 열고 닫을 때마다 저널에 기록합니다."""
+
+    def __init__(self, journal_path: str = JOURNAL_PATH, timeout: float = VISIT_TIMEOUT,
+                 max_open: int = MAX_OPEN_VISITS):
+        self.journal_path = journal_path
+        self.timeout = timeout
+        self.max_open = max_open
+        # visit_id -> (행, 연 시각 time.time()). 연 순서대로 있으므로 앞쪽이 가장 오래된 방문입니다.
+        self._visits = OrderedDict()
+        # visit_id -> (행, 연 시각). 닫아서 저장 대기열로 넘겼지만 아직 저장(또는 spill)되지 않은 방문
+        self._closing = {}
+        self._journal = None
+        self._closed_since_compact = 0
+        self._task = None
+        self.opened = 0
+        self.closed = 0
+        self.timed_out = 0
+        self.recovered = 0
+
+    def _open_journal(self):
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return self._journal
+
+    def _append(self, record: dict):
+        journal = self._open_journal()
+        journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # 프로세스가 죽어도 기록이 남도록 매번 OS로 내보냅니다.
+        journal.flush()
+
+    def recover(self):
+        """저널을 다시 읽어 닫히지 않은 방문을 복구하고, 저널을 열린 방문만으로 다시 씁니다."""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 기록하던 중 멈춰 잘린 마지막 줄
+                    continue
+                if record["op"] == "open":
+                    self._visits[record["row"]["visit_id"]] = (record["row"], record["opened_at"])
+                else:
+                    self._visits.pop(record["visit_id"], None)
+        # visit_id를 보내지 않는 익스텐션의 체류시간도 복구한 방문으로 닫히도록 인덱스에 다시 등록합니다.
+        for visit_id, (row, _) in self._visits.items():
+            open_visits.add(row["user_id"], row["url"], visit_id)
+        self.recovered = len(self._visits)
+        self._compact()
+        if self.recovered:
+            print(f"🔄 저널에서 열린 방문 {self.recovered}개를 복구했습니다.")
+
+    def _compact(self):
+        """저널을 현재 열린 방문만으로 다시 씁니다."""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            # 저장을 기다리는 방문도 아직 잃을 수 있으므로 열린 방문으로 적어 둡니다.
+            for row, opened_at in list(self._visits.values()) + list(self._closing.values()):
+                f.write(json.dumps({"op": "open", "row": row, "opened_at": opened_at}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.journal_path)
+        self._closed_since_compact = 0
+
+    def open(self, row: dict):
+        """
+        방문을 엽니다. (저장하지 않고 저널에만 기록)
+        열린 방문이 한도에 차 있으면 가장 오래된 방문을 먼저 닫습니다. 저장 대기열이 가득 차 닫지 못하면
+        새 방문을 열지 않고 QueueFullError를 발생시킵니다. (테이블이 한도를 넘어 계속 커지지 않도록)
+        """
+        visit_id = row["visit_id"]
+        if visit_id not in self._visits:
+            while len(self._visits) >= self.max_open:
+                self._close(next(iter(self._visits)), None)
+                self.timed_out += 1
+        opened_at = time.time()
+        self._append({"op": "open", "row": row, "opened_at": opened_at})
+        self._visits.pop(visit_id, None)
+        self._visits[visit_id] = (row, opened_at)
+        self.opened += 1
+
+    def _close(self, visit_id: str, duration):
+        row, _ = self._visits[visit_id]
+        if duration is not None:
+            row["duration"] = duration
+        if not chrome_log_queue.enqueue(row):
+            raise QueueFullError("로그 저장 대기열이 가득 찼습니다. 잠시 후 다시 시도해 주세요.")
+        # 저널의 닫힘 기록은 큐가 행을 저장(또는 spill)한 뒤 _on_flushed에서 남깁니다.
+        self._closing[visit_id] = self._visits.pop(visit_id)
+        self.closed += 1
+        return row
+
+    def _on_flushed(self, visit_ids: list):
+        """write-behind 큐가 행을 DB에 저장하거나 spill 파일에 적은 뒤 호출됩니다. 이때 저널에 닫힘을 기록합니다."""
+        for visit_id in visit_ids:
+            if self._closing.pop(visit_id, None) is not None:
+                self._append({"op": "close", "visit_id": visit_id})
+                self._closed_since_compact += 1
+
+    def close(self, visit_id: str, duration: int):
+        """
+        체류시간을 넣어 방문을 닫고 저장 대기열로 넘깁니다. 닫은 행을 반환하고, 열린 방문이 아니면 None
+        저장 대기열이 가득 차면 방문을 연 채로 두고 QueueFullError를 발생시킵니다.
+        """
+        if visit_id not in self._visits:
+            return None
+        return self._close(visit_id, duration)
+
+    def sweep(self):
+        """시간이 지난 방문을 체류시간 없이(0) 닫습니다."""
+        deadline = time.time() - self.timeout
+        expired = [visit_id for visit_id, (_, opened_at) in self._visits.items() if opened_at < deadline]
+        for visit_id in expired:
+            try:
+                self._close(visit_id, None)
+            except QueueFullError:
+                # 다음 확인 때 다시 닫습니다.
+                break
+            self.timed_out += 1
+        if self._closed_since_compact >= COMPACT_AFTER:
+            self._compact()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ 열린 방문 정리 실패: {str(e)}")
+
+    def start(self):
+        """앱 시작 시 저널을 복구하고 시간이 지난 방문을 닫는 작업을 시작합니다. (main.py lifespan에서 호출)"""
+        if self._task is None:
+            self.recover()
+            self._task = asyncio.create_task(self._run())
+            print(f"✅ 방문 수명 관리 시작 (열린 방문 {len(self._visits)}개)")
+
+    async def stop(self):
+        """
+        앱 종료 시 정리 작업을 멈추고 저널을 닫습니다.
+        열린 방문은 저널에 남아 있다가 다음 시작 때 복구됩니다.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._journal is not None:
+            self._compact()
+            self._journal = None
+
+    def stats(self) -> dict:
+        oldest = next(iter(self._visits.values()), None)
+        return {
+            "enabled": CHROME_VISIT_LIFECYCLE,
+            "open": len(self._visits),
+            "closing": len(self._closing),
+            "max_open": self.max_open,
+            "timeout_sec": self.timeout,
+            "oldest_open_sec": round(time.time() - oldest[1], 1) if oldest else None,
+            "opened": self.opened,
+            "closed": self.closed,
+            "timed_out": self.timed_out,
+            "recovered": self.recovered,
+        }
+
+
+# 앱 전체에서 공유하는 열린 방문 테이블
+open_visit_table = OpenVisitTable()
+chrome_log_queue.add_flush_listener(open_visit_table._on_flushed)
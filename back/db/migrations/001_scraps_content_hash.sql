@@ -0,0 +1,10 @@
+-- back/db/migrations/001_scraps_content_hash.sql
+-- 스크랩을 (user_id, content_hash)로 조회/중복 방지하기 위한 컬럼과 인덱스
+-- 1) 컬럼 추가 → 2) scripts/backfill_scrap_hashes.py로 기존 스크랩의 해시 채우기(중복 제거) → 3) 유니크 인덱스 생성 순서로 적용합니다.
+
+-- 1) 컬럼 추가
+alter table scraps add column if not exists content_hash text;
+
+-- 3) backfill 후 실행 (create_scrap의 upsert on_conflict 대상)
+create unique index if not exists scraps_user_id_content_hash_key
+    on scraps (user_id, content_hash);
@@ -0,0 +1,5 @@
+-- back/db/migrations/002_scraps_keyset_index.sql
+-- 스크랩 목록 키셋 페이지네이션 (user_id, scraped_at desc, id desc) 조회용 인덱스
+
+create index if not exists scraps_user_id_scraped_at_id_idx
+    on scraps (user_id, scraped_at desc, id desc);
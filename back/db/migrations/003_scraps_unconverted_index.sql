@@ -0,0 +1,7 @@
+-- back/db/migrations/003_scraps_unconverted_index.sql
+-- 야간 스크랩 → 카드 변환 배치(scripts/convert_scraps_to_cards.py)용 인덱스
+-- 아직 카드가 되지 않은 스크랩만 (user_id, scraped_at, id) 순서로 담습니다.
+
+create index if not exists scraps_unconverted_user_id_scraped_at_id_idx
+    on scraps (user_id, scraped_at, id)
+    where converted_to_card = false;
@@ -0,0 +1,9 @@
+-- back/db/migrations/004_chrome_logs_visit_id.sql
+-- 크롬 로그 체류시간을 방문 ID로 바로 업데이트하기 위한 컬럼과 인덱스
+-- /api/log_url이 돌려준(또는 익스텐션이 만든) visit_id로 update_duration이 URL 검색 없이 한 행을 업데이트합니다.
+-- 이전 로그는 visit_id가 없으므로(null) 기존 방식으로 찾습니다.
+
+alter table chrome_logs add column if not exists visit_id uuid;
+
+create unique index if not exists chrome_logs_visit_id_key
+    on chrome_logs (visit_id);
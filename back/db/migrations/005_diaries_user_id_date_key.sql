@@ -0,0 +1,9 @@
+-- back/db/migrations/005_diaries_user_id_date_key.sql
+-- 사용자별 하루 일기는 하나뿐이므로 (user_id, date)에 유니크 인덱스를 둡니다.
+-- 야간 스크랩 → 카드 변환 배치(scripts/convert_scraps_to_cards.py)가 일기를 만들 때 이 키로 upsert해서,
+-- 같은 순간 프론트엔드가 만든 일기와 중복되지 않고 먼저 만들어진 일기를 사용합니다.
+-- 이미 같은 날짜의 일기가 두 개 이상 있으면 인덱스가 만들어지지 않으므로 먼저 정리해야 합니다:
+--   select user_id, date, count(*) from diaries group by user_id, date having count(*) > 1;
+
+create unique index if not exists diaries_user_id_date_key
+    on diaries (user_id, date);
@@ -3,23 +3,56 @@ import os
 # 이 설정은 파일 입출력 및 다른 라이브러리의 문자열 처리에 영향을 미칠 수 있습니다.
 os.environ["PYTHONIOENCODING"] = "utf-8"
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from api.widget.router import router as widget_router
 from api.ml_router import router as ml_router
 from api.rl_router import router as rl_router
 from api.lora_router import router as lora_router
+from api.widget.http_client import init_http_clients, close_http_clients
+from api.widget.prefetch import prefetch_scheduler
+from api.widget.registry import run_startup_hooks
 from dotenv import load_dotenv
 # 크롬 익스텐션 API 라우터 추가
 from chrome.chrome_api.chrome_router import chrome_router
+from chrome.chrome_api.log_queue import chrome_log_queue
+from chrome.chrome_api.visit_lifecycle import open_visit_table, CHROME_VISIT_LIFECYCLE
 
 # 환경변수 로드
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """앱 시작/종료 시 공용 리소스를 생성하고 정리합니다."""
+    # 위젯 외부 API 호출용 커넥션 풀 (요청마다 TCP/TLS 핸드셰이크를 반복하지 않도록 재사용)
+    init_http_clients()
+    # 크롬 로그를 모아서 DB에 저장하는 write-behind 큐
+    chrome_log_queue.start()
+    # 방문 수명 관리 모드: 저널에서 열린 방문을 복구하고, 시간이 지난 방문을 닫는 작업 시작
+    if CHROME_VISIT_LIFECYCLE:
+        open_visit_table.start()
+    # 아침 피크 전에 공용 위젯 데이터를 미리 갱신해 두는 스케줄러
+    prefetch_enabled = os.getenv("WIDGET_PREFETCH_ENABLED", "true").lower() == "true"
+    if prefetch_enabled:
+        prefetch_scheduler.start()
+        # 위젯 선언의 시작 작업 (랜덤 강아지 이미지 풀을 첫 요청 전에 미리 채우는 등)
+        run_startup_hooks()
+    yield
+    if prefetch_enabled:
+        await prefetch_scheduler.stop()
+    # 대기 중인 크롬 로그를 모두 저장한 뒤 종료합니다. (열린 방문은 저널에 남아 다음 시작 때 복구됩니다)
+    if CHROME_VISIT_LIFECYCLE:
+        await open_visit_table.stop()
+    await chrome_log_queue.stop()
+    await close_http_clients()
+
 app = FastAPI(
     title="Untold API",
     description="나도 몰랐던 나를 아는 방법 - Untold Backend API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS 설정
@@ -31,8 +64,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # 스크랩 목록 다음 페이지 커서
 )
 
+# 응답 압축 (위젯/대시보드 JSON 전송량 감소)
+# brotli-asgi가 설치되어 있으면 brotli를 우선 사용하고(gzip도 함께 지원), 없으면 gzip만 사용합니다.
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=500, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=500)
+
 # 라우터 등록
 app.include_router(widget_router, prefix="/api")
 app.include_router(ml_router, prefix="/api")
@@ -41,6 +83,7 @@ app.include_router(lora_router, prefix="/api")
 
 # 크롬 익스텐션 라우터 추가
 # - /api/log_url: 크롬 익스텐션에서 URL 로그를 받는 엔드포인트
+# - /api/log_url/batch: 방문 로그/체류시간 이벤트를 모아서 한 번에 받는 엔드포인트
 app.include_router(chrome_router, prefix="/api", tags=["chrome"])
 
 @app.get("/")
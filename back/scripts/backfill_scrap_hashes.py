@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+기존 스크랩에 content_hash를 채우는 스크립트
+- content_hash가 비어 있는 스크랩의 해시를 계산해 저장합니다.
+- 같은 사용자의 같은 해시가 여러 개면 가장 먼저 스크랩한 것만 남기고 삭제합니다.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.connect import supabase
+from api.widget.scrap import compute_content_hash
+
+PAGE_SIZE = 500
+
+def backfill_scrap_hashes():
+    """content_hash가 없는 스크랩을 페이지 단위로 읽어 해시를 채웁니다."""
+    updated = 0
+    deleted = 0
+    seen = {}  # (user_id, content_hash) -> 남길 스크랩 id
+
+    # 이미 해시가 있는 스크랩도 중복 판단에 포함합니다.
+    offset = 0
+    while True:
+        response = supabase.table('scraps').select('id, user_id, source_type, category, content, content_hash, scraped_at') \
+            .order('scraped_at').order('id').range(offset, offset + PAGE_SIZE - 1).execute()
+        rows = response.data or []
+        if not rows:
+            break
+        deleted_in_page = 0
+        for row in rows:
+            content_hash = compute_content_hash(row['source_type'], row['category'], row['content'])
+            key = (row['user_id'], content_hash)
+            if key in seen and seen[key] != row['id']:
+                supabase.table('scraps').delete().eq('id', row['id']).execute()
+                deleted += 1
+                deleted_in_page += 1
+                continue
+            seen[key] = row['id']
+            if row.get('content_hash') != content_hash:
+                supabase.table('scraps').update({"content_hash": content_hash}).eq('id', row['id']).execute()
+                updated += 1
+        # 삭제한 행만큼 뒤의 행들이 앞으로 당겨지므로 offset에서 제외합니다.
+        offset += len(rows) - deleted_in_page
+
+    print(f"✅ content_hash 채우기 완료: {updated}개 업데이트, 중복 {deleted}개 삭제")
+
+if __name__ == "__main__":
+    backfill_scrap_hashes()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+크롬 로그 텍스트 정리 마이크로 벤치마크
+- 이벤트 하나를 받을 때 하는 정리(url/title/domain/pageType + siteSpecific)를 실제와 비슷한 YouTube/Naver 이벤트로 반복해서 잽니다.
+- 이전 구현(str.replace 7번 + 재귀 복사)과 text_normalizer.py의 구현을 비교하고, 두 결과가 같은지도 확인합니다.
+- 바꿀 문자가 있는 제목 하나를 str.translate 테이블로 바꾸는 비용도 함께 잽니다. (text_normalizer.py가 translate를 쓰지 않는 이유)
+
+사용 예: python scripts/bench_text_normalizer.py --repeat 5
+"""
+
+import argparse
+import sys
+import os
+import timeit
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chrome.chrome_api.text_normalizer import clean_text, clean_nested_dict, REPLACEMENTS
+
+# 익스텐션(content.js)이 보내는 것과 같은 모양의 이벤트
+EVENTS = {
+    "youtube": {
+        "url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL0vfts4VzfNiI1BsIK5u7LpPaIDKMJIDN&index=3",
+        "title": "[LIVE] 비 오는 날 듣기 좋은 플레이리스트 … 카페에서 공부할 때 ‘집중’ 잘 되는 음악 - YouTube",
+        "domain": "www.youtube.com",
+        "pageType": "youtube_video",
+        "siteSpecific": {
+            "videoTitle": "[LIVE] 비 오는 날 듣기 좋은 플레이리스트 … 카페에서 공부할 때 ‘집중’ 잘 되는 음악",
+            "channelName": "감성 플레이리스트 Lofi Café",
+        },
+    },
+    "youtube_ascii": {
+        "url": "https://www.youtube.com/watch?v=jNQXAC9IVRw",
+        "title": "Me at the zoo - YouTube",
+        "domain": "www.youtube.com",
+        "pageType": "youtube_video",
+        "siteSpecific": {"videoTitle": "Me at the zoo", "channelName": "jawed"},
+    },
+    "naver": {
+        "url": "https://n.news.naver.com/mnews/article/001/0014795321?sid=101",
+        "title": "“금리 인하 기대” 코스피 2,700선 회복—외국인 순매수 이어져 : 네이버 뉴스",
+        "domain": "n.news.naver.com",
+        "pageType": "naver_news",
+        "siteSpecific": {
+            "newsTitle": "“금리 인하 기대” 코스피 2,700선 회복—외국인 순매수 이어져",
+            "category": "경제",
+        },
+    },
+    "naver_clean": {
+        "url": "https://n.news.naver.com/mnews/article/023/0003861245?sid=102",
+        "title": "대전 오늘 낮 최고 31도, 곳곳 소나기 : 네이버 뉴스",
+        "domain": "n.news.naver.com",
+        "pageType": "naver_news",
+        "siteSpecific": {"newsTitle": "대전 오늘 낮 최고 31도, 곳곳 소나기", "category": "사회"},
+    },
+}
+
+
+def legacy_clean_text(text):
+    """이전 구현: 문자마다 str.replace"""
+    if not text:
+        return text
+    replacements = {
+        '\u2014': '-',
+        '\u2013': '-',
+        '\u2018': "'",
+        '\u2019': "'",
+        '\u201c': '"',
+        '\u201d': '"',
+        '\u2026': '...',
+    }
+    cleaned = str(text)
+    for old, new in replacements.items():
+        cleaned = cleaned.replace(old, new)
+    return cleaned
+
+
+def legacy_clean_nested_dict(data):
+    """이전 구현: 모든 딕셔너리/리스트를 재귀로 새로 만듦"""
+    if isinstance(data, dict):
+        return {k: legacy_clean_nested_dict(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [legacy_clean_nested_dict(elem) for elem in data]
+    elif isinstance(data, str):
+        return legacy_clean_text(data)
+    else:
+        return data
+
+
+def clean_event(event, text_fn, nested_fn):
+    """build_log_row가 이벤트 하나에 하는 정리와 같은 작업"""
+    return (
+        text_fn(event["url"]),
+        text_fn(event["title"]),
+        text_fn(event["domain"]),
+        text_fn(event["pageType"]),
+        nested_fn(event["siteSpecific"]),
+    )
+
+
+def bench(fn, repeat: int) -> float:
+    """fn 한 번 호출에 걸리는 시간 (마이크로초, repeat번 잰 것 중 가장 빠른 값)"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def main(repeat: int, batch: int):
+    print(f"{'이벤트':<14}{'이전(µs)':>10}{'현재(µs)':>10}{'배수':>8}")
+    for name, event in EVENTS.items():
+        if clean_event(event, clean_text, clean_nested_dict) != clean_event(event, legacy_clean_text, legacy_clean_nested_dict):
+            raise SystemExit(f"❌ {name}: 이전 구현과 결과가 다릅니다.")
+        before = bench(lambda: clean_event(event, legacy_clean_text, legacy_clean_nested_dict), repeat)
+        after = bench(lambda: clean_event(event, clean_text, clean_nested_dict), repeat)
+        print(f"{name:<14}{before:>10.2f}{after:>10.2f}{before / after:>7.1f}x")
+
+    # /log_url/batch처럼 여러 이벤트의 siteSpecific을 한 번에 정리하는 경우
+    payloads = [event["siteSpecific"] for event in EVENTS.values()] * (batch // len(EVENTS))
+    if clean_nested_dict(payloads) != legacy_clean_nested_dict(payloads):
+        raise SystemExit("❌ batch: 이전 구현과 결과가 다릅니다.")
+    before = bench(lambda: legacy_clean_nested_dict(payloads), repeat) / len(payloads)
+    after = bench(lambda: clean_nested_dict(payloads), repeat) / len(payloads)
+    print(f"{f'batch x{len(payloads)}':<14}{before:>10.2f}{after:>10.2f}{before / after:>7.1f}x  (siteSpecific 하나당)")
+
+    # 바꿀 문자가 있는 제목 하나: str.replace 7번 vs str.translate 테이블
+    title = EVENTS["youtube"]["title"]
+    table = str.maketrans(REPLACEMENTS)
+    replaced = bench(lambda: legacy_clean_text(title), repeat)
+    translated = bench(lambda: title.translate(table), repeat)
+    print(f"{'title':<14}{replaced:>10.2f}{translated:>10.2f}{replaced / translated:>7.1f}x  (str.replace 7번 vs str.translate)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="크롬 로그 텍스트 정리 마이크로 벤치마크")
+    parser.add_argument("--repeat", type=int, default=5, help="측정 반복 횟수 (가장 빠른 값을 사용)")
+    parser.add_argument("--batch", type=int, default=200, help="일괄 정리에 넣을 siteSpecific 수")
+    args = parser.parse_args()
+    main(args.repeat, args.batch)
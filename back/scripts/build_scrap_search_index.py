@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+스크랩 검색 인덱스를 처음부터 다시 만드는 스크립트
+- 배포 직후나 인덱스 파일이 없어졌을 때 한 번 실행합니다. 이후에는 create_scrap/delete_scrap이 인덱스를 바로 갱신합니다.
+- 모든 스크랩을 id 순서 키셋 페이지로 읽어 묶음 단위로 색인합니다.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.connect import supabase
+from api.widget.scrap_search import scrap_search_index
+
+PAGE_SIZE = 1000
+
+def build_scrap_search_index():
+    """인덱스를 비우고 모든 스크랩을 다시 색인합니다."""
+    scrap_search_index.clear()
+    indexed = 0
+    last_id = None
+    while True:
+        query = supabase.table('scraps').select('id, user_id, source_type, category, content, content_hash, image_url, scraped_at')
+        if last_id:
+            query = query.gt('id', last_id)
+        rows = query.order('id').limit(PAGE_SIZE).execute().data or []
+        if not rows:
+            break
+        scrap_search_index.add_many(rows)
+        indexed += len(rows)
+        last_id = rows[-1]['id']
+        print(f"  ... 스크랩 {indexed}개 색인")
+        if len(rows) < PAGE_SIZE:
+            break
+
+    print(f"✅ 스크랩 검색 인덱스 생성 완료: {indexed}개")
+
+if __name__ == "__main__":
+    build_scrap_search_index()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+하루 동안의 스크랩을 일기 카드로 한꺼번에 바꾸는 야간 배치 스크립트
+- 그날(기본: 어제, Asia/Seoul 기준) 아직 카드가 되지 않은 스크랩을 (user_id, scraped_at, id) 순서로 페이지 단위로 읽습니다.
+- 사용자별 그날 일기가 없으면 만들고, 스크랩마다 cards 행(models/db_models.Card 형식)을 만듭니다.
+- 카드는 묶음 단위 upsert로 저장하고, 스크랩은 일기별로 converted_to_card/linked_diary_id만 한 번에 바꿉니다.
+- 페이지마다 체크포인트 파일에 진행 위치를 기록하므로, 중간에 멈춰도 다시 실행하면 이어서 처리합니다.
+- 카드 id는 스크랩 id로 정해지므로 같은 스크랩을 다시 처리해도 카드가 중복으로 생기지 않습니다.
+
+사용 예: python scripts/convert_scraps_to_cards.py --date 2025-07-01
+"""
+
+import argparse
+import json
+import sys
+import os
+import uuid
+from datetime import datetime, date, timedelta
+from zoneinfo import ZoneInfo
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.connect import supabase
+from api.widget.scrap import DEFAULT_SCRAP_TIMEZONE, _day_bounds
+
+# 한 번에 읽을 스크랩 수
+PAGE_SIZE = 1000
+# 한 번의 insert/upsert 요청에 담을 행 수
+CHUNK_SIZE = 500
+# 기존 카드를 읽을 때 한 번에 요청할 행 수 (PostgREST max-rows보다 작거나 같게)
+CARD_PAGE_SIZE = 1000
+CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".convert_scraps_checkpoint.json")
+
+# 스크랩 id -> 카드 id (다시 실행해도 같은 카드 id가 나오도록)
+CARD_ID_NAMESPACE = uuid.UUID("5b0c6f3e-2d7a-4e39-9a51-3c8f1d2e7b64")
+# (user_id, 날짜) -> 일기 id
+DIARY_ID_NAMESPACE = uuid.UUID("a4e1d9c2-7f3b-4c6e-8d25-91b0e6f4c3a7")
+
+# 일기 화면의 카드 그리드 열 수 (프론트엔드와 같음)
+GRID_COLS = 4
+
+# 프론트엔드 스크랩 목록과 같은 카테고리별 아이콘
+CATEGORY_ICONS = {
+    "weather": "🌤️",
+    "advice": "💭",
+    "book": "📚",
+    "news": "📰",
+    "randomdog": "🐕",
+    "cat": "🐱",
+    "music": "🎵",
+    "stock": "📈",
+    "nasa": "🚀",
+}
+
+
+def card_id_for(scrap_id: str) -> str:
+    return str(uuid.uuid5(CARD_ID_NAMESPACE, str(scrap_id)))
+
+
+def diary_id_for(user_id: str, day: str) -> str:
+    return str(uuid.uuid5(DIARY_ID_NAMESPACE, f"{user_id}:{day}"))
+
+
+def chunked(rows: list, size: int = CHUNK_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def load_checkpoint(path: str, day: str) -> dict:
+    """같은 날짜의 체크포인트가 있으면 불러오고, 없으면 새로 시작합니다."""
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("date") == day:
+            return checkpoint
+    return {"date": day, "cursor": None, "converted": 0, "diaries_created": 0, "done": False}
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def fetch_scrap_page(start_at: datetime, end_at: datetime, cursor, page_size: int) -> list:
+    """그날 아직 카드가 되지 않은 스크랩을 (user_id, scraped_at, id) 순서로 한 페이지 가져옵니다."""
+    query = supabase.table('scraps').select('*') \
+        .eq('converted_to_card', False) \
+        .gte('scraped_at', start_at.isoformat()) \
+        .lt('scraped_at', end_at.isoformat())
+    if cursor:
+        user_id, scraped_at, scrap_id = cursor
+        query = query.or_(
+            f'user_id.gt.{user_id},'
+            f'and(user_id.eq.{user_id},scraped_at.gt."{scraped_at}"),'
+            f'and(user_id.eq.{user_id},scraped_at.eq."{scraped_at}",id.gt.{scrap_id})'
+        )
+    response = query.order('user_id').order('scraped_at').order('id').limit(page_size).execute()
+    return response.data or []
+
+
+def ensure_diaries(user_ids: list, day: str, dry_run: bool = False) -> tuple:
+    """
+    사용자들의 그날 일기 id를 한 번의 조회로 찾고, 없는 일기는 한 번의 upsert로 만듭니다.
+    (user_id, date)로 upsert하므로 그 사이 프론트엔드가 같은 날 일기를 만들었으면 그 일기를 사용합니다.
+    반환값: ({user_id: diary_id}, 새로 만든 일기 수)
+    """
+    def find_diaries(target_user_ids: list) -> dict:
+        response = supabase.table('diaries').select('id, user_id').in_('user_id', target_user_ids).eq('date', day).execute()
+        return {row['user_id']: row['id'] for row in (response.data or [])}
+
+    diary_ids = find_diaries(user_ids)
+
+    # 프론트엔드가 새 일기를 만들 때와 같은 기본값
+    new_diaries = [
+        {
+            "id": diary_id_for(user_id, day),
+            "user_id": user_id,
+            "date": day,
+            "status": "draft",
+            "mood_vector": [0, 0],
+            "final_text": "",
+            "agent_version": "v1.0",
+        }
+        for user_id in user_ids if user_id not in diary_ids
+    ]
+    if not new_diaries:
+        return diary_ids, 0
+    if dry_run:
+        diary_ids.update({diary["user_id"]: diary["id"] for diary in new_diaries})
+        return diary_ids, len(new_diaries)
+
+    response = supabase.table('diaries').upsert(new_diaries, on_conflict="user_id,date", ignore_duplicates=True).execute()
+    # 건너뛴(이미 있던) 일기의 id도 알아야 하므로 새로 만든 사용자들의 일기를 다시 조회합니다.
+    diary_ids.update(find_diaries([diary["user_id"] for diary in new_diaries]))
+    return diary_ids, len(response.data or [])
+
+
+def next_card_indexes(diary_ids: list) -> dict:
+    """
+    일기별 다음 카드 순번 (기존 카드의 가장 큰 order_index + 1, 새 카드의 order_index/row/col을 이어서 매기기 위해)
+    PostgREST max-rows에 잘리지 않도록 빈 페이지가 나올 때까지 페이지 단위로 읽습니다.
+    """
+    next_index = {diary_id: 0 for diary_id in diary_ids}
+    for chunk in chunked(diary_ids):
+        offset = 0
+        while True:
+            response = supabase.table('cards').select('id, diary_id, order_index').in_('diary_id', chunk) \
+                .order('id').range(offset, offset + CARD_PAGE_SIZE - 1).execute()
+            rows = response.data or []
+            if not rows:
+                break
+            for row in rows:
+                order_index = row.get('order_index') or 0
+                next_index[row['diary_id']] = max(next_index[row['diary_id']], order_index + 1)
+            # 서버 max-rows가 CARD_PAGE_SIZE보다 작아도 받은 만큼만 넘어갑니다.
+            offset += len(rows)
+    return next_index
+
+
+def build_card(scrap: dict, diary_id: str, order_index: int, created_at: str) -> dict:
+    """스크랩 하나를 cards 행으로 만듭니다. (프론트엔드에서 스크랩을 카드로 추가할 때와 같은 형식)"""
+    category = scrap.get('category') or 'scrap'
+    image_url = scrap.get('image_url')
+    return {
+        "id": card_id_for(scrap['id']),
+        "diary_id": diary_id,
+        "source_type": scrap.get('source_type') or 'widget',
+        "category": category,
+        "content": scrap.get('content'),
+        "image_url": image_url,
+        "layout_type": "image" if image_url else "text",
+        "row": order_index // GRID_COLS,
+        "col": order_index % GRID_COLS,
+        "order_index": order_index,
+        "text_generated": False,
+        "text_final": f"{CATEGORY_ICONS.get(category, '📌')} {category} 스크랩",
+        "created_at": created_at,
+    }
+
+
+def convert_page(scraps: list, day: str, next_index: dict, dry_run: bool = False) -> int:
+    """
+    스크랩 한 페이지를 카드로 바꿉니다.
+    일기 조회/생성, 기존 카드 수 조회, 카드 upsert, 스크랩 플래그 변경을 모두 묶음 단위로 처리합니다.
+    반환값: 새로 만든 일기 수
+    """
+    user_ids = list(dict.fromkeys(scrap['user_id'] for scrap in scraps))
+    diary_ids, created = ensure_diaries(user_ids, day, dry_run)
+
+    # 이전 페이지에서 이어지는 일기는 메모리의 다음 순번을 그대로 사용합니다.
+    unseen = [diary_ids[user_id] for user_id in user_ids if diary_ids[user_id] not in next_index]
+    if unseen:
+        next_index.update(next_card_indexes(unseen))
+
+    created_at = datetime.now().isoformat()
+    cards = []
+    # 일기 id -> 그 일기의 카드가 된 스크랩 id 목록
+    converted_scrap_ids = {}
+    for scrap in scraps:
+        diary_id = diary_ids[scrap['user_id']]
+        cards.append(build_card(scrap, diary_id, next_index[diary_id], created_at))
+        next_index[diary_id] += 1
+        converted_scrap_ids.setdefault(diary_id, []).append(scrap['id'])
+
+    if dry_run:
+        return created
+
+    # 카드를 먼저 저장하고 스크랩 플래그를 바꿉니다. 그 사이에 멈춰도 카드 id가 정해져 있어 다시 실행하면 중복 없이 이어집니다.
+    for chunk in chunked(cards):
+        supabase.table('cards').upsert(chunk, on_conflict="id", ignore_duplicates=True).execute()
+    # 스크랩 행 전체를 다시 쓰지 않고 플래그만 바꿉니다. (그 사이 지워지거나 수정된 스크랩을 되살리거나 덮어쓰지 않도록)
+    for diary_id, scrap_ids in converted_scrap_ids.items():
+        for chunk in chunked(scrap_ids):
+            supabase.table('scraps').update({
+                "converted_to_card": True,
+                "linked_diary_id": diary_id,
+            }).in_('id', chunk).execute()
+    return created
+
+
+def convert_scraps_to_cards(day: str, tz: str = DEFAULT_SCRAP_TIMEZONE, page_size: int = PAGE_SIZE,
+                            checkpoint_path: str = CHECKPOINT_PATH, dry_run: bool = False):
+    """하루치 스크랩을 카드로 바꿉니다. 체크포인트가 있으면 이어서 처리합니다."""
+    start_at, end_at = _day_bounds(day, day, tz)
+    checkpoint = load_checkpoint(checkpoint_path, day)
+    if checkpoint["done"]:
+        print(f"✅ {day} 스크랩은 이미 카드로 변환되었습니다. (스크랩 {checkpoint['converted']}개)")
+        return checkpoint
+    if checkpoint["cursor"]:
+        print(f"🔄 체크포인트에서 이어서 처리합니다: {checkpoint['cursor']}")
+
+    next_index = {}
+    while True:
+        scraps = fetch_scrap_page(start_at, end_at, checkpoint["cursor"], page_size)
+        if not scraps:
+            break
+        checkpoint["diaries_created"] += convert_page(scraps, day, next_index, dry_run)
+        checkpoint["converted"] += len(scraps)
+        last = scraps[-1]
+        checkpoint["cursor"] = [last['user_id'], last['scraped_at'], last['id']]
+        if not dry_run:
+            save_checkpoint(checkpoint_path, checkpoint)
+        print(f"  ... 스크랩 {checkpoint['converted']}개 처리")
+        if len(scraps) < page_size:
+            break
+
+    checkpoint["done"] = True
+    if not dry_run:
+        save_checkpoint(checkpoint_path, checkpoint)
+    print(f"✅ {day} 스크랩 → 카드 변환 완료: 스크랩 {checkpoint['converted']}개, 새 일기 {checkpoint['diaries_created']}개")
+    return checkpoint
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="하루치 스크랩을 일기 카드로 변환합니다.")
+    parser.add_argument("--date", help="변환할 날짜 (YYYY-MM-DD, 기본: 어제)")
+    parser.add_argument("--tz", default=DEFAULT_SCRAP_TIMEZONE, help="하루 경계 시간대")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="DB에 쓰지 않고 처리할 개수만 확인")
+    args = parser.parse_args()
+
+    target_day = args.date or (datetime.now(ZoneInfo(args.tz)).date() - timedelta(days=1)).isoformat()
+    date.fromisoformat(target_day)
+    convert_scraps_to_cards(target_day, args.tz, args.page_size, args.checkpoint, args.dry_run)
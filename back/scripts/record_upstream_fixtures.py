@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+위젯 업스트림 응답을 fixture로 녹화하는 스크립트
+- WIDGET_UPSTREAM_MODE=record로 위젯 fetcher를 실제로 호출해서, 응답을 WIDGET_FIXTURES_DIR에 저장합니다.
+- 매번 다른 응답을 주는 업스트림(random.dog 등)은 --repeat만큼 여러 번 호출해 응답을 모아 둡니다.
+- 녹화한 뒤 WIDGET_UPSTREAM_MODE=replay로 서버를 띄우면 네트워크 없이 같은 응답으로 부하 테스트를 할 수 있습니다.
+
+사용 예: python scripts/record_upstream_fixtures.py --repeat 20 --cities Daejeon,Seoul,Busan
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+# 클라이언트 풀이 만들어지기 전에 녹화 모드를 켭니다.
+os.environ["WIDGET_UPSTREAM_MODE"] = "record"
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dotenv import load_dotenv
+from api.widget.http_client import close_http_clients
+from api.widget.registry import WIDGETS, resolve_location, make_fetcher, make_sync_fetcher
+from api.widget.upstream_replay import FIXTURES_DIR
+
+load_dotenv()
+
+
+async def record_upstream_fixtures(repeat: int, cities: list):
+    """업스트림을 사용하는 위젯마다 fetcher를 호출해 응답을 녹화합니다."""
+    recorded = 0
+    for spec in WIDGETS:
+        if spec.upstream and spec.scope == "global":
+            fetchers = [make_fetcher(spec)]
+        elif spec.upstream and spec.scope == "city":
+            fetchers = [make_fetcher(spec, resolve_location(city=city)) for city in cities]
+        elif spec.sync:
+            # 명언은 요청 경로에서 업스트림을 부르지 않고 동기화 작업만 부릅니다.
+            fetchers = [make_sync_fetcher(spec)]
+        else:
+            continue
+        for fetch in fetchers:
+            for _ in range(repeat):
+                data = await fetch()
+                if isinstance(data, dict) and "error" in data:
+                    print(f"⚠️ {spec.name} 녹화 중 에러 응답: {data['error']}")
+                recorded += 1
+        print(f"✅ {spec.name} 응답 녹화 완료")
+    await close_http_clients()
+    print(f"✅ 업스트림 응답 {recorded}개 녹화 완료: {FIXTURES_DIR}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="위젯 업스트림 응답을 fixture로 녹화합니다.")
+    parser.add_argument("--repeat", type=int, default=5, help="요청마다 녹화할 응답 수")
+    parser.add_argument("--cities", default="Daejeon,Seoul", help="날씨를 녹화할 도시 (쉼표로 구분)")
+    args = parser.parse_args()
+    asyncio.run(record_upstream_fixtures(args.repeat, [c.strip() for c in args.cities.split(",") if c.strip()]))
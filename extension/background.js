@@ -64,73 +64,98 @@ function analyzeSiteSpecificInfo(pageData) {
     console.log("---");
 }
 
-// 🆕 백엔드 서버로 데이터 전송 (활성화)
-async function sendToBackend(pageData) {
-    try {
-        console.log("📤 백엔드 서버로 데이터 전송 시작...");
-        
-        // 사용자 ID는 프론트엔드에서 전달받거나 기본값 사용
-        let userId = pageData.user_id || null;
-        
-        const response = await fetch('http://localhost:8000/api/log_url', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                url: pageData.url,
-                title: pageData.title,
-                domain: pageData.domain,
-                timestamp: pageData.timestamp,
-                pageType: pageData.pageType,
-                siteSpecific: pageData.siteSpecific,
-                visitStartTime: pageData.visitStartTime,
-                currentTime: pageData.currentTime,
-                user_id: userId
-            })
-        });
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        
-        const result = await response.json();
-        console.log("✅ 백엔드 전송 성공:", result);
-        
-    } catch (error) {
-        console.error("❌ 백엔드 전송 실패:", error);
-        console.error("  - 에러 메시지:", error.message);
+// 🆕 백엔드로 보낼 이벤트를 모아 두었다가 한 번에 전송 (/api/log_url/batch)
+// 페이지 방문/이탈마다 요청을 보내지 않고, 몇 초마다 또는 일정 개수가 모이면 묶어서 보냅니다.
+const BATCH_URL = 'http://localhost:8000/api/log_url/batch';
+const FLUSH_INTERVAL_MS = 5000;   // 이 시간마다 모인 이벤트 전송
+const MAX_BATCH_SIZE = 50;        // 이만큼 모이면 바로 전송
+const MAX_PENDING_EVENTS = 500;   // 서버가 응답하지 않을 때 보관할 최대 이벤트 수
+
+let pendingEvents = [];
+let flushTimer = null;
+
+function enqueueEvent(event) {
+    pendingEvents.push(event);
+    if (pendingEvents.length > MAX_PENDING_EVENTS) {
+        // 오래된 이벤트부터 버립니다.
+        pendingEvents = pendingEvents.slice(-MAX_PENDING_EVENTS);
+    }
+    if (pendingEvents.length >= MAX_BATCH_SIZE) {
+        flushEvents();
+    } else if (!flushTimer) {
+        flushTimer = setTimeout(flushEvents, FLUSH_INTERVAL_MS);
     }
 }
 
-// 🆕 사용시간 정보를 백엔드로 전송
-async function sendDurationToBackend(durationData) {
+async function flushEvents() {
+    if (flushTimer) {
+        clearTimeout(flushTimer);
+        flushTimer = null;
+    }
+    if (pendingEvents.length === 0) return;
+
+    const events = pendingEvents.splice(0, MAX_BATCH_SIZE);
     try {
-        console.log("⏰ 사용시간 정보 백엔드 전송 시작...");
-        
-        const response = await fetch('http://localhost:8000/api/update_duration', {
+        console.log(`📤 백엔드 서버로 이벤트 ${events.length}개 일괄 전송 시작...`);
+        const response = await fetch(BATCH_URL, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({
-                url: durationData.url,
-                domain: durationData.domain,
-                visitStartTime: durationData.visitStartTime,
-                visitEndTime: durationData.visitEndTime,
-                duration: durationData.duration
-            })
+            body: JSON.stringify({ events })
         });
-        
+
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        
+
         const result = await response.json();
-        console.log("✅ 사용시간 업데이트 성공:", result);
-        
+        console.log("✅ 백엔드 일괄 전송 완료:", result.message);
+        result.data.results
+            .filter(item => !item.success)
+            .forEach(item => console.warn("⚠️ 처리되지 않은 이벤트:", events[item.index], item.error));
+
     } catch (error) {
-        console.error("❌ 사용시간 업데이트 실패:", error);
+        console.error("❌ 백엔드 일괄 전송 실패:", error);
         console.error("  - 에러 메시지:", error.message);
+        // 다음 전송 때 다시 보냅니다.
+        pendingEvents = events.concat(pendingEvents).slice(-MAX_PENDING_EVENTS);
     }
-}
\ No newline at end of file
+
+    if (pendingEvents.length > 0 && !flushTimer) {
+        flushTimer = setTimeout(flushEvents, FLUSH_INTERVAL_MS);
+    }
+}
+
+// 🆕 페이지 방문 정보를 전송 대기열에 추가
+function sendToBackend(pageData) {
+    // 사용자 ID는 프론트엔드에서 전달받거나 기본값 사용
+    let userId = pageData.user_id || null;
+
+    enqueueEvent({
+        type: 'log',
+        visitId: pageData.visitId,
+        url: pageData.url,
+        title: pageData.title,
+        domain: pageData.domain,
+        timestamp: pageData.timestamp,
+        pageType: pageData.pageType,
+        siteSpecific: pageData.siteSpecific,
+        visitStartTime: pageData.visitStartTime,
+        currentTime: pageData.currentTime,
+        user_id: userId
+    });
+}
+
+// 🆕 사용시간 정보를 전송 대기열에 추가
+function sendDurationToBackend(durationData) {
+    enqueueEvent({
+        type: 'duration',
+        visitId: durationData.visitId,
+        url: durationData.url,
+        domain: durationData.domain,
+        visitStartTime: durationData.visitStartTime,
+        visitEndTime: durationData.visitEndTime,
+        duration: durationData.duration
+    });
+}
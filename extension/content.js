@@ -7,12 +7,17 @@
     // 🆕 페이지 방문 시작 시간 기록
     const visitStartTime = Date.now();
     console.log('⏰ 페이지 방문 시작 시간:', new Date(visitStartTime).toLocaleTimeString());
+
+    // 🆕 방문 ID (페이지 정보를 보낼 때마다 새로 만들고, 체류 시간을 보낼 때 함께 보내 서버가 해당 로그를 바로 찾도록)
+    let visitId = null;
     
     // 페이지 로드 완료 후 실행
     function extractPageInfo() {
         console.log('📄 페이지 정보 추출 시작...');
+        visitId = crypto.randomUUID();
         
         const pageInfo = {
+            visitId: visitId,
             url: window.location.href,
             title: document.title,
             domain: window.location.hostname,
@@ -51,6 +56,7 @@
         chrome.runtime.sendMessage({
             action: 'visitDuration',
             data: {
+                visitId: visitId,
                 url: window.location.href,
                 domain: window.location.hostname,
                 visitStartTime: visitStartTime,
@@ -41,4 +41,8 @@ axiosInstance.interceptors.response.use(
   }
 );
 
+// 위젯 이미지 프록시 URL (백엔드가 줄인 썸네일을 캐시해서 응답)
+export const proxiedImageUrl = (url: string, width: number = 320) =>
+  `${API_BASE_URL}/api/widgets/image?url=${encodeURIComponent(url)}&w=${width}`;
+
 export default axiosInstance; 
\ No newline at end of file
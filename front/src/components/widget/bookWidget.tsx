@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import axiosInstance from '../../api/axiosInstance';
+import axiosInstance, { proxiedImageUrl } from '../../api/axiosInstance';
 import { useScrap } from '@/hooks/useScrap';
 
 interface Book {
@@ -64,7 +64,7 @@ export default function BookWidget() {
                 rel="noopener noreferrer"
                 className="flex items-center space-x-3 flex-1"
               >
-                <img src={book.cover} alt={book.title} className="w-10 h-14 object-cover rounded" />
+                <img src={proxiedImageUrl(book.cover, 160)} alt={book.title} className="w-10 h-14 object-cover rounded" />
                 <div className="flex-1 min-w-0">
                   <p className="text-sm font-medium text-gray-800 break-words whitespace-normal">
                     {book.title}
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import axiosInstance from '../../api/axiosInstance';
+import axiosInstance, { proxiedImageUrl } from '../../api/axiosInstance';
 import { useScrap } from '@/hooks/useScrap';
 
 interface NewsArticle {
@@ -72,7 +72,7 @@ export default function NewsWidget() {
             >
               {article.urlToImage && (
                 <img
-                  src={article.urlToImage}
+                  src={proxiedImageUrl(article.urlToImage, 160)}
                   alt="뉴스 썸네일"
                   className="w-16 h-16 object-cover rounded-lg flex-shrink-0 bg-gray-100"
                   onError={e => { (e.target as HTMLImageElement).style.display = 'none'; }}